@@ -11,19 +11,23 @@ from routes.workout_routes import workout_bp
 from routes.health_routes import health_bp
 from routes.mini_apps import mini_apps_bp
 from routes.auth_routes import auth_bp
+from routes.job_routes import job_bp
+from routes.admin_routes import admin_bp
+from routes.metrics_routes import metrics_bp
+from routes.tracing_routes import tracing_bp
+from routes.profiling_routes import profiling_bp
 
-from server_utils import find_free_port, open_browser
+from server_utils import find_free_port, open_browser, SpooledUploadRequest
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 
 # --- CONFIGURATION ---
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'super-secret-key-for-dev-only')
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Register Blueprints
 app.register_blueprint(meal_bp)
@@ -31,6 +35,11 @@ app.register_blueprint(workout_bp)
 app.register_blueprint(health_bp)
 app.register_blueprint(mini_apps_bp)
 app.register_blueprint(auth_bp)
+app.register_blueprint(job_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(tracing_bp)
+app.register_blueprint(profiling_bp)
 
 # --- ROUTES ---
 @app.route('/')
@@ -0,0 +1,55 @@
+"""
+ASGI entry point, for many concurrent chat streams:
+
+    python asgi.py                       # or: uvicorn asgi:application --port 5000
+
+/chat_agent and the mini-apps are served by coroutines (routes/async_routes.py),
+so a chat stream waiting on Ollama costs a coroutine instead of a thread. Every
+other route is the Flask app on a pool of ASGI_WSGI_WORKERS threads.
+`python app.py` still serves everything synchronously.
+"""
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+from config import PORT, OLLAMA_MODEL, ASGI_WSGI_WORKERS
+from routes.async_routes import AsyncRoutes
+from server_utils import find_free_port
+from services.async_ollama import async_ollama_client
+
+logger = logging.getLogger(__name__)
+
+flask_application = WSGIMiddleware(app, workers=ASGI_WSGI_WORKERS)
+async_routes = AsyncRoutes(app)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_ollama_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    route = async_routes.match(scope)
+    if route:
+        return await async_routes(scope, receive, send, route)
+    return await flask_application(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    actual_port = int(os.environ.get('SERVER_PORT') or find_free_port(PORT))
+    if actual_port != PORT:
+        logger.warning(f"⚠️  Port {PORT} is in use. Switched to {actual_port}.")
+    logger.info(f"🔋 HOSTING ON PORT {actual_port} (ASGI) using model: {OLLAMA_MODEL}")
+    uvicorn.run(application, host="127.0.0.1", port=actual_port)
@@ -0,0 +1,75 @@
+"""
+Single-pass JSON repair vs. the legacy multi-pass pipeline.
+
+    python -m benchmarks.json_repair [--number 2000]
+
+Inputs are the fixtures from tests/test_json_*.py plus realistic 7-day
+plans (clean, fenced with prose, commented, truncated mid-day).
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.fallbacks import FALLBACK_MEAL_PLAN, FALLBACK_WORKOUT_PLAN
+from services.json_cleaner import clean_and_parse_json, legacy_clean_and_parse_json
+
+# Inputs used by tests/test_json_utils.py, test_json_parser.py and test_json_cleaner.py
+TEST_FIXTURES = [
+    '```json\n{"key": "value"}\n```',
+    'Here is the json: {"key": "value"}',
+    '{"key": "value",}',
+    '[1, 2, ]',
+    '{"key": "value"} // This is a comment',
+    '{"url": "http://example.com/foo//bar",}',
+    '{"data": "This is // not a comment", } // This is a comment',
+    'some text {"key": "value"} trailing',
+    '{"key": "value with { brace"} trailing garbage',
+    '{"key": {"nested": "value"}} trailing',
+    '{"key": "val", "unfinished',
+    '{"arr": ["a", "b',
+    '{"a": {"b": ["c", "d',
+    '{"list": ["item"]"}',
+    '{"day": "Mon", "Salmon", "benefit": "Omega3"}',
+]
+
+
+def _plan_fixtures():
+    meal = json.dumps(FALLBACK_MEAL_PLAN, indent=2)
+    workout = json.dumps(FALLBACK_WORKOUT_PLAN, indent=2)
+    commented = meal.replace('"day": "Tue",', '"day": "Tue", // rest day next\n', 1)
+    return {
+        "meal_plan_clean": meal,
+        "meal_plan_fenced": f"Sure! Here is your plan:\n```json\n{meal}\n```\nEnjoy!",
+        "meal_plan_commented": commented,
+        "meal_plan_truncated": meal[:int(len(meal) * 0.8)],
+        "workout_plan_clean": workout,
+    }
+
+
+def _time(fn, text, number):
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=3)) / number * 1e6
+
+
+def run(number=2000):
+    rows = [("test fixtures (x%d)" % len(TEST_FIXTURES), TEST_FIXTURES)]
+    rows += [(name, [text]) for name, text in _plan_fixtures().items()]
+
+    print(f"{'fixture':<28}{'legacy us':>12}{'single us':>12}{'speedup':>10}  same result")
+    for name, texts in rows:
+        n = max(1, number // (20 if len(texts[0]) > 1000 else 1))
+        legacy = sum(_time(legacy_clean_and_parse_json, t, n) for t in texts)
+        single = sum(_time(clean_and_parse_json, t, n) for t in texts)
+        same = all(legacy_clean_and_parse_json(t) == clean_and_parse_json(t) for t in texts)
+        print(f"{name:<28}{legacy:>12.1f}{single:>12.1f}{legacy / single:>9.1f}x  {same}")
+
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help="calls per timing run for short fixtures")
+    run(parser.parse_args().number)
@@ -0,0 +1,216 @@
+"""
+Latency and throughput of the app's hot routes, offline, against the mock Ollama.
+
+    python -m benchmarks.load [--scenario chat_agent] [--requests 50] [--concurrency 8]
+                              [--ttft 0.2] [--token-latency 0.02] [--malformed-rate 0.1]
+                              [--server asgi]
+
+Starts benchmarks.mock_ollama and the app (threaded werkzeug server, or asgi.py
+under uvicorn with --server asgi) on free local ports, then drives each
+scenario from `--concurrency` guest users.
+Caches are memory-only and every upload/term is distinct, so runs start cold
+and nothing under cache/ is touched. Per scenario it reports requests/sec,
+errors, p50/p95/p99 latency, p50 time to first byte (what a user waits
+before text starts to appear on streamed routes) and the peak thread count of
+this process (clients, mock and app together).
+"""
+import argparse
+import itertools
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_pdf
+from benchmarks.mock_ollama import MockOllama
+
+FOCUS_AREAS = ["sleep", "energy", "gut health", "recovery", "focus"]
+FOODS = ["grapefruit", "spinach", "coffee", "milk", "green tea", "turmeric"]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def lab_report(i):
+    """A small lab-report PDF, different for every `i` so the ingest cache never hits."""
+    rows = [[(72, "Biomarker"), (250, "Result"), (320, "Unit"), (400, "Reference")],
+            [(72, "Ferritin"), (250, str(12 + i % 50)), (320, "ng/mL"), (400, "30-400")],
+            [(72, "Vitamin D"), (250, str(18 + i % 30)), (320, "ng/mL"), (400, "30-100")],
+            [(72, "Hemoglobin"), (250, "13.1"), (320, "g/dL"), (400, "12.0-15.5")]]
+    notes = f"Patient {i} reports fatigue and poor sleep. Follow-up advised in 8 weeks."
+    return make_pdf([rows, notes])
+
+
+# Each scenario sends request number `i` with an already logged-in requests.Session
+SCENARIOS = {
+    "init_context": lambda http, base, i: http.post(
+        f"{base}/init_context", files={"file": (f"report_{i}.pdf", lab_report(i), "application/pdf")}),
+    "chat_agent": lambda http, base, i: http.post(
+        f"{base}/chat_agent", json={"message": f"Why am I tired all the time? ({i})"}, stream=True),
+    "generate_week": lambda http, base, i: http.post(
+        f"{base}/generate_week", json={"strategy_name": "Balanced", "variety": i % 5}),
+    "generate_week_stream": lambda http, base, i: http.post(
+        f"{base}/generate_week?stream=1", json={"strategy_name": "Balanced", "variety": i % 5}, stream=True),
+    "mini_apps": lambda http, base, i: [
+        lambda: http.post(f"{base}/define_term", json={"term": f"ferritin-{i}"}),
+        lambda: http.post(f"{base}/check_food_interaction",
+                          json={"item1": FOODS[i % len(FOODS)], "item2": f"statin-{i}"}),
+        lambda: http.post(f"{base}/suggest_supplement", json={"focus": FOCUS_AREAS[i % len(FOCUS_AREAS)]}),
+    ][i % 3](),
+}
+
+
+class _Uvicorn:
+    """asgi.py under uvicorn on a background thread, stopped like a werkzeug server."""
+
+    def __init__(self):
+        import uvicorn
+        from asgi import application
+
+        self.socket = socket.socket()
+        self.socket.bind(("127.0.0.1", 0))
+        self.server_port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(application, log_level="warning", lifespan="off"))
+        threading.Thread(target=self.server.run, kwargs={"sockets": [self.socket]}, name="bench-app",
+                         daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def shutdown(self):
+        self.server.should_exit = True
+
+
+def start_app(server="werkzeug"):
+    """Serves the app on a free port; returns (server, base_url)."""
+    # Per-request INFO logs would drown the report
+    logging.getLogger().setLevel(logging.WARNING)
+    if server == "asgi":
+        app_server = _Uvicorn()
+    else:
+        from werkzeug.serving import make_server
+        from app import app
+
+        app_server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=app_server.serve_forever, name="bench-app", daemon=True).start()
+    return app_server, f"http://127.0.0.1:{app_server.server_port}"
+
+
+def run_scenario(base, name, total, concurrency):
+    """Sends `total` requests from `concurrency` guest users; returns the stats dict."""
+    send = SCENARIOS[name]
+    local = threading.local()
+    counter = itertools.count()
+
+    def client():
+        if not hasattr(local, "http"):
+            local.http = requests.Session()
+            local.http.get(f"{base}/guest-login", allow_redirects=False)
+        return local.http
+
+    def one(_):
+        http = client()
+        i = next(counter)
+        start = time.perf_counter()
+        first = None
+        try:
+            response = send(http, base, i)
+            for _chunk in response.iter_content(chunk_size=None):
+                if first is None:
+                    first = time.perf_counter()
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        end = time.perf_counter()
+        return ok, end - start, (first or end) - start
+
+    peak_threads = threading.active_count()
+    running = True
+
+    def count_threads():
+        nonlocal peak_threads
+        while running:
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.01)
+
+    sampler = threading.Thread(target=count_threads, daemon=True)
+    sampler.start()
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall
+    running = False
+    sampler.join()
+
+    latencies = [r[1] for r in results]
+    ttfb = [r[2] for r in results]
+    return {
+        "scenario": name,
+        "requests": total,
+        "errors": sum(not r[0] for r in results),
+        "rps": total / wall if wall else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ttfb_p50": percentile(ttfb, 50),
+        "threads": peak_threads,
+    }
+
+
+def report(rows):
+    print(f"{'scenario':<22}{'reqs':>6}{'errors':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb ms':>9}"
+          f"{'threads':>9}")
+    for r in rows:
+        print(f"{r['scenario']:<22}{r['requests']:>6}{r['errors']:>8}{r['rps']:>8.1f}"
+              f"{r['p50'] * 1000:>9.0f}{r['p95'] * 1000:>9.0f}{r['p99'] * 1000:>9.0f}{r['ttfb_p50'] * 1000:>9.0f}"
+              f"{r['threads']:>9}")
+
+
+def run(scenarios, total=50, concurrency=8, server="werkzeug", **mock_options):
+    mock = MockOllama(seed=7, **mock_options)
+    # Before the app (and config) is imported: point it at the mock, keep caches in memory
+    os.environ["OLLAMA_URL"] = mock.start()
+    for var in ("EMBED_CACHE_PATH", "INGEST_CACHE_PATH", "MINI_APP_CACHE_PATH"):
+        os.environ[var] = ""
+    os.environ["SESSION_BACKEND"] = "memory"
+
+    app_server, base = start_app(server)
+    try:
+        rows = [run_scenario(base, name, total, concurrency) for name in scenarios]
+    finally:
+        app_server.shutdown()
+        mock.stop()
+    print(f"mock Ollama: ttft {mock.ttft * 1000:.0f} ms, {mock.token_latency * 1000:.0f} ms/token, "
+          f"malformed rate {mock.malformed_rate:.0%}; {concurrency} concurrent users; {server} server")
+    report(rows)
+    print(f"Ollama calls: {mock.counters}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="repeat to run several (default: all)")
+    parser.add_argument('--requests', type=int, default=50, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent users")
+    parser.add_argument('--ttft', type=float, default=0.2, help="mock seconds before the first token")
+    parser.add_argument('--token-latency', type=float, default=0.02, help="mock seconds per generated token")
+    parser.add_argument('--embed-latency', type=float, default=0.005, help="mock seconds per embedding request")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="share of JSON replies to damage (0-1)")
+    parser.add_argument('--server', choices=("werkzeug", "asgi"), default="werkzeug",
+                        help="serve app.py (threaded) or asgi.py (uvicorn)")
+    args = parser.parse_args()
+    run(args.scenario or list(SCENARIOS), args.requests, args.concurrency, args.server, ttft=args.ttft,
+        token_latency=args.token_latency, embed_latency=args.embed_latency, malformed_rate=args.malformed_rate)
@@ -0,0 +1,216 @@
+"""
+A local stand-in for the Ollama HTTP API, for benchmarks and offline runs.
+
+    python -m benchmarks.mock_ollama [--port 11434] [--ttft 0.2] [--token-latency 0.02]
+
+Implements /api/chat (streaming and not), /api/embeddings, /api/embed and
+/api/tags. Replies are canned but shaped like the real prompts expect:
+plan prompts get a 7-day plan, the diagnosis prompt a diagnosis, other JSON
+prompts a small object, and chat gets prose. Timing follows a simple model:
+`ttft` seconds before the first token, then `token_latency` per token.
+A `malformed_rate` share of JSON replies is damaged the way small models
+damage them (code fences, trailing commas, truncation).
+Final chunks carry eval_count / eval_duration like Ollama does.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.fallbacks import FALLBACK_MEAL_PLAN, FALLBACK_WORKOUT_PLAN, FALLBACK_DIAGNOSIS
+
+CHAT_REPLY = ("Your ferritin is on the low side, which fits the fatigue you describe. Add iron-rich foods such as "
+              "lean red meat, lentils and spinach, pair them with vitamin C, and keep coffee away from meals. "
+              "Recheck ferritin in about 8 weeks.")
+_TOKEN = re.compile(r"\S+\s*")
+
+
+def _json_reply(payload):
+    """A plausible JSON answer for the prompt in `payload`."""
+    text = " ".join(m.get("content", "") for m in payload.get("messages", []))
+    if "You are a Trainer" in text:
+        return FALLBACK_WORKOUT_PLAN
+    if "7 DAYS" in text:
+        return FALLBACK_MEAL_PLAN
+    if "Diagnose" in text:
+        return FALLBACK_DIAGNOSIS
+    if "summarize" in text.lower():
+        return {"summary": "Patient reports fatigue; low ferritin; advised iron-rich diet and a recheck."}
+    return {"answer": "Mock answer.", "details": ["one", "two"], "status": "Safe"}
+
+
+def _malform(content, rng):
+    kind = rng.choice(("fence", "trailing_comma", "truncate"))
+    if kind == "fence":
+        return f"Sure! Here you go:\n```json\n{content}\n```"
+    if kind == "trailing_comma":
+        return re.sub(r"([}\]])(\s*[}\]])", r"\1,\2", content, count=1)
+    return content[:int(len(content) * 0.8)]
+
+
+def _embedding(text, dim):
+    """Deterministic pseudo-embedding: the same text always gets the same vector."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+class MockOllama:
+    """In-process mock server. start() returns the base URL; stop() shuts it down."""
+
+    def __init__(self, host="127.0.0.1", port=0, ttft=0.2, token_latency=0.02, embed_latency=0.005,
+                 malformed_rate=0.0, dim=768, seed=None):
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.embed_latency = embed_latency
+        self.malformed_rate = malformed_rate
+        self.dim = dim
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.counters = {"chat": 0, "chat_stream": 0, "embeddings": 0, "embed_inputs": 0, "malformed": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _reply(self, payload):
+        """The reply text, damaged at malformed_rate when JSON was requested."""
+        if payload.get("format") != "json":
+            return CHAT_REPLY
+        content = json.dumps(_json_reply(payload))
+        with self._rng_lock:
+            if self.malformed_rate and self._rng.random() < self.malformed_rate:
+                self.counters["malformed"] += 1
+                return _malform(content, self._rng)
+        return content
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body, status=200):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    return self._send_json({"models": [{"name": "mock"}]})
+                self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self._send_json({"error": "invalid JSON body"}, 400)
+
+                if self.path == "/api/chat":
+                    return self._chat(payload)
+                if self.path == "/api/embeddings":
+                    mock.counters["embeddings"] += 1
+                    time.sleep(mock.embed_latency)
+                    return self._send_json({"embedding": _embedding(payload.get("prompt", ""), mock.dim)})
+                if self.path == "/api/embed":
+                    inputs = payload.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    mock.counters["embed_inputs"] += len(inputs)
+                    time.sleep(mock.embed_latency * max(1, len(inputs)) ** 0.5)
+                    return self._send_json({"embeddings": [_embedding(t, mock.dim) for t in inputs]})
+                self._send_json({"error": "not found"}, 404)
+
+            def _chat(self, payload):
+                started = time.time()
+                tokens = _TOKEN.findall(mock._reply(payload))
+                prompt_tokens = sum(len(m.get("content", "").split()) for m in payload.get("messages", []))
+                model = payload.get("model", "mock")
+
+                def final(content=""):
+                    eval_duration = int((time.time() - started - mock.ttft) * 1e9)
+                    return {"model": model, "message": {"role": "assistant", "content": content}, "done": True,
+                            "prompt_eval_count": prompt_tokens, "eval_count": len(tokens),
+                            "eval_duration": max(eval_duration, 1), "total_duration": int((time.time() - started) * 1e9)}
+
+                if not payload.get("stream", True):
+                    mock.counters["chat"] += 1
+                    time.sleep(mock.ttft + mock.token_latency * len(tokens))
+                    return self._send_json(final("".join(tokens)))
+
+                mock.counters["chat_stream"] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    time.sleep(mock.ttft)
+                    for token in tokens:
+                        line = {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+                        self._write_chunk(json.dumps(line).encode("utf-8") + b"\n")
+                        time.sleep(mock.token_latency)
+                    self._write_chunk(json.dumps(final()).encode("utf-8") + b"\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The app stopped reading (client went away); Ollama would just stop generating
+                    self.close_connection = True
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--ttft', type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument('--token-latency', type=float, default=0.02, help="seconds per generated token")
+    parser.add_argument('--embed-latency', type=float, default=0.005, help="seconds per embedding request")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="share of JSON replies to damage (0-1)")
+    parser.add_argument('--dim', type=int, default=768, help="embedding width")
+    args = parser.parse_args()
+
+    server = MockOllama(args.host, args.port, args.ttft, args.token_latency, args.embed_latency,
+                        args.malformed_rate, args.dim)
+    print(f"Mock Ollama listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,86 @@
+"""
+Memory held by sessions: the old dict-of-dicts layout vs. UserSession.
+
+    python -m benchmarks.session_memory [--sessions 1000] [--turns 150]
+
+Every synthetic user has a diagnosis and `--turns` chat messages; one in
+ten also has an ingested report (`--chunks` chunks, `--dim`-wide embeddings).
+The old layout keeps the embeddings as lists of floats and every message as
+its own dict. Sizes are measured with tracemalloc.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.fallbacks import FALLBACK_DIAGNOSIS
+from services.user_session import UserSession
+
+PHRASES = ["How is my vitamin D?", "What should I eat for breakfast?", "Is 18 ng/mL low?",
+           "Can I train fasted?", "Why is my ferritin borderline?"]
+
+
+def synthetic_sessions(count, turns, chunks, dim, seed=7):
+    """Plain dicts in the old session layout."""
+    rng = random.Random(seed)
+    for i in range(count):
+        ingested = i % 10 == 0
+        yield {
+            "blood_context": dict(FALLBACK_DIAGNOSIS, summary=f"Report {i}: {rng.choice(PHRASES)}"),
+            "raw_text_chunks": [f"Chunk {c} of report {i}. " * 12 for c in range(chunks)] if ingested else [],
+            "chunk_meta": [{"page": c // 4 + 1, "start": c * 300, "end": c * 300 + 290}
+                           for c in range(chunks)] if ingested else [],
+            "embeddings": [[rng.random() for _ in range(dim)] for _ in range(chunks)] if ingested else [],
+            "embedding_matrix": None,
+            "chat_history": [{"role": "user" if t % 2 == 0 else "ai", "text": f"{rng.choice(PHRASES)} ({t})"}
+                             for t in range(turns)],
+        }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, size
+
+
+def run(count=1000, turns=150, chunks=20, dim=768):
+    # Strings are shared by both layouts, so only the containers differ
+    sources = list(synthetic_sessions(count, turns, chunks, dim))
+
+    def old_layout():
+        return [{**s, "blood_context": dict(s["blood_context"]),
+                 "chat_history": [dict(m) for m in s["chat_history"]],
+                 "chunk_meta": [dict(m) for m in s["chunk_meta"]],
+                 "embeddings": [list(v) for v in s["embeddings"]]} for s in sources]
+
+    def new_layout():
+        return [UserSession(s) for s in sources]
+
+    old, old_bytes = measure(old_layout)
+    del old
+    new, new_bytes = measure(new_layout)
+    kept = len(new[0]["chat_history"])
+
+    print(f"{count} sessions, {turns} chat messages each, 1 in 10 with {chunks} x {dim} embeddings")
+    print(f"{'layout':<14}{'total MB':>10}{'per session KB':>16}")
+    print(f"{'dict':<14}{old_bytes / 2 ** 20:>10.1f}{old_bytes / count / 1024:>16.1f}")
+    print(f"{'UserSession':<14}{new_bytes / 2 ** 20:>10.1f}{new_bytes / count / 1024:>16.1f}")
+    print(f"{old_bytes / new_bytes:.1f}x smaller (chat history capped at {kept} messages)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--turns', type=int, default=150, help="chat messages per session")
+    parser.add_argument('--chunks', type=int, default=20, help="chunks per ingested report")
+    parser.add_argument('--dim', type=int, default=768, help="embedding width")
+    args = parser.parse_args()
+    run(args.sessions, args.turns, args.chunks, args.dim)
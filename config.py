@@ -18,5 +18,113 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 
 PORT = int(os.getenv("PORT", 5000))
 
+# Uploads are parsed straight from the request stream. Set KEEP_UPLOADS=1 to also
+# keep a copy of every upload in UPLOAD_FOLDER for debugging.
 UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
+KEEP_UPLOADS = os.getenv("KEEP_UPLOADS", "0").lower() in ("1", "true", "yes")
+if KEEP_UPLOADS:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Uploaded files stay in memory up to this size, larger ones spool to a temp file
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", 8 * 1024 * 1024))
+
+# --- OLLAMA HTTP CLIENT ---
+# One pooled keep-alive session is shared by every Ollama call.
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", 10))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_CHAT_TIMEOUT = float(os.getenv("OLLAMA_CHAT_TIMEOUT", 60))
+OLLAMA_STREAM_TIMEOUT = float(os.getenv("OLLAMA_STREAM_TIMEOUT", 300))
+OLLAMA_EMBED_TIMEOUT = float(os.getenv("OLLAMA_EMBED_TIMEOUT", 30))
+
+# --- EMBEDDINGS ---
+# Chunks per /api/embed request when ingesting a PDF
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 16))
+# In-memory LRU budget, backed by a SQLite file (set EMBED_CACHE_PATH="" for memory only)
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join("cache", "embeddings.sqlite3"))
+
+# --- BACKGROUND JOBS ---
+# Worker threads for long generations (/generate_week, /generate_workout with "async": true)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Seconds a finished job's result stays available for polling
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 600))
+
+# --- OLLAMA SCHEDULER ---
+# Concurrent generations sent to Ollama; everything else queues by priority
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", 2))
+# Max seconds a request may queue before the route serves its fallback (0 = never shed)
+QUEUE_BUDGET_INTERACTIVE = float(os.getenv("QUEUE_BUDGET_INTERACTIVE", 0))
+QUEUE_BUDGET_MINI_APP = float(os.getenv("QUEUE_BUDGET_MINI_APP", 15))
+QUEUE_BUDGET_BULK = float(os.getenv("QUEUE_BUDGET_BULK", 120))
+
+# --- MINI-APP RESPONSE CACHE ---
+# Used by APP_CONFIGS entries that opt in with "cache_ttl"
+MINI_APP_CACHE_MAX_BYTES = int(os.getenv("MINI_APP_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+# Optional SQLite file so cached answers survive restarts (empty = memory only)
+MINI_APP_CACHE_PATH = os.getenv("MINI_APP_CACHE_PATH", "")
+
+# --- PDF PARSING ---
+# Worker processes for page-level text extraction (1 = always single-process)
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+# Reports with fewer pages are parsed in-process; the pool start-up is not worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 8))
+
+# --- PDF INGEST CACHE ---
+# Parsed text, chunks, embeddings and diagnosis per uploaded file hash (empty path = memory only)
+INGEST_CACHE_MAX_BYTES = int(os.getenv("INGEST_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+INGEST_CACHE_PATH = os.getenv("INGEST_CACHE_PATH", os.path.join("cache", "ingest.sqlite3"))
+
+# --- ADMIN ---
+# /admin/* endpoints (and /metrics, X-Profile) require this value in the X-Admin-Token header.
+# With no token they are closed, unless ADMIN_ALLOW_LOOPBACK=1 lets localhost in. Only use that
+# without a reverse proxy: behind one, every request arrives from 127.0.0.1.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_ALLOW_LOOPBACK = os.getenv("ADMIN_ALLOW_LOOPBACK", "0").lower() in ("1", "true", "yes")
+
+# --- RAG CHUNKING ---
+# Chunk size budget (~tokens) and overlap between consecutive chunks of a report
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+
+# --- SESSIONS ---
+# "memory" keeps sessions in this process; "sqlite" shares them between worker
+# processes (gunicorn -w N) and keeps them across restarts
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("cache", "sessions.sqlite3"))
+# Estimated bytes all sessions may hold; past it the least recently used are evicted (0 = no limit)
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 256 * 1024 * 1024))
+# Sessions unused for this many seconds are removed by the background sweeper (0 = never)
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", 24 * 3600))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 60))
+# Chat messages (user + AI) kept per session; older ones drop off the ring buffer
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", 100))
+
+# --- CHAT PROMPT ---
+# Token budget for one /chat_agent prompt (num_ctx is 4096; the rest is left for the reply).
+# Recent history, RAG context and the running summary each get a share of it.
+CHAT_PROMPT_BUDGET_TOKENS = int(os.getenv("CHAT_PROMPT_BUDGET_TOKENS", 3000))
+# Once this many messages are stored, older ones are folded into a running summary in the background
+CHAT_SUMMARY_TRIGGER = int(os.getenv("CHAT_SUMMARY_TRIGGER", 12))
+# The most recent messages are never summarized
+CHAT_SUMMARY_KEEP = int(os.getenv("CHAT_SUMMARY_KEEP", 6))
+
+# --- ASGI SERVER ---
+# Under asgi.py (uvicorn), /chat_agent and the mini-apps run as coroutines; every
+# other (Flask) route runs on a pool of this many threads.
+ASGI_WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", 16))
+
+# --- TRACING ---
+# Per-request spans (route, RAG, Ollama, PDF parsing, JSON repair) are appended to this
+# JSONL file; empty = tracing off. `python -m services.tracing` converts it to Chrome trace JSON.
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+
+# --- PROFILING ---
+# Admins can profile a single request with the header "X-Profile: 1" (or "sample" / "cprofile").
+# PROFILE_REQUESTS=1 profiles every request and keeps those slower than PROFILE_MIN_MS.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0").lower() in ("1", "true", "yes")
+# "sample" (stack sampling, low overhead, collapsed stacks) or "cprofile" (deterministic, pstats)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample").lower()
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", 250))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+# Profiles are written to PROFILE_DIR/<method>_<route>/; the newest PROFILE_KEEP per route are kept
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
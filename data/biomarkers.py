@@ -0,0 +1,111 @@
+# Reference dictionary for the rule-based biomarker extractor (services/biomarker_service.py).
+# name: canonical display name
+# synonyms: lower-case spellings seen on lab reports (the name itself is always included)
+# unit: canonical unit the default range is expressed in
+# range: (low, high) adult reference interval, None for an open end
+# convert: other units -> factor that turns a value in that unit into the canonical unit
+
+BIOMARKERS = [
+    # --- Metabolic ---
+    {"name": "Glucose", "synonyms": ["fasting glucose", "glucose, fasting", "blood glucose", "fbg", "fasting blood sugar"],
+     "unit": "mg/dL", "range": (70, 99), "convert": {"mmol/L": 18.016}},
+    {"name": "HbA1c", "synonyms": ["hemoglobin a1c", "haemoglobin a1c", "glycated hemoglobin", "glycohemoglobin", "a1c"],
+     "unit": "%", "range": (4.0, 5.6), "convert": {}},
+    {"name": "Insulin", "synonyms": ["fasting insulin", "insulin, fasting"],
+     "unit": "uIU/mL", "range": (2.6, 24.9), "convert": {"pmol/L": 1 / 6.0}},
+    {"name": "Uric Acid", "synonyms": ["urate"],
+     "unit": "mg/dL", "range": (3.4, 7.0), "convert": {"umol/L": 1 / 59.48}},
+
+    # --- Lipids ---
+    {"name": "Total Cholesterol", "synonyms": ["cholesterol, total", "cholesterol", "tc"],
+     "unit": "mg/dL", "range": (None, 199), "convert": {"mmol/L": 38.67}},
+    {"name": "LDL Cholesterol", "synonyms": ["ldl", "ldl-c", "ldl cholesterol calc", "ldl chol calc (nih)", "ldl-cholesterol"],
+     "unit": "mg/dL", "range": (None, 99), "convert": {"mmol/L": 38.67}},
+    {"name": "HDL Cholesterol", "synonyms": ["hdl", "hdl-c", "hdl-cholesterol"],
+     "unit": "mg/dL", "range": (40, None), "convert": {"mmol/L": 38.67}},
+    {"name": "Triglycerides", "synonyms": ["triglyceride", "trig", "tg"],
+     "unit": "mg/dL", "range": (None, 149), "convert": {"mmol/L": 88.57}},
+
+    # --- Vitamins & iron ---
+    {"name": "Vitamin D", "synonyms": ["vitamin d, 25-hydroxy", "25-hydroxy vitamin d", "25-oh vitamin d", "25(oh)d",
+                                       "vitamin d 25-oh", "vit d", "25-oh-d"],
+     "unit": "ng/mL", "range": (30, 100), "convert": {"nmol/L": 1 / 2.496}},
+    {"name": "Vitamin B12", "synonyms": ["b12", "cobalamin", "vit b12", "cyanocobalamin"],
+     "unit": "pg/mL", "range": (232, 1245), "convert": {"pmol/L": 1.355}},
+    {"name": "Folate", "synonyms": ["folic acid", "serum folate"],
+     "unit": "ng/mL", "range": (3.0, None), "convert": {"nmol/L": 1 / 2.266}},
+    {"name": "Ferritin", "synonyms": ["serum ferritin"],
+     "unit": "ng/mL", "range": (30, 400), "convert": {"ug/L": 1.0}},
+    {"name": "Iron", "synonyms": ["serum iron", "iron, total", "fe"],
+     "unit": "ug/dL", "range": (60, 170), "convert": {"umol/L": 5.585}},
+    {"name": "TIBC", "synonyms": ["total iron binding capacity", "iron binding capacity"],
+     "unit": "ug/dL", "range": (250, 450), "convert": {"umol/L": 5.585}},
+
+    # --- Blood count ---
+    {"name": "Hemoglobin", "synonyms": ["haemoglobin", "hgb", "hb"],
+     "unit": "g/dL", "range": (12.0, 17.5), "convert": {"g/L": 0.1}},
+    {"name": "Hematocrit", "synonyms": ["haematocrit", "hct"],
+     "unit": "%", "range": (36, 50), "convert": {}},
+    {"name": "WBC", "synonyms": ["white blood cells", "white blood cell count", "leukocytes", "wbc count"],
+     "unit": "x10^3/uL", "range": (3.4, 10.8), "convert": {"x10^9/L": 1.0}},
+    {"name": "RBC", "synonyms": ["red blood cells", "red blood cell count", "erythrocytes", "rbc count"],
+     "unit": "x10^6/uL", "range": (4.1, 5.8), "convert": {"x10^12/L": 1.0}},
+    {"name": "Platelets", "synonyms": ["platelet count", "plt"],
+     "unit": "x10^3/uL", "range": (150, 450), "convert": {"x10^9/L": 1.0}},
+    {"name": "MCV", "synonyms": ["mean corpuscular volume"],
+     "unit": "fL", "range": (79, 97), "convert": {}},
+
+    # --- Thyroid ---
+    {"name": "TSH", "synonyms": ["thyroid stimulating hormone", "thyrotropin"],
+     "unit": "uIU/mL", "range": (0.45, 4.5), "convert": {"mIU/L": 1.0}},
+    {"name": "Free T4", "synonyms": ["ft4", "free thyroxine", "t4, free", "thyroxine (t4), free"],
+     "unit": "ng/dL", "range": (0.82, 1.77), "convert": {"pmol/L": 1 / 12.87}},
+    {"name": "Free T3", "synonyms": ["ft3", "free triiodothyronine", "t3, free", "triiodothyronine (t3), free"],
+     "unit": "pg/mL", "range": (2.0, 4.4), "convert": {"pmol/L": 1 / 1.536}},
+
+    # --- Inflammation & hormones ---
+    {"name": "CRP", "synonyms": ["c-reactive protein", "hs-crp", "hscrp", "c-reactive protein, cardiac",
+                                 "high sensitivity crp"],
+     "unit": "mg/L", "range": (None, 3.0), "convert": {"mg/dL": 10.0}},
+    {"name": "Cortisol", "synonyms": ["serum cortisol", "cortisol, am", "morning cortisol"],
+     "unit": "ug/dL", "range": (6.2, 19.4), "convert": {"nmol/L": 1 / 27.59}},
+    {"name": "Testosterone", "synonyms": ["total testosterone", "testosterone, total", "testosterone, serum"],
+     "unit": "ng/dL", "range": (264, 916), "convert": {"nmol/L": 28.84}},
+    {"name": "Homocysteine", "synonyms": ["hcy"],
+     "unit": "umol/L", "range": (None, 15), "convert": {}},
+
+    # --- Kidney & liver ---
+    {"name": "Creatinine", "synonyms": ["serum creatinine", "creat"],
+     "unit": "mg/dL", "range": (0.57, 1.27), "convert": {"umol/L": 1 / 88.4}},
+    {"name": "eGFR", "synonyms": ["egfr if nonafricn am", "estimated gfr", "gfr, estimated", "egfr (ckd-epi)"],
+     "unit": "mL/min/1.73m2", "range": (60, None), "convert": {}},
+    {"name": "BUN", "synonyms": ["blood urea nitrogen", "urea nitrogen"],
+     "unit": "mg/dL", "range": (6, 24), "convert": {}},
+    {"name": "ALT", "synonyms": ["alanine aminotransferase", "sgpt", "alt (sgpt)"],
+     "unit": "IU/L", "range": (None, 44), "convert": {"U/L": 1.0}},
+    {"name": "AST", "synonyms": ["aspartate aminotransferase", "sgot", "ast (sgot)"],
+     "unit": "IU/L", "range": (None, 40), "convert": {"U/L": 1.0}},
+
+    # --- Electrolytes & minerals ---
+    {"name": "Sodium", "synonyms": ["na"],
+     "unit": "mmol/L", "range": (134, 144), "convert": {"mEq/L": 1.0}},
+    {"name": "Potassium", "synonyms": ["k"],
+     "unit": "mmol/L", "range": (3.5, 5.2), "convert": {"mEq/L": 1.0}},
+    {"name": "Calcium", "synonyms": ["ca", "calcium, total", "serum calcium"],
+     "unit": "mg/dL", "range": (8.7, 10.2), "convert": {"mmol/L": 4.008}},
+    {"name": "Magnesium", "synonyms": ["mg, serum", "serum magnesium", "magnesium, rbc"],
+     "unit": "mg/dL", "range": (1.6, 2.3), "convert": {"mmol/L": 2.431}},
+]
+
+# Spellings of units on reports -> the form used in BIOMARKERS
+UNIT_ALIASES = {
+    "mg/dl": "mg/dL", "mmol/l": "mmol/L", "%": "%", "uiu/ml": "uIU/mL", "µiu/ml": "uIU/mL", "μiu/ml": "uIU/mL",
+    "miu/l": "mIU/L", "pmol/l": "pmol/L", "umol/l": "umol/L", "µmol/l": "umol/L", "μmol/l": "umol/L",
+    "ng/ml": "ng/mL", "nmol/l": "nmol/L", "pg/ml": "pg/mL", "ug/l": "ug/L", "µg/l": "ug/L", "ug/dl": "ug/dL",
+    "µg/dl": "ug/dL", "mcg/dl": "ug/dL", "g/dl": "g/dL", "g/l": "g/L", "fl": "fL", "ng/dl": "ng/dL",
+    "mg/l": "mg/L", "iu/l": "IU/L", "u/l": "U/L", "meq/l": "mEq/L", "ml/min/1.73m2": "mL/min/1.73m2",
+    "ml/min/1.73": "mL/min/1.73m2", "x10e3/ul": "x10^3/uL", "x10^3/ul": "x10^3/uL", "10^3/ul": "x10^3/uL",
+    "k/ul": "x10^3/uL", "thou/ul": "x10^3/uL", "x10e6/ul": "x10^6/uL", "x10^6/ul": "x10^6/uL",
+    "10^6/ul": "x10^6/uL", "m/ul": "x10^6/uL", "mill/ul": "x10^6/uL", "x10^9/l": "x10^9/L", "10^9/l": "x10^9/L",
+    "x10^12/l": "x10^12/L", "10^12/l": "x10^12/L",
+}
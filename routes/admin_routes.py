@@ -0,0 +1,54 @@
+import hmac
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from config import ADMIN_TOKEN, ADMIN_ALLOW_LOOPBACK
+from routes.health_routes import ingest_cache
+from services.session_service import session_stats
+
+logger = logging.getLogger(__name__)
+admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin')
+
+LOOPBACK = ('127.0.0.1', '::1')
+
+
+def is_admin_request():
+    """X-Admin-Token must match ADMIN_TOKEN. Without a token, only localhost and only with ADMIN_ALLOW_LOOPBACK."""
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return ADMIN_ALLOW_LOOPBACK and request.remote_addr in LOOPBACK
+
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/ingest_cache', methods=['GET'])
+@admin_required
+def ingest_cache_stats():
+    return jsonify(ingest_cache.stats())
+
+
+@admin_bp.route('/ingest_cache/invalidate', methods=['POST'])
+@admin_required
+def invalidate_ingest_cache():
+    """Body: {"file_hash": "<sha256>"} for one report, or {"all": true} to empty the cache."""
+    data = request.json or {}
+    file_hash = data.get('file_hash')
+    if not file_hash and not data.get('all'):
+        return jsonify({"error": "file_hash or all is required"}), 400
+
+    removed = ingest_cache.invalidate(None if data.get('all') else file_hash)
+    logger.info(f"🧹 Ingest cache invalidated: {file_hash or 'all'} ({removed} entries)")
+    return jsonify({"removed": removed})
+
+
+@admin_bp.route('/sessions', methods=['GET'])
+@admin_required
+def sessions_stats():
+    return jsonify(session_stats())
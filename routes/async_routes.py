@@ -0,0 +1,213 @@
+"""
+Native asyncio versions of /chat_agent and the mini-app handler, served by
+asgi.py. Each has the same behaviour, route metrics and root trace span as its
+Flask route, but an open chat stream is a coroutine, not a worker thread.
+Blocking session, RAG and response-cache work runs briefly on a worker thread (asyncio.to_thread);
+the Ollama call itself never holds one.
+"""
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from http.cookies import SimpleCookie
+
+from itsdangerous import BadSignature
+
+from routes.health_routes import start_chat_turn, finish_chat_turn
+from routes.metrics_routes import ROUTE_DURATION
+from routes.mini_apps import mini_app_cache, mini_app_cache_key, mini_app_prompt, mini_app_answer
+from routes.mini_apps_config import APP_CONFIGS
+from services import tracing
+from services.async_ollama import query_ollama, stream_ollama
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(Exception):
+    """The request body is not valid JSON (Flask answers 400 for the same)."""
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the handlers below use."""
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.body = body
+        self.response_headers = []
+        self.response_started = False
+
+    def json(self):
+        """The JSON body, or None when it is empty."""
+        if not self.body:
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise BadRequest(str(e))
+
+    def cookie(self, name):
+        morsel = SimpleCookie(self.headers.get("cookie", "")).get(name)
+        return morsel.value if morsel else None
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return body
+
+
+def _encode_headers(headers):
+    return [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers]
+
+
+async def send_json(request, send, body, status=200, headers=()):
+    payload = json.dumps(body).encode("utf-8")
+    request.response_started = True
+    await send({"type": "http.response.start", "status": status, "headers": _encode_headers(
+        [("Content-Type", "application/json"), ("Content-Length", len(payload)), *headers,
+         *request.response_headers])})
+    await send({"type": "http.response.body", "body": payload})
+    return status
+
+
+async def send_stream(request, receive, send, chunks, content_type="text/plain; charset=utf-8"):
+    """
+    Streams an async generator of text. If the client disconnects first, the
+    generator is cancelled, which closes the Ollama call behind it.
+    """
+    request.response_started = True
+    await send({"type": "http.response.start", "status": 200, "headers": _encode_headers(
+        [("Content-Type", content_type), *request.response_headers])})
+
+    async def pump():
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def watch():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    pumping = asyncio.create_task(pump())
+    watching = asyncio.create_task(watch())
+    try:
+        await asyncio.wait({pumping, watching}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pumping.cancel()
+        watching.cancel()
+        await asyncio.gather(pumping, watching, return_exceptions=True)
+    if pumping.cancelled():
+        logger.info(f"🔌 Client left {request.path} mid-stream")
+    elif pumping.exception():
+        raise pumping.exception()
+    return 200
+
+
+class AsyncRoutes:
+    """Dispatches the natively async routes; match() returns None for everything Flask serves."""
+
+    def __init__(self, app):
+        # The Flask app, for its session cookie settings
+        self.app = app
+
+    def match(self, scope):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        path = scope["path"]
+        if path == "/chat_agent":
+            return self.chat_agent, "health_bp", "/chat_agent"
+        if path.count("/") == 1 and path[1:] in APP_CONFIGS:
+            return self.mini_app, "mini_apps_bp", "/<action>"
+        return None
+
+    async def __call__(self, scope, receive, send, route):
+        handler, blueprint, rule = route
+        started = time.perf_counter()
+        request = AsyncRequest(scope, await read_body(receive))
+        incoming = request.headers.get("x-trace-id")
+        root, token = tracing.start_span(f"POST {rule}", trace_id=incoming if tracing.valid_trace_id(incoming) else None,
+                                         route=rule, method="POST", blueprint=blueprint)
+        if root is not None:
+            request.response_headers.append(("X-Trace-Id", root.trace_id))
+        status = 500
+        try:
+            try:
+                status = await handler(request, receive, send)
+            except BadRequest:
+                status = await send_json(request, send, {"error": "Invalid JSON body"}, 400)
+            except Exception as e:
+                logger.error(f"Async route error on {request.path}: {e}")
+                if not request.response_started:
+                    status = await send_json(request, send, {"error": "Internal Server Error"}, 500)
+        finally:
+            if root is not None:
+                root.set(status=status)
+            tracing.end_span(root, token)
+            ROUTE_DURATION.observe(time.perf_counter() - started, blueprint=blueprint, route=rule, method="POST",
+                                   status=status)
+
+    def session(self, request):
+        """The Flask cookie session (read-only); {} when absent or not validly signed."""
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        value = request.cookie(self.app.config["SESSION_COOKIE_NAME"])
+        if serializer is None or not value:
+            return {}
+        try:
+            return serializer.loads(value, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+
+    async def chat_agent(self, request, receive, send):
+        user_id = self.session(request).get('user_id')
+        if not user_id:
+            return await send_json(request, send, {"error": "Unauthorized"}, 401)
+        data = request.json() or {}
+
+        messages = await asyncio.to_thread(start_chat_turn, user_id, data.get('message'))
+
+        async def generate():
+            full_reply = ""
+            try:
+                async with aclosing(stream_ollama(messages)) as chunks:
+                    async for chunk in chunks:
+                        full_reply += chunk
+                        yield chunk
+
+                await asyncio.to_thread(finish_chat_turn, user_id, full_reply)
+            except Exception as e:
+                logger.error(f"Chat Stream Error: {e}")
+                yield "Sorry, I encountered an error."
+
+        return await send_stream(request, receive, send, generate())
+
+    async def mini_app(self, request, receive, send):
+        action = request.path[1:]
+        data = request.json() or {}
+        config = APP_CONFIGS[action]
+
+        cache_key = mini_app_cache_key(action, config, data, request.headers.get('cache-control', ''))
+        if cache_key:
+            cached = await asyncio.to_thread(mini_app_cache.get, cache_key)
+            if cached is not None:
+                return await send_json(request, send, cached, headers=[("X-Cache", "HIT")])
+        cache_status = "MISS" if cache_key else "BYPASS"
+
+        result = await query_ollama(
+            prompt=mini_app_prompt(config, data),
+            system_instruction=config["system"],
+            temperature=config["temp"]
+        )
+
+        # Stores the answer in the cache (SQLite) when cacheable
+        body, status = await asyncio.to_thread(mini_app_answer, action, config, result, cache_key)
+        return await send_json(request, send, body, status, headers=[("X-Cache", cache_status)])
@@ -1,14 +1,64 @@
+import copy
+import hashlib
 import logging
 import os
 import uuid
 from flask import Blueprint, request, jsonify, Response, stream_with_context, session
-from config import UPLOAD_FOLDER
-from utils import get_session, query_ollama, stream_ollama, retrieve_relevant_context, get_embedding, analyze_image
-from services.pdf_service import advanced_pdf_parse
+from config import (UPLOAD_FOLDER, KEEP_UPLOADS, OLLAMA_MODEL, EMBEDDING_MODEL, INGEST_CACHE_MAX_BYTES,
+                    INGEST_CACHE_PATH)
+from utils import (get_session, update_session, append_chat_message, session_lock_for, query_ollama, stream_ollama, retrieve_relevant_context, get_embeddings,
+                   build_embedding_matrix, analyze_image)
+from services.pdf_service import parse_pdf_report
+from services.biomarker_service import extract_biomarkers, extract_patient_name, biomarker_digest
+from data.fallbacks import FALLBACK_DIAGNOSIS
+from services.ingest_cache import IngestCache
+from services.chunker import CHUNKER_VERSION
+from services.conversation_service import build_chat_messages, schedule_summary
+from services.metrics import count_fallback
 
 logger = logging.getLogger(__name__)
 health_bp = Blueprint('health_bp', __name__)
 
+# A new chat/embedding model or chunker means new chunks/vectors/diagnosis, so they are part of the key
+ingest_cache = IngestCache(version=f"{OLLAMA_MODEL}|{EMBEDDING_MODEL}|chunker-{CHUNKER_VERSION}", max_bytes=INGEST_CACHE_MAX_BYTES,
+                           db_path=INGEST_CACHE_PATH or None)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def hash_upload(file):
+    """
+    SHA-256 of the upload, read in blocks from the request stream, which is then rewound
+    so the PDF can be parsed from it directly. With KEEP_UPLOADS a copy goes to UPLOAD_FOLDER.
+    """
+    digest = hashlib.sha256()
+    copy = None
+    if KEEP_UPLOADS:
+        ext = os.path.splitext(file.filename or '')[1]
+        copy = open(os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}{ext}"), 'wb')
+    try:
+        while True:
+            block = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            if copy:
+                copy.write(block)
+    finally:
+        if copy:
+            copy.close()
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def load_ingest(user_session, chunks, matrix):
+    """chunks: [{"text", "page", "start", "end"}] from the chunker."""
+    user_session['raw_text_chunks'] = [c['text'] for c in chunks]
+    user_session['chunk_meta'] = [{k: c[k] for k in ('page', 'start', 'end')} for c in chunks]
+    # Stored once as a normalized float32 matrix; the list layout is kept empty
+    user_session['embedding_matrix'] = matrix
+    user_session['embeddings'] = []
+
 @health_bp.route('/init_context', methods=['POST'])
 def init_context():
     if 'user_id' not in session:
@@ -17,28 +67,58 @@ def init_context():
     file = request.files['file']
     user_id = session['user_id']
 
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{ext}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+    file_hash = hash_upload(file)
 
-    text, chunks = advanced_pdf_parse(filepath)
+    cached = ingest_cache.get(file_hash)
+    if cached:
+        logger.info(f"📎 Ingest cache hit for {file_hash[:12]}: skipping parse, embeddings and diagnosis")
+        update_session(user_id, lambda s: load_ingest(s, cached['chunks'], cached['matrix']),
+                       blood_context=cached['diagnosis'])
+        return jsonify(cached['diagnosis'])
 
-    # Clean up uploaded file
-    try:
-        os.remove(filepath)
-    except OSError as e:
-        logger.error(f"Error deleting file {filepath}: {e}")
+    report = parse_pdf_report(file.stream)
+    text = report['text']
 
-    safe_chunks = chunks[:60]
-    embeddings = [get_embedding(chunk) for chunk in safe_chunks]
+    chunks = report['chunks']
+    logger.info(f"🧩 {len(chunks)} chunks to embed")
+    embedding_matrix = build_embedding_matrix(get_embeddings([c['text'] for c in chunks]))
+    update_session(user_id, lambda s: load_ingest(s, chunks, embedding_matrix))
 
-    user_session = get_session(user_id)
-    user_session['raw_text_chunks'] = safe_chunks
-    user_session['embeddings'] = embeddings
+    # Structured panels are read by rules; the LLM only writes the narrative
+    biomarkers = extract_biomarkers(report['rows'], text)
+    patient_name = extract_patient_name(text)
 
     system_prompt = "You are a Functional Doctor. Diagnose the user. Return strict JSON."
-    user_prompt = f"""
+    if biomarkers:
+        logger.info(f"🧪 Extracted {len(biomarkers)} biomarkers from tables, asking AI for the narrative only")
+        user_prompt = f"""
+    BIOMARKERS (measured value, status against the lab's reference range):
+    {biomarker_digest(biomarkers)}
+
+    TASK: Identify the top 3 health issues from these results.
+    For each issue, provide 2 distinct ways to fix it (e.g., Diet vs. Lifestyle).
+    Do NOT list the biomarkers again.
+
+    OUTPUT JSON FORMAT:
+    {{
+        "health_score": 78,
+        "summary": "Short overall health summary.",
+        "issues": [
+            {{
+                "title": "Low Vitamin D",
+                "severity": "High",
+                "value": "18 ng/mL",
+                "explanation": "This explains your low energy and weak immunity.",
+                "options": [
+                    {{ "type": "Dietary", "text": "Eat fatty fish & fortified foods." }},
+                    {{ "type": "Lifestyle", "text": "20 mins morning sun exposure." }}
+                ]
+            }}
+        ]
+    }}
+    """
+    else:
+        user_prompt = f"""
     DATA: {text[:8000]}
 
     TASK: Identify the top 3 health issues from this bloodwork.
@@ -70,85 +150,56 @@ def init_context():
 
     data = query_ollama(user_prompt, system_instruction=system_prompt, temperature=0.1)
 
-    if not data or 'issues' not in data:
-        data = {
-            "patient_name": "Guest",
-            "health_score": 75,
-            "summary": "We detected some potential optimizations for your metabolism.",
-            "biomarkers": [
-                {"name": "Glucose", "value": "95", "unit": "mg/dL", "status": "Normal"},
-                {"name": "HbA1c", "value": "5.7", "unit": "%", "status": "Borderline"},
-                {"name": "Cholesterol", "value": "190", "unit": "mg/dL", "status": "Normal"},
-                {"name": "Vitamin D", "value": "30", "unit": "ng/mL", "status": "Normal"}
-            ],
-            "strategies": [
-                {"name": "Metabolic Reset", "desc": "Focus on insulin sensitivity and inflammation reduction."},
-                {"name": "Energy Optimization", "desc": "Targeting mitochondrial health and fatigue."},
-                {"name": "Balanced Approach", "desc": "Sustainable lifestyle changes for long term health."}
-            ],
-            "issues": [
-                {
-                    "title": "Metabolic Efficiency",
-                    "severity": "Medium",
-                    "value": "Sub-optimal",
-                    "explanation": "Your markers suggest insulin resistance risk.",
-                    "options": [{"type": "Diet", "text": "Low Carb Protocol"},
-                                {"type": "Activity", "text": "Zone 2 Cardio"}]
-                },
-                {
-                    "title": "Inflammation Levels",
-                    "severity": "Low",
-                    "value": "Elevated",
-                    "explanation": "Slightly high CRP indicates stress on the body.",
-                    "options": [{"type": "Diet", "text": "Anti-Inflammatory Foods"},
-                                {"type": "Supplement", "text": "Omega-3 Protocol"}]
-                }
-            ]
-        }
-
-    user_session["blood_context"] = data
+    if data and 'issues' in data:
+        if biomarkers:
+            data['biomarkers'] = biomarkers
+            data['patient_name'] = patient_name or data.get('patient_name', 'User')
+        # Only real diagnoses are cached; a fallback should be retried on the next upload
+        ingest_cache.set(file_hash, text, chunks, embedding_matrix, data)
+    else:
+        data = copy.deepcopy(FALLBACK_DIAGNOSIS)
+        count_fallback("diagnosis")
+        if biomarkers:
+            # The narrative is canned, but the measured values are real
+            data['biomarkers'] = biomarkers
+            data['patient_name'] = patient_name or data['patient_name']
+
+    update_session(user_id, blood_context=data)
     return jsonify(data)
 
 
-@health_bp.route('/chat_agent', methods=['POST'])
-def chat_agent():
-    if 'user_id' not in session:
-        return jsonify({"error": "Unauthorized"}), 401
-    data = request.json
-    user_id = session['user_id']
-
+def start_chat_turn(user_id, user_msg):
+    """RAG lookup, prompt and the user's message saved to history. Returns the chat messages to send.
+    Shared with the async /chat_agent in routes/async_routes.py."""
     user_session = get_session(user_id)
-    user_msg = data.get('message')
-
     rag_context = retrieve_relevant_context(user_session, user_msg)
-    summary = user_session.get('blood_context', {}).get('summary', 'No data.')
 
-    # 1. Build History
-    history = user_session.get('chat_history', [])
-    truncated_history = history[-10:] if len(history) > 10 else history
+    # 1. Build the prompt under a fixed token budget: summary, RAG and recent turns each get a share.
+    # Under the session lock: another request may be appending to this history.
+    with session_lock_for(user_id):
+        messages = build_chat_messages(user_session, user_msg, rag_context)
 
-    messages = []
-    system_prompt = f"""
-    You are a helpful Functional Doctor Assistant.
-    PATIENT SUMMARY: {summary}
-    RELEVANT MEDICAL CONTEXT: {rag_context}
+    # 2. Update Session immediately with user message
+    append_chat_message(user_id, "user", user_msg)
+    return messages
 
-    INSTRUCTIONS:
-    - Answer naturally and empathetically.
-    - Use the context provided to give specific advice.
-    - If the user asks for a calculation (BMI, Calories), output ONLY JSON: {{ "tool": "calculate_bmi", "args": {{...}} }}
-    - Otherwise, output plain text (Markdown supported). Do NOT use JSON for normal chat.
-    """
 
-    messages.append({"role": "system", "content": system_prompt})
+def finish_chat_turn(user_id, full_reply):
+    """Saves the AI response to history once the stream is complete."""
+    if full_reply:
+        append_chat_message(user_id, "ai", full_reply)
+        # Older turns are folded into the running summary off the request path
+        schedule_summary(user_id)
 
-    for msg in truncated_history:
-        messages.append({"role": "user" if msg["role"] == "user" else "assistant", "content": msg["text"]})
 
-    messages.append({"role": "user", "content": user_msg})
+@health_bp.route('/chat_agent', methods=['POST'])
+def chat_agent():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.json
+    user_id = session['user_id']
 
-    # 2. Update Session immediately with user message
-    user_session['chat_history'].append({"role": "user", "text": user_msg})
+    messages = start_chat_turn(user_id, data.get('message'))
 
     # 3. Stream Response
     def generate():
@@ -158,9 +209,7 @@ def chat_agent():
                 full_reply += chunk
                 yield chunk
 
-            # Save AI response to history
-            if full_reply:
-                user_session['chat_history'].append({"role": "ai", "text": full_reply})
+            finish_chat_turn(user_id, full_reply)
         except Exception as e:
             logger.error(f"Chat Stream Error: {e}")
             yield "Sorry, I encountered an error."
@@ -203,8 +252,7 @@ def load_demo_data():
         ]
     }
 
-    user_session = get_session(token)
-    user_session['blood_context'] = sample_context
+    update_session(user_id, blood_context=sample_context)
 
     return jsonify(sample_context)
 
@@ -0,0 +1,65 @@
+import json
+import logging
+from flask import Blueprint, request, jsonify, Response, stream_with_context, session, url_for
+from services.job_service import job_manager
+
+logger = logging.getLogger(__name__)
+job_bp = Blueprint('job_bp', __name__)
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def wants_async(data):
+    """True when the caller asked for a job id instead of waiting on the model."""
+    return bool((data or {}).get('async')) or request.args.get('async') in ('1', 'true')
+
+
+def job_accepted(job, created):
+    body = job.to_dict(include_result=False)
+    body.update({
+        "deduplicated": not created,
+        "status_url": url_for('job_bp.job_status', job_id=job.id),
+        "events_url": url_for('job_bp.job_events', job_id=job.id),
+    })
+    return jsonify(body), 202
+
+
+def _lookup(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return None
+    # Meal jobs belong to the logged-in user, workout jobs to the client token
+    if job.owner not in (session.get('user_id'), request.args.get('token')):
+        return None
+    return job
+
+
+@job_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = _lookup(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+@job_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events: one event per status change, the last one carries the result."""
+    job = _lookup(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def generate():
+        seen = None
+        while True:
+            version = job.version
+            if version != seen:
+                seen = version
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.is_finished:
+                    return
+            if job_manager.wait_for_change(job, seen, SSE_HEARTBEAT_SECONDS) == seen:
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
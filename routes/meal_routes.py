@@ -1,7 +1,11 @@
 import logging
 from flask import Blueprint, request, jsonify, session
-from utils import get_session, query_ollama
+from utils import get_session, update_session, query_ollama, stream_ollama_json, PRIORITY_BULK
 from data.fallbacks import FALLBACK_MEAL_PLAN
+from services.job_service import job_manager, fingerprint
+from routes.job_routes import wants_async, job_accepted
+from routes.plan_stream import wants_stream, stream_plan
+from services.metrics import count_fallback
 
 logger = logging.getLogger(__name__)
 meal_bp = Blueprint('meal_bp', __name__)
@@ -10,11 +14,31 @@ meal_bp = Blueprint('meal_bp', __name__)
 def generate_week():
     if 'user_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
-    data = request.json
+    data = request.json or {}
     user_id = session['user_id']
 
     user_session = get_session(user_id)
 
+    if wants_async(data):
+        job, created = job_manager.submit(user_id, 'generate_week', build_week_plan, user_id, data,
+                                          dedupe_key=fingerprint(data))
+        return job_accepted(job, created)
+
+    if wants_stream(data):
+        def save(plan):
+            update_session(user_id, weekly_plan=plan)
+
+        days = stream_ollama_json(week_plan_prompt(user_session, data), system_instruction=WEEK_PLAN_SYSTEM,
+                                  temperature=0.3, priority=PRIORITY_BULK)
+        return stream_plan(days, FALLBACK_MEAL_PLAN, save, fallback_name="meal_plan")
+
+    return jsonify(build_week_plan(user_id, data))
+
+
+WEEK_PLAN_SYSTEM = "Return JSON Array only."
+
+
+def week_plan_prompt(user_session, data):
     summary = user_session.get('blood_context', {}).get('summary', 'General Health')
     blood_strategies = data.get('blood_strategies', [])
     lifestyle = data.get('lifestyle') or {}
@@ -65,8 +89,14 @@ def generate_week():
 
     GENERATE 7 DAYS NOW:
     """
+    return prompt
 
-    plan = query_ollama(prompt, system_instruction="Return JSON Array only.", temperature=0.3)
+
+def build_week_plan(user_id, data):
+    """Runs the 7-day meal plan prompt and stores the plan on the session. Safe to run off-request."""
+    user_session = get_session(user_id)
+    plan = query_ollama(week_plan_prompt(user_session, data), system_instruction=WEEK_PLAN_SYSTEM,
+                        temperature=0.3, priority=PRIORITY_BULK)
 
     if isinstance(plan, dict) and 'plan' in plan: plan = plan['plan']
 
@@ -74,9 +104,10 @@ def generate_week():
         logger.warning("❌ AI PLAN FAILED. Using Fallback.")
         # FIXED: Use the global variable directly, do NOT import it
         plan = FALLBACK_MEAL_PLAN
+        count_fallback("meal_plan")
 
-    user_session['weekly_plan'] = plan
-    return jsonify(plan)
+    update_session(user_id, weekly_plan=plan)
+    return plan
 
 
 @meal_bp.route('/get_recipe', methods=['POST'])
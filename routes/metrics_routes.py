@@ -0,0 +1,50 @@
+import time
+from flask import Blueprint, Response, request, g
+from routes.admin_routes import admin_required
+from services.metrics import registry
+from services.session_service import session_stats
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+ROUTE_DURATION = registry.histogram(
+    "bioflow_http_request_duration_seconds", "Seconds per request, until the last byte for streamed responses.",
+    ["blueprint", "route", "method", "status"])
+registry.gauge("bioflow_sessions", "Sessions held by the session store.",
+               function=lambda: session_stats()["sessions"])
+registry.gauge("bioflow_session_bytes", "Estimated bytes held by the session store.",
+               function=lambda: session_stats()["bytes"])
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def record_request_duration(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    labels = {
+        "blueprint": request.blueprint or "app",
+        # The URL rule, not the path, so /jobs/<job_id> stays one series
+        "route": request.url_rule.rule if request.url_rule else "<unmatched>",
+        "method": request.method,
+        "status": response.status_code,
+    }
+
+    def observe():
+        ROUTE_DURATION.observe(time.perf_counter() - started, **labels)
+
+    if response.is_streamed:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    """Prometheus text exposition of everything in services.metrics.registry (this process only)."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,10 +1,51 @@
 # FILENAME: mini_apps.py
 from flask import Blueprint, request, jsonify
+from config import OLLAMA_MODEL, MINI_APP_CACHE_MAX_BYTES, MINI_APP_CACHE_PATH
 from utils import query_ollama
 from routes.mini_apps_config import APP_CONFIGS, FALLBACKS
+from services.response_cache import ResponseCache, make_cache_key
+from services.metrics import count_fallback
 
 mini_apps_bp = Blueprint('mini_apps_bp', __name__)
 
+mini_app_cache = ResponseCache(max_bytes=MINI_APP_CACHE_MAX_BYTES, db_path=MINI_APP_CACHE_PATH or None)
+
+
+def _with_cache_status(response, status):
+    response.headers['X-Cache'] = status
+    return response
+
+
+def mini_app_cache_key(action, config, data, cache_control):
+    """Cache key for deterministic apps (opted in via "cache_ttl"), else None."""
+    if config.get("cache_ttl") and 'no-cache' not in cache_control:
+        return make_cache_key(action, data, OLLAMA_MODEL, config["temp"], config["system"] + config["prompt"])
+    return None
+
+
+def mini_app_prompt(config, data):
+    # e.g., Replaces {term} with data['term']
+    try:
+        return config["prompt"].format(**data)
+    except KeyError:
+        # Fallback if frontend sends slightly wrong keys
+        return f"Context: {data}. Task: {config['prompt']}"
+
+
+def mini_app_answer(action, config, result, cache_key):
+    """(body, status) for the model's result. Shared with the async handler in routes/async_routes.py."""
+    if not result:
+        # Fallback (never cached, so the next call retries the model)
+        if action in FALLBACKS:
+            count_fallback(f"mini_app:{action}")
+            return FALLBACKS[action], 200
+        return {"error": "AI could not process request"}, 500
+
+    if cache_key:
+        mini_app_cache.set(cache_key, result, config["cache_ttl"])
+    return result, 200
+
+
 @mini_apps_bp.route('/<action>', methods=['POST'])
 def handle_mini_app(action):
     """
@@ -17,26 +58,21 @@ def handle_mini_app(action):
     data = request.json or {}
     config = APP_CONFIGS[action]
 
-    # 1. Dynamic Prompt Injection
-    # e.g., Replaces {term} with data['term']
-    try:
-        user_prompt = config["prompt"].format(**data)
-    except KeyError:
-        # Fallback if frontend sends slightly wrong keys
-        user_prompt = f"Context: {data}. Task: {config['prompt']}"
+    # 0. Deterministic apps (opted in via "cache_ttl") skip the LLM on repeat inputs
+    cache_key = mini_app_cache_key(action, config, data, request.headers.get('Cache-Control', ''))
+    if cache_key:
+        cached = mini_app_cache.get(cache_key)
+        if cached is not None:
+            return _with_cache_status(jsonify(cached), "HIT")
+    cache_status = "MISS" if cache_key else "BYPASS"
 
-    # 2. Execute with Specific Temperature
+    # 1. Dynamic Prompt Injection, 2. Execute with Specific Temperature
     # Low temp = factual (Medical), High temp = creative (Cooking)
     result = query_ollama(
-        prompt=user_prompt,
+        prompt=mini_app_prompt(config, data),
         system_instruction=config["system"],
         temperature=config["temp"]
     )
 
-    if not result:
-        # Fallback
-        if action in FALLBACKS:
-            return jsonify(FALLBACKS[action])
-        return jsonify({"error": "AI could not process request"}), 500
-
-    return jsonify(result)
+    body, status = mini_app_answer(action, config, result, cache_key)
+    return _with_cache_status(jsonify(body), cache_status), status
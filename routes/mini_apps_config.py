@@ -1,12 +1,15 @@
 # --- CONFIGURATION ENGINE ---
 # Defines the personality (System Prompt), strictness (Temperature),
 # and task format for every mini-app.
+# Optional "cache_ttl" (seconds) caches answers per (inputs, model, temp);
+# only opt in where the same inputs should give the same answer.
 APP_CONFIGS = {
     # --- NEW: AI Tooltip Definition ---
     "define_term": {
         "system": "You are a concise medical dictionary. Define the term in 1 short sentence. No fluff.",
         "prompt": "Define '{term}' in the context of health/nutrition.",
-        "temp": 0.1  # Very strict/factual
+        "temp": 0.1,  # Very strict/factual
+        "cache_ttl": 7 * 24 * 3600
     },
 
     # --- Existing Tools ---
@@ -18,12 +21,14 @@ APP_CONFIGS = {
     "check_food_interaction": {
         "system": "You are a Clinical Toxicologist. Be precise.",
         "prompt": "Analyze interaction between '{item1}' and '{item2}'. Output format: {{ 'status': 'Safe/Caution/Danger', 'details': '...' }}",
-        "temp": 0.0
+        "temp": 0.0,
+        "cache_ttl": 24 * 3600
     },
     "check_drug_interaction": {
         "system": "You are a Pharmacist. Check for interactions strictly.",
         "prompt": "Check interaction between: '{drug_list}'. Output format: {{ 'interactions': [{{ 'drugs': 'A + B', 'severity': 'High', 'effect': '...' }}] }}",
-        "temp": 0.0
+        "temp": 0.0,
+        "cache_ttl": 24 * 3600
     },
     "recipe_variation": {
         "system": "You are an Avant-Garde Chef. Be creative and flavorful.",
@@ -181,12 +186,14 @@ APP_CONFIGS = {
     "calculate_1rm": {
         "system": "You are a Strength Coach. Use the Epley Formula: w * (1 + r/30).",
         "prompt": "Estimate 1 Rep Max for {weight}kg x {reps} reps. Output format: {{ 'estimated_1rm': '...', 'training_tip': '...' }}",
-        "temp": 0.1
+        "temp": 0.1,
+        "cache_ttl": 7 * 24 * 3600
     },
     "heart_rate_zones": {
         "system": "You are a Cardiovascular Physiologist.",
         "prompt": "Calculate heart rate zones for Age: {age}, Resting HR: {resting_hr}. Output format: {{ 'max_hr': '...', 'zone_2': '...-...' }}",
-        "temp": 0.1
+        "temp": 0.1,
+        "cache_ttl": 7 * 24 * 3600
     },
     "exercise_form_check": {
         "system": "You are an Elite Biomechanist.",
@@ -0,0 +1,58 @@
+import json
+import logging
+import time
+from flask import request, Response, stream_with_context
+from services.metrics import count_fallback
+
+logger = logging.getLogger(__name__)
+
+
+def wants_stream(data):
+    """True when the caller asked for the plan day by day instead of in one response."""
+    return bool((data or {}).get('stream')) or request.args.get('stream') in ('1', 'true')
+
+
+def stream_plan(days, fallback, on_complete=None, fallback_name="plan"):
+    """
+    Relays plan days as they are generated.
+    NDJSON by default, Server-Sent Events when the client sends `Accept: text/event-stream`.
+    Events: {"type": "day", "index": n, "day": {...}} for every day, then
+            {"type": "done", "days": 7, "fallback": false}.
+    If the model produced no days the fallback plan is streamed instead.
+    on_complete(plan), if given, runs once the whole plan has been sent.
+    fallback_name labels the fallback in the metrics.
+    """
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def frame(event):
+        if sse:
+            return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + "\n"
+
+    def generate():
+        started = time.time()
+        plan = []
+        for day in days:
+            if not isinstance(day, dict):
+                continue
+            if not plan:
+                logger.info(f"⚡ First day streamed after {time.time() - started:.1f}s")
+            plan.append(day)
+            yield frame({"type": "day", "index": len(plan) - 1, "day": day})
+
+        used_fallback = not plan
+        if used_fallback:
+            logger.warning("❌ AI PLAN STREAM FAILED. Using Fallback.")
+            plan = fallback
+            count_fallback(fallback_name)
+            for index, day in enumerate(plan):
+                yield frame({"type": "day", "index": index, "day": day})
+
+        if on_complete:
+            on_complete(plan)
+        logger.info(f"✅ Streamed {len(plan)} days in {time.time() - started:.1f}s")
+        yield frame({"type": "done", "days": len(plan), "fallback": used_fallback})
+
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
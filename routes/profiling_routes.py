@@ -0,0 +1,82 @@
+import logging
+import os
+from flask import Blueprint, request, jsonify, render_template, send_file, g, Response
+from config import PROFILE_REQUESTS, PROFILE_MODE, PROFILE_MIN_MS
+from routes.admin_routes import admin_required, is_admin_request
+from services import tracing
+from services.profiler import MODES, RequestProfile, sampler, profile_store, profile_text
+
+logger = logging.getLogger(__name__)
+profiling_bp = Blueprint('profiling_bp', __name__)
+
+OFF = ('', '0', 'false', 'no')
+# The profile index never holds more than its last 200 entries
+MAX_LIST_LIMIT = 200
+
+
+def requested_mode():
+    """The profiler mode for this request, or None. The X-Profile header is only honoured for admins."""
+    header = request.headers.get('X-Profile', '').lower()
+    if header not in OFF and is_admin_request():
+        return header if header in MODES else PROFILE_MODE
+    if PROFILE_REQUESTS:
+        return PROFILE_MODE
+    return None
+
+
+@profiling_bp.before_app_request
+def start_profile():
+    mode = requested_mode()
+    if mode:
+        g.profile = RequestProfile(mode, sampler).start()
+        g.profile_forced = request.headers.get('X-Profile', '').lower() not in OFF
+        g.profile_trace_id = tracing.current_trace_id()
+
+
+@profiling_bp.after_app_request
+def finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    forced, trace_id = g.pop('profile_forced', False), g.pop('profile_trace_id', None)
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    method, status = request.method, response.status_code
+
+    def save():
+        # Runs once the body is sent, so streamed responses are profiled to the end
+        seconds, result = profile.stop()
+        if not forced and seconds * 1000 < PROFILE_MIN_MS:
+            return
+        try:
+            entry = profile_store.save(method, route, status, seconds, result, trace_id)
+            logger.info(f"🔬 Profiled {method} {route} ({entry['duration_ms']:.0f} ms): {entry['path']}")
+        except OSError as e:
+            logger.error(f"Could not save profile for {method} {route}: {e}")
+
+    response.headers['X-Profile'] = profile.mode
+    response.call_on_close(save)
+    return response
+
+
+@profiling_bp.route('/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """The slowest recently profiled requests (?format=json for the raw index)."""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_LIST_LIMIT)
+    entries = profile_store.slowest(limit)
+    if request.args.get('format') == 'json':
+        return jsonify(entries)
+    return render_template('admin_profiles.html', entries=entries, profile_requests=PROFILE_REQUESTS,
+                           profile_mode=PROFILE_MODE, min_ms=PROFILE_MIN_MS)
+
+
+@profiling_bp.route('/admin/profiles/<int:profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    """Readable summary of one profile; ?raw=1 downloads the .prof / .collapsed file."""
+    entry = profile_store.get(profile_id)
+    if entry is None or not os.path.exists(entry['path']):
+        return jsonify({"error": "Unknown or pruned profile"}), 404
+    if request.args.get('raw'):
+        return send_file(os.path.abspath(entry['path']), as_attachment=True)
+    return Response(profile_text(entry), mimetype='text/plain')
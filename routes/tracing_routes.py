@@ -0,0 +1,44 @@
+from flask import Blueprint, request, jsonify, g
+from routes.admin_routes import admin_required
+from services import tracing
+
+tracing_bp = Blueprint('tracing_bp', __name__)
+
+
+@tracing_bp.before_app_request
+def start_request_span():
+    """Root span of the request; services' spans nest under it through the contextvar."""
+    incoming = request.headers.get('X-Trace-Id')
+    rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+    g.trace_span, g.trace_token = tracing.start_span(
+        f"{request.method} {rule}", trace_id=incoming if tracing.valid_trace_id(incoming) else None,
+        route=rule, method=request.method, blueprint=request.blueprint or "app")
+
+
+@tracing_bp.after_app_request
+def end_request_span(response):
+    span, token = g.pop('trace_span', None), g.pop('trace_token', None)
+    if span is None:
+        return response
+    span.set(status=response.status_code)
+    response.headers['X-Trace-Id'] = span.trace_id
+    if response.is_streamed:
+        # The route returned a generator: RAG and Ollama spans happen while it is consumed
+        response.call_on_close(lambda: tracing.end_span(span, token))
+    else:
+        tracing.end_span(span, token)
+    return response
+
+
+@tracing_bp.route('/admin/traces/<trace_id>', methods=['GET'])
+@admin_required
+def get_trace(trace_id):
+    """One request's spans from TRACE_PATH; ?format=chrome returns Chrome trace-event JSON."""
+    if tracing.sink is None:
+        return jsonify({"error": "Tracing is off (set TRACE_PATH)"}), 404
+    spans = tracing.read_spans(tracing.sink.path, trace_id)
+    if not spans:
+        return jsonify({"error": "Unknown trace"}), 404
+    if request.args.get('format') == 'chrome':
+        return jsonify(tracing.to_chrome_trace(spans))
+    return jsonify(spans)
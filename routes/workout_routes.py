@@ -1,7 +1,11 @@
 import logging
 from flask import Blueprint, request, jsonify
-from utils import get_session, query_ollama
+from utils import get_session, query_ollama, stream_ollama_json, PRIORITY_BULK
 from data.fallbacks import FALLBACK_WORKOUT_PLAN
+from services.job_service import job_manager, fingerprint
+from routes.job_routes import wants_async, job_accepted
+from routes.plan_stream import wants_stream, stream_plan
+from services.metrics import count_fallback
 
 logger = logging.getLogger(__name__)
 workout_bp = Blueprint('workout_bp', __name__)
@@ -15,6 +19,24 @@ def generate_workout():
         return jsonify({"error": "Token is required"}), 400
 
     get_session(token)
+
+    if wants_async(data):
+        job, created = job_manager.submit(token, 'generate_workout', build_workout_plan, data,
+                                          dedupe_key=fingerprint(data))
+        return job_accepted(job, created)
+
+    if wants_stream(data):
+        days = stream_ollama_json(workout_plan_prompt(data), system_instruction=WORKOUT_PLAN_SYSTEM,
+                                  temperature=0.1, priority=PRIORITY_BULK)
+        return stream_plan(days, FALLBACK_WORKOUT_PLAN, fallback_name="workout_plan")
+
+    return jsonify(build_workout_plan(data))
+
+
+WORKOUT_PLAN_SYSTEM = "You are a Trainer. Return JSON Array only."
+
+
+def workout_plan_prompt(data):
     strategy = data.get('strategy_name', 'General')
     lifestyle = data.get('lifestyle', {})
     fitness_strategy = data.get('fitness_strategy', strategy)  # Use specific fitness strategy if available
@@ -54,14 +76,20 @@ def generate_workout():
         }}
     ]
     """
+    return prompt
+
 
-    plan = query_ollama(prompt, system_instruction="You are a Trainer. Return JSON Array only.", temperature=0.1)
+def build_workout_plan(data):
+    """Runs the 7-day workout prompt. Safe to run off-request."""
+    plan = query_ollama(workout_plan_prompt(data), system_instruction=WORKOUT_PLAN_SYSTEM, temperature=0.1,
+                        priority=PRIORITY_BULK)
 
     if not plan or not isinstance(plan, list) or len(plan) == 0:
         logger.warning("❌ AI WORKOUT FAILED. Using Fallback.")
         plan = FALLBACK_WORKOUT_PLAN
+        count_fallback("workout_plan")
 
-    return jsonify(plan)
+    return plan
 
 
 @workout_bp.route('/propose_fitness_strategies', methods=['POST'])
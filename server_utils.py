@@ -1,7 +1,10 @@
 import socket
 import webbrowser
 import logging
+from tempfile import SpooledTemporaryFile
 from time import sleep
+from flask import Request
+from config import UPLOAD_SPOOL_MAX_BYTES
 
 logger = logging.getLogger(__name__)
 
@@ -29,3 +32,10 @@ def open_browser(port):
         except webbrowser.Error:
             browser = webbrowser
     browser.open(url)
+
+
+class SpooledUploadRequest(Request):
+    """Keeps uploaded files in memory up to UPLOAD_SPOOL_MAX_BYTES (werkzeug's default is 500 KB)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, mode="rb+")
@@ -1,40 +1,121 @@
 import json
 import re
-import requests
 import logging
 import base64
-from config import OLLAMA_MODEL, OLLAMA_URL
+import time
+from config import (
+    OLLAMA_MODEL,
+    OLLAMA_MAX_IN_FLIGHT,
+    QUEUE_BUDGET_INTERACTIVE,
+    QUEUE_BUDGET_MINI_APP,
+    QUEUE_BUDGET_BULK
+)
+from services.ollama_client import ollama_client, base_url
+from services.scheduler import (
+    OllamaScheduler,
+    SchedulerOverloaded,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_MINI_APP,
+    PRIORITY_BULK,
+    PRIORITY_NAMES
+)
+from services.metrics import registry, RATE_BUCKETS, TOKEN_BUCKETS
+from services.tracing import span, traced, annotate, record_span
+from services.singleflight import SingleFlight, request_fingerprint
 from services.tools import execute_tool_call
 from services.json_cleaner import (
     clean_json_output,
     repair_lazy_json,
     fix_truncated_json,
     remove_json_comments,
-    clean_and_parse_json
+    clean_and_parse_json,
+    StreamingArrayParser
 )
 
 logger = logging.getLogger(__name__)
 
-base_url = OLLAMA_URL.replace("/api/generate", "").replace("/api/chat", "").rstrip("/")
 CHAT_ENDPOINT = f"{base_url}/api/chat"
 
-def analyze_image(image_file, prompt):
-    """
-    Encodes image to base64 and sends to Ollama vision model.
-    """
-    try:
-        # Reset file pointer if needed
-        image_file.seek(0)
-        img_bytes = image_file.read()
-        b64_img = base64.b64encode(img_bytes).decode('utf-8')
+ollama_scheduler = OllamaScheduler(
+    max_in_flight=OLLAMA_MAX_IN_FLIGHT,
+    budgets={
+        PRIORITY_INTERACTIVE: QUEUE_BUDGET_INTERACTIVE or None,
+        PRIORITY_MINI_APP: QUEUE_BUDGET_MINI_APP or None,
+        PRIORITY_BULK: QUEUE_BUDGET_BULK or None,
+    }
+)
+chat_singleflight = SingleFlight()
 
-        return query_ollama(prompt, images=[b64_img], temperature=0.2)
-    except Exception as e:
-        logger.error(f"Image Analysis Error: {e}")
-        return None
+# --- METRICS ---
+# kind: "chat" (query_ollama), "chat_stream" (stream_ollama), "json_stream" (stream_ollama_json)
+OLLAMA_REQUESTS = registry.counter(
+    "bioflow_ollama_requests_total", "Ollama /api/chat calls by outcome.", ["kind", "priority", "outcome"])
+OLLAMA_DURATION = registry.histogram(
+    "bioflow_ollama_request_duration_seconds", "Seconds from sending an Ollama call to its last token.", ["kind"])
+OLLAMA_TTFT = registry.histogram(
+    "bioflow_ollama_time_to_first_token_seconds", "Seconds until the first generated token.", ["kind"])
+OLLAMA_PROMPT_TOKENS = registry.histogram(
+    "bioflow_ollama_prompt_tokens", "Prompt tokens evaluated per call (prompt_eval_count).", ["kind"],
+    buckets=TOKEN_BUCKETS)
+OLLAMA_EVAL_TOKENS = registry.histogram(
+    "bioflow_ollama_eval_tokens", "Tokens generated per call (eval_count).", ["kind"], buckets=TOKEN_BUCKETS)
+OLLAMA_TOKENS_PER_SECOND = registry.histogram(
+    "bioflow_ollama_tokens_per_second", "Generation speed, eval_count / eval_duration.", ["kind"],
+    buckets=RATE_BUCKETS)
+registry.gauge("bioflow_ollama_in_flight", "Ollama calls holding a scheduler slot.",
+               function=lambda: ollama_scheduler.stats()["in_flight"])
+registry.gauge("bioflow_ollama_queue_depth", "Calls waiting for an Ollama slot.", ["priority"],
+               function=lambda: {(name,): n for name, n in ollama_scheduler.stats()["queue_depth_by_class"].items()})
+
+
+class CallMetrics:
+    """Timings for one /api/chat call, started once it holds a scheduler slot (queue wait is separate)."""
+    __slots__ = ("kind", "priority", "started", "first_token_at")
+
+    def __init__(self, kind, priority):
+        self.kind = kind
+        self.priority = PRIORITY_NAMES.get(priority, str(priority))
+        self.started = time.perf_counter()
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def failed(self):
+        OLLAMA_REQUESTS.inc(kind=self.kind, priority=self.priority, outcome="error")
 
+    def cancelled(self):
+        """The client disconnected mid-stream and the upstream call was closed early."""
+        OLLAMA_REQUESTS.inc(kind=self.kind, priority=self.priority, outcome="cancelled")
 
-def query_ollama(prompt, system_instruction=None, tools_enabled=False, temperature=0.1, retries=1, images=None):
+    def finished(self, final):
+        """`final` is Ollama's last message (done: true), or {} if the stream was cut short."""
+        kind = self.kind
+        OLLAMA_REQUESTS.inc(kind=kind, priority=self.priority, outcome="ok")
+        OLLAMA_DURATION.observe(time.perf_counter() - self.started, kind=kind)
+        if self.first_token_at is not None:
+            OLLAMA_TTFT.observe(self.first_token_at - self.started, kind=kind)
+        elif final.get("total_duration") and final.get("eval_duration"):
+            # Not streamed: model load + prompt evaluation, as timed by Ollama
+            OLLAMA_TTFT.observe(max(0, final["total_duration"] - final["eval_duration"]) / 1e9, kind=kind)
+        if final.get("prompt_eval_count"):
+            OLLAMA_PROMPT_TOKENS.observe(final["prompt_eval_count"], kind=kind)
+        if final.get("eval_count"):
+            OLLAMA_EVAL_TOKENS.observe(final["eval_count"], kind=kind)
+            if final.get("eval_duration"):
+                OLLAMA_TOKENS_PER_SECOND.observe(final["eval_count"] / (final["eval_duration"] / 1e9), kind=kind)
+
+        # Trace: where the call's time went
+        annotate(prompt_eval_count=final.get("prompt_eval_count"), eval_count=final.get("eval_count"),
+                 prompt_eval_ms=final.get("prompt_eval_duration", 0) / 1e6, eval_ms=final.get("eval_duration", 0) / 1e6,
+                 load_ms=final.get("load_duration", 0) / 1e6)
+        if self.first_token_at is not None:
+            record_span("ollama.prompt_eval", self.started, self.first_token_at)
+            record_span("ollama.generate", self.first_token_at, time.perf_counter())
+
+
+def build_messages(prompt, system_instruction=None, images=None):
     messages = []
     if system_instruction:
         messages.append({"role": "system", "content": system_instruction})
@@ -43,29 +124,122 @@ def query_ollama(prompt, system_instruction=None, tools_enabled=False, temperatu
     if images:
         user_msg["images"] = images
     messages.append(user_msg)
+    return messages
 
+
+def build_payload(messages, temperature, stream, json_format=False):
+    """The /api/chat request body shared by the sync calls here and services/async_ollama.py."""
     payload = {
         "model": OLLAMA_MODEL,
         "messages": messages,
-        "format": "json",
-        "stream": False,
+        "stream": stream,
         "options": {"temperature": temperature, "num_ctx": 4096}
     }
+    if json_format:
+        payload["format"] = "json"
+    return payload
+
+
+class ChatStreamFilter:
+    """
+    Decides from the first characters of a streamed chat answer whether it is prose
+    (passed through as it arrives) or a JSON tool call (buffered, then run at the end).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.is_tool_check = True
+        self.is_tool = False
+
+    def feed(self, chunk_content):
+        """Text to send on now ("" while still buffering)."""
+        if self.is_tool_check:
+            self.buffer += chunk_content
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return ""
+
+            if stripped.startswith('{') or stripped.startswith('```'):
+                self.is_tool = True
+                self.is_tool_check = False
+            elif len(stripped) > 10: # Increased buffer safety
+                self.is_tool = False
+                self.is_tool_check = False
+                text, self.buffer = self.buffer, ""
+                return text
+            return ""
 
+        if self.is_tool:
+            self.buffer += chunk_content
+            return ""
+        return chunk_content
+
+    def close(self):
+        """Text left once the stream ends: the tool's result, or whatever is still buffered."""
+        if self.is_tool:
+            # Try to parse buffer as JSON tool call
+            data = clean_and_parse_json(self.buffer)
+            if data and "tool" in data:
+                res = execute_tool_call(data["tool"], data.get("args", {}))
+                return f"✅ Analysis: {res}"
+            # Failed to parse tool or just weird text, send the raw buffer
+        return self.buffer
+
+
+def analyze_image(image_file, prompt):
+    """
+    Encodes image to base64 and sends to Ollama vision model.
+    """
     try:
-        r = requests.post(CHAT_ENDPOINT, json=payload, timeout=60)
+        # Reset file pointer if needed
+        image_file.seek(0)
+        img_bytes = image_file.read()
+        b64_img = base64.b64encode(img_bytes).decode('utf-8')
 
-        if r.status_code != 200:
-            logger.error(f"AI Error: API returned status code {r.status_code}: {r.text[:200]}")
-            return None
+        return query_ollama(prompt, images=[b64_img], temperature=0.2)
+    except Exception as e:
+        logger.error(f"Image Analysis Error: {e}")
+        return None
 
+
+@traced("ollama.chat")
+def _chat_completion(payload, priority):
+    """One non-streaming /api/chat call through the scheduler. Returns the message text, or None on HTTP errors."""
+    with ollama_scheduler.slot(priority):
+        metrics = CallMetrics("chat", priority)
         try:
-            response_json = r.json()
-        except ValueError:
-             logger.error(f"AI Error: Invalid JSON response. Status: {r.status_code}, Body: {r.text[:200]}")
-             return None
+            r = ollama_client.post(CHAT_ENDPOINT, json=payload)
+        except Exception:
+            metrics.failed()
+            raise
+
+    if r.status_code != 200:
+        metrics.failed()
+        logger.error(f"AI Error: API returned status code {r.status_code}: {r.text[:200]}")
+        return None
 
-        response_text = response_json.get('message', {}).get('content', '')
+    try:
+        response_json = r.json()
+    except ValueError:
+        metrics.failed()
+        logger.error(f"AI Error: Invalid JSON response. Status: {r.status_code}, Body: {r.text[:200]}")
+        return None
+
+    metrics.finished(response_json)
+    return response_json.get('message', {}).get('content', '')
+
+
+@traced("ollama.query")
+def query_ollama(prompt, system_instruction=None, tools_enabled=False, temperature=0.1, retries=1, images=None,
+                 priority=PRIORITY_MINI_APP):
+    payload = build_payload(build_messages(prompt, system_instruction, images), temperature,
+                            stream=False, json_format=True)
+
+    try:
+        # Identical concurrent prompts share one upstream request
+        response_text = chat_singleflight.do(request_fingerprint(payload), _chat_completion, payload, priority)
+        if response_text is None:
+            return None
 
         # Use the robust cleaner
         data = clean_and_parse_json(response_text)
@@ -73,88 +247,123 @@ def query_ollama(prompt, system_instruction=None, tools_enabled=False, temperatu
         if data is None and retries > 0:
             logger.warning("🔄 JSON Failed. Retrying with stricter prompt...")
             prompt += "\nIMPORTANT: You previously outputted invalid JSON. Fix syntax. Ensure all keys are present."
-            return query_ollama(prompt, system_instruction, tools_enabled, temperature, retries - 1, images)
+            return query_ollama(prompt, system_instruction, tools_enabled, temperature, retries - 1, images, priority)
 
         # Tool Logic
         if tools_enabled and isinstance(data, dict) and "tool" in data:
             res = execute_tool_call(data["tool"], data.get("args", {}))
             return query_ollama(f"Tool Result: {res}. Answer user JSON.", system_instruction=system_instruction,
-                                tools_enabled=False)
+                                tools_enabled=False, priority=priority)
 
         return data
+    except SchedulerOverloaded as e:
+        # Load shedding: the caller serves its fallback instead of queueing further
+        logger.warning(f"⏳ Shedding AI request: {e}")
+        return None
     except Exception as e:
         logger.error(f"AI Error: {e}")
         return None
 
-def stream_ollama(messages, temperature=0.1):
+def stream_ollama_json(prompt, system_instruction=None, temperature=0.1, priority=PRIORITY_BULK):
+    """
+    Streams a JSON-array answer and yields each element as soon as it is complete,
+    so a 7-day plan arrives day by day instead of all at once.
+    Yields nothing if the model is unavailable or the request is shed; callers fall back.
+    """
+    payload = build_payload(build_messages(prompt, system_instruction), temperature, stream=True, json_format=True)
+
+    parser = StreamingArrayParser()
+    metrics = None
+    try:
+        with span("ollama.json_stream"), ollama_scheduler.slot(priority):
+            metrics = CallMetrics("json_stream", priority)
+            with ollama_client.post(CHAT_ENDPOINT, json=payload, stream=True) as r:
+                if r.status_code != 200:
+                    metrics.failed()
+                    logger.error(f"AI Stream Error: {r.status_code}")
+                    return
+
+                final = {}
+                for line in r.iter_lines():
+                    if not line: continue
+                    try:
+                        chunk_json = json.loads(line)
+                    except ValueError as e:
+                        logger.error(f"Stream Parse Error: {e}")
+                        continue
+                    chunk_content = chunk_json.get("message", {}).get("content", "")
+                    if chunk_json.get("done"):
+                        final = chunk_json
+                    if chunk_content:
+                        metrics.first_token()
+                        yield from parser.feed(chunk_content)
+                    if parser.done:
+                        break
+                metrics.finished(final)
+
+        # A truncated answer still yields its balanced last element
+        yield from parser.close()
+
+    except SchedulerOverloaded as e:
+        logger.warning(f"⏳ Shedding AI stream: {e}")
+    except Exception as e:
+        if metrics:
+            metrics.failed()
+        logger.error(f"AI Stream Exception: {e}")
+
+
+def stream_ollama(messages, temperature=0.1, priority=PRIORITY_INTERACTIVE):
     """
     Streams response from Ollama.
     Handles tool detection if output looks like JSON.
-    Yields chunks of text.
+    Yields chunks of text. The scheduler slot is held until the stream ends
+    (or the client disconnects and the generator is closed).
     """
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": messages,
-        "stream": True,
-        "options": {"temperature": temperature, "num_ctx": 4096}
-    }
+    payload = build_payload(messages, temperature, stream=True)
 
+    metrics = None
     try:
-        with requests.post(CHAT_ENDPOINT, json=payload, stream=True) as r:
-            if r.status_code != 200:
-                logger.error(f"AI Stream Error: {r.status_code}")
-                yield "I'm having trouble connecting to my brain right now."
-                return
-
-            buffer = ""
-            is_tool_check = True
-            is_tool = False
-
-            for line in r.iter_lines():
-                if not line: continue
-                try:
-                    chunk_json = json.loads(line)
-                    chunk_content = chunk_json.get("message", {}).get("content", "")
+        with span("ollama.chat_stream"), ollama_scheduler.slot(priority):
+            metrics = CallMetrics("chat_stream", priority)
+            with ollama_client.post(CHAT_ENDPOINT, json=payload, stream=True) as r:
+                if r.status_code != 200:
+                    metrics.failed()
+                    logger.error(f"AI Stream Error: {r.status_code}")
+                    yield "I'm having trouble connecting to my brain right now."
+                    return
 
-                    if not chunk_content: continue
-
-                    if is_tool_check:
-                        buffer += chunk_content
-                        stripped = buffer.lstrip()
-                        if not stripped:
-                            continue
-
-                        if stripped.startswith('{') or stripped.startswith('```'):
-                            is_tool = True
-                            is_tool_check = False
-                        elif len(stripped) > 10: # Increased buffer safety
-                            is_tool = False
-                            is_tool_check = False
-                            yield buffer
-                            buffer = ""
-                        continue
+                text_filter = ChatStreamFilter()
+                final = {}
+
+                for line in r.iter_lines():
+                    if not line: continue
+                    try:
+                        chunk_json = json.loads(line)
+                        chunk_content = chunk_json.get("message", {}).get("content", "")
+                        if chunk_json.get("done"):
+                            final = chunk_json
+
+                        if not chunk_content: continue
+                        metrics.first_token()
+
+                        text = text_filter.feed(chunk_content)
+                        if text:
+                            yield text
+
+                    except Exception as e:
+                        logger.error(f"Stream Parse Error: {e}")
 
-                    if is_tool:
-                        buffer += chunk_content
-                    else:
-                        yield chunk_content
-
-                except Exception as e:
-                    logger.error(f"Stream Parse Error: {e}")
-
-            # End of stream
-            if is_tool:
-                # Try to parse buffer as JSON tool call
-                data = clean_and_parse_json(buffer)
-                if data and "tool" in data:
-                    res = execute_tool_call(data["tool"], data.get("args", {}))
-                    yield f"✅ Analysis: {res}"
-                else:
-                    # Failed to parse tool or just weird text, yield the raw buffer
-                    yield buffer
-            elif buffer: # Flush remaining buffer if any (unlikely unless loop exited early)
-                yield buffer
+                # End of stream
+                metrics.finished(final)
+                tail = text_filter.close()
+                if tail:
+                    yield tail
 
+    except SchedulerOverloaded as e:
+        logger.warning(f"⏳ Shedding AI stream: {e}")
+        yield "I'm helping a lot of people right now. Please try again in a moment."
     except Exception as e:
+        if metrics:
+            metrics.failed()
         logger.error(f"AI Stream Exception: {e}")
         yield "System Error."
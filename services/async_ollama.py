@@ -0,0 +1,238 @@
+"""
+asyncio-native Ollama calls, used by the ASGI entry point (asgi.py).
+
+A call in flight here costs a coroutine, not a worker thread, so open chat
+streams are limited by Ollama rather than by the thread pool. Admission goes
+through the same OllamaScheduler as the sync calls in ai_service (they share
+Ollama's capacity), and payloads, metrics, spans, JSON repair and tool calls
+are ai_service's. Sync callers are unaffected.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+import httpx
+
+from config import OLLAMA_POOL_SIZE
+from services import ai_service
+from services.ai_service import (
+    CallMetrics,
+    ChatStreamFilter,
+    build_messages,
+    build_payload,
+    chat_singleflight,
+    ollama_scheduler
+)
+from services.json_cleaner import clean_and_parse_json
+from services.ollama_client import ollama_client
+from services.scheduler import SchedulerOverloaded, PRIORITY_INTERACTIVE, PRIORITY_MINI_APP
+from services.singleflight import request_fingerprint
+from services.tools import execute_tool_call
+from services.tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaClient:
+    """
+    Shared httpx.AsyncClient for Ollama: one keep-alive pool of `pool_size`
+    connections, with the sync client's per-endpoint timeouts. A pool belongs to
+    an event loop, so there is one per loop, created lazily inside it (a server
+    has one loop; tests start a new one per case). aclose() closes them all, on
+    their own loops; call it before a loop ends, as asgi.py's lifespan does.
+    """
+
+    def __init__(self, pool_size=10, timeouts=None):
+        self.pool_size = pool_size
+        # Anything with timeout_for(url, stream) -> (connect, read); by default the sync OllamaClient
+        self._timeouts = timeouts or ollama_client
+        self._clients = {}  # event loop -> httpx.AsyncClient
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    @property
+    def http(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                self._forget_closed_loops()
+                limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                client = self._clients[loop] = httpx.AsyncClient(limits=limits, headers={"Connection": "keep-alive"})
+        return client
+
+    def _forget_closed_loops(self):
+        # Their sockets can no longer be closed cleanly; only aclose() before the loop ends does that
+        for loop in [loop for loop in self._clients if loop.is_closed()]:
+            if not self._clients.pop(loop).is_closed:
+                logger.warning("⚠️ Dropped the Ollama pool of an event loop that ended without aclose()")
+
+    def timeout_for(self, url, stream=False):
+        connect, read = self._timeouts.timeout_for(url, stream)
+        return httpx.Timeout(read, connect=connect)
+
+    def _count(self, failed=False):
+        with self._lock:
+            self._requests += 1
+            self._errors += failed
+
+    async def post(self, url, json=None):
+        try:
+            response = await self.http.post(url, json=json, timeout=self.timeout_for(url))
+        except Exception:
+            self._count(failed=True)
+            raise
+        self._count()
+        return response
+
+    def stream(self, url, json=None):
+        """`async with client.stream(url, json=...) as r`. Leaving the block early closes the connection."""
+        self._count()
+        return self.http.stream("POST", url, json=json, timeout=self.timeout_for(url, stream=True))
+
+    def stats(self):
+        with self._lock:
+            return {"pool_size": self.pool_size, "pools": len(self._clients), "requests": self._requests,
+                    "errors": self._errors}
+
+    async def aclose(self):
+        """Closes every loop's pool: this loop's here, other running loops' on their own loop."""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for loop, client in clients.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+            elif not client.is_closed:
+                logger.warning("⚠️ Dropped the Ollama pool of an event loop that ended without aclose()")
+
+
+async_ollama_client = AsyncOllamaClient(pool_size=OLLAMA_POOL_SIZE)
+
+
+@traced("ollama.chat")
+async def _chat_completion(payload, priority):
+    """Async ai_service._chat_completion. Returns the message text, or None on HTTP errors."""
+    async with ollama_scheduler.async_slot(priority):
+        metrics = CallMetrics("chat", priority)
+        try:
+            r = await async_ollama_client.post(ai_service.CHAT_ENDPOINT, json=payload)
+        except Exception:
+            metrics.failed()
+            raise
+
+    if r.status_code != 200:
+        metrics.failed()
+        logger.error(f"AI Error: API returned status code {r.status_code}: {r.text[:200]}")
+        return None
+
+    try:
+        response_json = r.json()
+    except ValueError:
+        metrics.failed()
+        logger.error(f"AI Error: Invalid JSON response. Status: {r.status_code}, Body: {r.text[:200]}")
+        return None
+
+    metrics.finished(response_json)
+    return response_json.get('message', {}).get('content', '')
+
+
+@traced("ollama.query")
+async def query_ollama(prompt, system_instruction=None, tools_enabled=False, temperature=0.1, retries=1, images=None,
+                       priority=PRIORITY_MINI_APP):
+    """Async ai_service.query_ollama: the parsed JSON answer, or None (callers serve their fallback)."""
+    payload = build_payload(build_messages(prompt, system_instruction, images), temperature,
+                            stream=False, json_format=True)
+
+    try:
+        # Coalesces with identical prompts in flight, from threads or coroutines
+        response_text = await chat_singleflight.do_async(request_fingerprint(payload), _chat_completion, payload,
+                                                         priority)
+        if response_text is None:
+            return None
+
+        data = clean_and_parse_json(response_text)
+
+        if data is None and retries > 0:
+            logger.warning("🔄 JSON Failed. Retrying with stricter prompt...")
+            prompt += "\nIMPORTANT: You previously outputted invalid JSON. Fix syntax. Ensure all keys are present."
+            return await query_ollama(prompt, system_instruction, tools_enabled, temperature, retries - 1, images,
+                                      priority)
+
+        if tools_enabled and isinstance(data, dict) and "tool" in data:
+            res = execute_tool_call(data["tool"], data.get("args", {}))
+            return await query_ollama(f"Tool Result: {res}. Answer user JSON.", system_instruction=system_instruction,
+                                      tools_enabled=False, priority=priority)
+
+        return data
+    except SchedulerOverloaded as e:
+        logger.warning(f"⏳ Shedding AI request: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"AI Error: {e}")
+        return None
+
+
+async def stream_ollama(messages, temperature=0.1, priority=PRIORITY_INTERACTIVE):
+    """
+    Async ai_service.stream_ollama: yields text chunks. Cancelling the consuming
+    task (the client disconnected) closes the upstream connection, which stops
+    Ollama generating, and frees the scheduler slot at once.
+    """
+    payload = build_payload(messages, temperature, stream=True)
+
+    metrics = None
+    try:
+        with span("ollama.chat_stream"):
+            async with ollama_scheduler.async_slot(priority):
+                metrics = CallMetrics("chat_stream", priority)
+                async with async_ollama_client.stream(ai_service.CHAT_ENDPOINT, json=payload) as r:
+                    if r.status_code != 200:
+                        metrics.failed()
+                        logger.error(f"AI Stream Error: {r.status_code}")
+                        yield "I'm having trouble connecting to my brain right now."
+                        return
+
+                    text_filter = ChatStreamFilter()
+                    final = {}
+
+                    async for line in r.aiter_lines():
+                        if not line: continue
+                        try:
+                            chunk_json = json.loads(line)
+                        except ValueError as e:
+                            logger.error(f"Stream Parse Error: {e}")
+                            continue
+                        chunk_content = chunk_json.get("message", {}).get("content", "")
+                        if chunk_json.get("done"):
+                            final = chunk_json
+                        if not chunk_content: continue
+                        metrics.first_token()
+
+                        text = text_filter.feed(chunk_content)
+                        if text:
+                            yield text
+
+                    metrics.finished(final)
+                    metrics = None  # Recorded; a disconnect from here on is not a cancelled call
+                    tail = text_filter.close()
+                    if tail:
+                        yield tail
+
+    except SchedulerOverloaded as e:
+        logger.warning(f"⏳ Shedding AI stream: {e}")
+        yield "I'm helping a lot of people right now. Please try again in a moment."
+    except (asyncio.CancelledError, GeneratorExit):
+        if metrics:
+            metrics.cancelled()
+        logger.info("🔌 Chat stream cancelled; closed the Ollama request")
+        raise
+    except Exception as e:
+        if metrics:
+            metrics.failed()
+        logger.error(f"AI Stream Exception: {e}")
+        yield "System Error."
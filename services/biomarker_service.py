@@ -0,0 +1,147 @@
+import logging
+import re
+from data.biomarkers import BIOMARKERS, UNIT_ALIASES
+
+logger = logging.getLogger(__name__)
+
+# synonym -> reference entry; longest spellings are tried first so
+# "ldl cholesterol calc" wins over "cholesterol"
+_SYNONYMS = {}
+for _entry in BIOMARKERS:
+    for _spelling in [_entry["name"].lower()] + _entry["synonyms"]:
+        _SYNONYMS.setdefault(_spelling, _entry)
+
+_NAME = re.compile(
+    r'^\W{0,3}(' + '|'.join(re.escape(s) for s in sorted(_SYNONYMS, key=len, reverse=True)) + r')(?![a-z0-9])',
+    re.IGNORECASE
+)
+_UNIT = re.compile(
+    r'(' + '|'.join(re.escape(u) for u in sorted(UNIT_ALIASES, key=len, reverse=True)) + r')(?![a-z0-9])',
+    re.IGNORECASE
+)
+# After the name: up to 40 chars of qualifiers ("(serum)", ", Total"), then the value
+_VALUE = re.compile(r'^[^\d<>]{0,40}?(?P<cmp>[<>]=?)?\s*(?P<value>\d+(?:[.,]\d+)?)(?![\d/])')
+_RANGE = re.compile(r'(?P<low>\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?)'
+                    r'|(?P<op>[<>]=?)\s*(?P<bound>\d+(?:\.\d+)?)')
+_FLAG = re.compile(r'(?<![a-z])(H|L|HIGH|LOW|A)(?![a-z])', re.IGNORECASE)
+_PATIENT = re.compile(r'(?i:patient(?:\s+name)?|name)\s*[:\-]\s*([A-Z][A-Za-z\'\-]+(?:[ ,]+[A-Z][A-Za-z\'\-]+){0,3})')
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+def _format(value):
+    return f"{value:g}"
+
+
+def _status(value, unit, low, high, flag, entry):
+    """Low/High/Normal from the report's own range first, then its H/L flag, then the default range."""
+    if low is not None or high is not None:
+        if low is not None and value < low:
+            return "Low"
+        if high is not None and value > high:
+            return "High"
+        return "Normal"
+    if flag:
+        return {"h": "High", "high": "High", "l": "Low", "low": "Low"}.get(flag.lower(), "Abnormal")
+
+    factor = 1.0 if unit in (None, entry["unit"]) else entry["convert"].get(unit)
+    if factor is None:
+        return "Unknown"
+    value *= factor
+    low, high = entry["range"]
+    if low is not None and value < low:
+        return "Low"
+    if high is not None and value > high:
+        return "High"
+    return "Normal"
+
+
+def parse_row(cells):
+    """
+    One biomarker from a table row / text line, or None.
+    `cells` is a list of cell strings (a single string is treated as one cell).
+    """
+    if isinstance(cells, str):
+        cells = [cells]
+    line = " ".join(c.strip() for c in cells if c and c.strip())
+    name = _NAME.match(line)
+    if not name:
+        return None
+    synonym = name.group(1)
+    entry = _SYNONYMS[synonym.lower()]
+    rest = line[name.end():]
+
+    value = _VALUE.match(rest)
+    if not value:
+        return None
+    tail = rest[value.end():]
+
+    unit = None
+    unit_match = _UNIT.match(tail.lstrip())
+    if unit_match:
+        unit = UNIT_ALIASES[unit_match.group(1).lower()]
+        tail = tail.lstrip()[unit_match.end():]
+
+    low = high = None
+    range_match = _RANGE.search(tail)
+    if range_match:
+        if range_match.group('low'):
+            low, high = _number(range_match.group('low')), _number(range_match.group('high'))
+        elif range_match.group('op').startswith('<'):
+            high = _number(range_match.group('bound'))
+        else:
+            low = _number(range_match.group('bound'))
+        flag_text = tail[:range_match.start()] + tail[range_match.end():]
+    else:
+        flag_text = tail
+    flag = _FLAG.search(flag_text)
+    flag = flag.group(1) if flag else None
+
+    # Without a unit or range, only "<name>[:] <value>" counts; short spellings ("Na", "K", "Hb") never do
+    if unit is None and range_match is None:
+        if len(synonym) <= 3 or re.search(r'[a-z]', value.group(0), re.IGNORECASE):
+            return None
+
+    number = _number(value.group('value'))
+    marker = {
+        "name": entry["name"],
+        "value": (value.group('cmp') or '') + _format(number),
+        "unit": unit or entry["unit"],
+        "status": _status(number, unit, low, high, flag, entry),
+    }
+    if low is not None or high is not None:
+        marker["range"] = f"{_format(low) if low is not None else ''}-{_format(high) if high is not None else ''}"
+    return marker
+
+
+def extract_biomarkers(rows, text=""):
+    """
+    Biomarkers from table rows / word-position rows (see pdf_service), then from the
+    plain text lines. The first reading of each marker wins, in report order.
+    """
+    found = {}
+    for source in (rows or [], (text or "").splitlines()):
+        for row in source:
+            try:
+                marker = parse_row(row)
+            except (ValueError, TypeError):
+                continue
+            if marker and marker["name"] not in found:
+                found[marker["name"]] = marker
+    return list(found.values())
+
+
+def extract_patient_name(text):
+    match = _PATIENT.search(text or "")
+    return match.group(1).strip(" ,") if match else None
+
+
+def biomarker_digest(biomarkers):
+    """Compact one-line-per-marker summary used in place of the raw report text in prompts."""
+    lines = []
+    for b in biomarkers:
+        ref = f", ref {b['range']}" if b.get("range") else ""
+        lines.append(f"- {b['name']}: {b['value']} {b['unit']} ({b['status']}{ref})")
+    return "\n".join(lines)
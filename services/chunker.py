@@ -0,0 +1,152 @@
+import re
+from collections import Counter, namedtuple
+from services.biomarker_service import parse_row
+
+# Bump when chunk boundaries change, so cached ingests are rebuilt
+CHUNKER_VERSION = "2"
+
+MIN_CHUNK_TOKENS = 5
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_LINE = re.compile(r"[^\n]+")
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+_WORD = re.compile(r"\S+")
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+
+# One line (or piece of an over-long line) of the report; start/end are offsets in the full text
+_Unit = namedtuple("_Unit", "text page start end kind")
+
+
+def count_tokens(text):
+    """Word/punctuation count, a close stand-in for the embedding model's tokenizer."""
+    return len(_TOKEN.findall(text))
+
+
+def _signature(line):
+    """Line identity for header/footer matching: page numbers and dates differ between pages."""
+    return _SPACES.sub(" ", _DIGITS.sub("#", line)).strip().lower()
+
+
+def _repeated_margins(pages, margin=2):
+    """Signatures of lines that open or close at least half the pages (2 pages minimum)."""
+    if len(pages) < 2:
+        return set()
+    seen = Counter()
+    for _, _, text in pages:
+        lines = [line for line in text.splitlines() if line.strip()]
+        seen.update({_signature(line) for line in lines[:margin] + lines[-margin:]})
+    threshold = max(2, (len(pages) + 1) // 2)
+    return {sig for sig, count in seen.items() if count >= threshold}
+
+
+def _is_row(line):
+    """Table/measurement rows: a recognised biomarker, or a short, unpunctuated line with several numbers."""
+    if parse_row(line) is not None:
+        return True
+    return len(_DIGITS.findall(line)) >= 2 and count_tokens(line) <= 16 and not line.endswith('.')
+
+
+def _split_long(line, offset, max_tokens):
+    """(text, start, end) windows of at most max_tokens, cut at sentence ends where possible."""
+    pieces = []
+    for sentence in _SENTENCE.finditer(line):
+        base = offset + sentence.start()
+        window = []
+        for word in _WORD.finditer(sentence.group()):
+            window.append(word)
+            if count_tokens(" ".join(w.group() for w in window)) >= max_tokens:
+                pieces.append((" ".join(w.group() for w in window), base + window[0].start(), base + window[-1].end()))
+                window = []
+        if window:
+            pieces.append((" ".join(w.group() for w in window), base + window[0].start(), base + window[-1].end()))
+    return pieces
+
+
+def _page_units(page, base, text, max_tokens, margins, margin=2):
+    lines = [(m.group().strip(), base + m.start(), base + m.end()) for m in _LINE.finditer(text) if m.group().strip()]
+    if margins:
+        # Only the page's own top/bottom lines can be running headers/footers
+        edge = set(range(margin)) | set(range(len(lines) - margin, len(lines)))
+        lines = [line for i, line in enumerate(lines) if i not in edge or _signature(line[0]) not in margins]
+
+    units = []
+    for i, (line, start, end) in enumerate(lines):
+        if _is_row(line):
+            kind = "row"
+        elif i + 1 < len(lines) and _is_row(lines[i + 1][0]) and count_tokens(line) <= 12:
+            kind = "header"  # caption / column titles above a run of rows
+        else:
+            kind = "text"
+
+        if count_tokens(line) <= max_tokens:
+            units.append(_Unit(line, page, start, end, kind))
+        else:
+            units.extend(_Unit(piece, page, s, e, "text") for piece, s, e in _split_long(line, start, max_tokens))
+    return units
+
+
+def chunk_pages(pages, max_tokens=200, overlap_tokens=40):
+    """
+    Splits report pages into RAG chunks of at most ~max_tokens.
+    `pages` is a list of (page_number, offset_in_full_text, page_text).
+
+    - Headers/footers repeated across pages are dropped.
+    - Lines are packed whole, so a table row is never cut in half; when a table
+      continues into the next chunk, its header line is repeated there.
+    - Consecutive chunks share up to overlap_tokens of trailing lines.
+    - Duplicate chunks are dropped.
+
+    Returns [{"text", "page", "start", "end"}], offsets into the full text.
+    """
+    margins = _repeated_margins(pages)
+    units = []
+    for page, base, text in pages:
+        units.extend(_page_units(page, base, text, max_tokens, margins))
+
+    chunks = []
+    seen = set()
+
+    def emit(window):
+        text = "\n".join(u.text for u in window)
+        key = _SPACES.sub(" ", text).lower()
+        if count_tokens(text) < MIN_CHUNK_TOKENS or key in seen:
+            return
+        seen.add(key)
+        chunks.append({
+            "text": text,
+            "page": window[0].page,
+            "start": min(u.start for u in window),
+            "end": max(u.end for u in window),
+        })
+
+    window, size = [], 0
+    table_header = None
+    for unit in units:
+        tokens = count_tokens(unit.text)
+        if window and size + tokens > max_tokens:
+            emit(window)
+            carry, carried = [], 0
+            for prev in reversed(window):
+                prev_tokens = count_tokens(prev.text)
+                if carried + prev_tokens > overlap_tokens:
+                    break
+                carry.insert(0, prev)
+                carried += prev_tokens
+            if unit.kind == "row" and table_header and table_header not in carry:
+                carry.insert(0, table_header)
+                carried += count_tokens(table_header.text)
+            while carry and carried + tokens > max_tokens:
+                carried -= count_tokens(carry.pop(0).text)
+            window, size = carry, carried
+
+        window.append(unit)
+        size += tokens
+        if unit.kind == "header":
+            table_header = unit
+        elif unit.kind == "text":
+            table_header = None
+
+    if window:
+        emit(window)
+    return chunks
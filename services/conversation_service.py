@@ -0,0 +1,195 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import CHAT_PROMPT_BUDGET_TOKENS, CHAT_SUMMARY_TRIGGER, CHAT_SUMMARY_KEEP
+from services.ai_service import query_ollama
+from services.scheduler import PRIORITY_BULK
+from services.chunker import count_tokens
+from services.session_service import get_session, update_session, session_lock_for
+from services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# What is left of the budget after the instructions, patient summary and new message.
+# Unused summary/RAG tokens go to history.
+BUDGET_SHARES = {"summary": 0.15, "rag": 0.35}
+RAG_SEPARATOR = "\n---\n"
+
+CHAT_INSTRUCTIONS = """
+    You are a helpful Functional Doctor Assistant.
+    PATIENT SUMMARY: {summary}
+    EARLIER IN THIS CONVERSATION: {conversation_summary}
+    RELEVANT MEDICAL CONTEXT: {rag_context}
+
+    INSTRUCTIONS:
+    - Answer naturally and empathetically.
+    - Use the context provided to give specific advice.
+    - If the user asks for a calculation (BMI, Calories), output ONLY JSON: {{ "tool": "calculate_bmi", "args": {{...}} }}
+    - Otherwise, output plain text (Markdown supported). Do NOT use JSON for normal chat.
+    """
+
+
+def truncate_tokens(text, budget):
+    """Cuts text to roughly `budget` tokens at a word boundary."""
+    if count_tokens(text) <= budget:
+        return text
+    words, used = [], 0
+    for word in text.split():
+        used += count_tokens(word)
+        if used > budget:
+            break
+        words.append(word)
+    return " ".join(words) + " …" if words else ""
+
+
+def fit_context(rag_context, budget):
+    """Keeps whole RAG chunks, most relevant first, while they fit."""
+    kept, used = [], 0
+    for chunk in (rag_context or "").split(RAG_SEPARATOR):
+        tokens = count_tokens(chunk)
+        if used + tokens > budget:
+            if not kept:
+                kept.append(truncate_tokens(chunk, budget))
+            break
+        kept.append(chunk)
+        used += tokens
+    return RAG_SEPARATOR.join(c for c in kept if c)
+
+
+def fit_history(history, budget):
+    """The most recent messages that fit, oldest first. A single oversized message is shortened."""
+    kept, used = [], 0
+    for msg in reversed(list(history)):
+        tokens = count_tokens(msg["text"])
+        if used + tokens > budget:
+            if not kept and budget > 0:
+                kept.append({"role": msg["role"], "text": truncate_tokens(msg["text"], budget)})
+            break
+        kept.append(msg)
+        used += tokens
+    return kept[::-1]
+
+
+@traced("chat.build_prompt")
+def build_chat_messages(user_session, user_msg, rag_context, budget=CHAT_PROMPT_BUDGET_TOKENS):
+    """
+    The /chat_agent prompt, held to ~budget tokens however long the conversation is.
+    The instructions, patient summary and new message are always included; the rest
+    is shared between the running conversation summary, RAG context and recent turns.
+    """
+    summary = user_session.get('blood_context', {}).get('summary', 'No data.')
+    fixed = count_tokens(CHAT_INSTRUCTIONS) + count_tokens(summary) + count_tokens(user_msg or "")
+    remaining = max(0, budget - fixed)
+
+    conversation_summary = truncate_tokens(user_session.get('conversation_summary') or "None yet.",
+                                           int(remaining * BUDGET_SHARES["summary"]))
+    rag_context = fit_context(rag_context, int(remaining * BUDGET_SHARES["rag"]))
+    history_budget = remaining - count_tokens(conversation_summary) - count_tokens(rag_context)
+    history = fit_history(user_session.get('chat_history', []), history_budget)
+
+    messages = [{"role": "system", "content": CHAT_INSTRUCTIONS.format(
+        summary=summary, conversation_summary=conversation_summary, rag_context=rag_context)}]
+    for msg in history:
+        messages.append({"role": "user" if msg["role"] == "user" else "assistant", "content": msg["text"]})
+    messages.append({"role": "user", "content": user_msg})
+    return messages
+
+
+# ==========================================
+# Background summarization
+# ==========================================
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bioflow-summary")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def summarize_history(token, budget=CHAT_PROMPT_BUDGET_TOKENS):
+    """
+    Folds all but the last CHAT_SUMMARY_KEEP messages into the session's running
+    summary and drops them from the history. Returns True if the session changed.
+    """
+    user_session = get_session(token)
+    with session_lock_for(token):
+        history = list(user_session.get('chat_history', []))
+        previous = user_session.get('conversation_summary') or "None."
+    if len(history) < CHAT_SUMMARY_TRIGGER:
+        return False
+
+    older = history[:-CHAT_SUMMARY_KEEP] if CHAT_SUMMARY_KEEP else history
+    per_message = max(20, budget // (2 * len(older)))
+    transcript = "\n".join(
+        f"{'Patient' if m['role'] == 'user' else 'Doctor'}: {truncate_tokens(m['text'], per_message)}" for m in older
+    )
+    prompt = f"""
+    SUMMARY SO FAR: {previous}
+
+    NEW CONVERSATION TURNS:
+    {transcript}
+
+    TASK: Update the summary so it covers everything above in under 120 words.
+    Keep symptoms, numbers, goals, decisions and advice already given. Drop greetings and small talk.
+    OUTPUT JSON: {{ "summary": "..." }}
+    """
+    data = query_ollama(prompt, system_instruction="You summarize doctor-patient chats. JSON only.",
+                        temperature=0.1, priority=PRIORITY_BULK)
+    new_summary = data.get('summary') if isinstance(data, dict) else None
+    if not new_summary or not isinstance(new_summary, str):
+        logger.warning(f"❌ Chat summary failed for {token}; keeping full history")
+        return False
+    new_summary = truncate_tokens(new_summary, int(budget * BUDGET_SHARES["summary"]))
+
+    def apply(s):
+        current = s['chat_history']
+        # Messages appended while the model was writing stay
+        folded = _summarized_prefix(current, older)
+        if folded is None:
+            return False
+        current.discard_oldest(folded)
+        s['conversation_summary'] = new_summary
+        return True
+
+    changed = update_session(token, apply)
+    if changed:
+        logger.info(f"📝 Folded {len(older)} chat messages into the running summary for {token}")
+    else:
+        logger.warning(f"⚠️ Chat history of {token} changed while it was summarized; summary skipped")
+    return changed
+
+
+def _summarized_prefix(current, older):
+    """
+    How many of the oldest messages in `current` the summary of `older` covers:
+    all of `older`, or what is left of it after CHAT_HISTORY_MAX_TURNS dropped the
+    first ones while the summary was written. None if the history changed otherwise
+    (e.g. it was cleared).
+    """
+    for dropped in range(len(older)):
+        rest = older[dropped:]
+        if current[:len(rest)] == rest:
+            return len(rest)
+    return None
+
+
+def _run_summary(token):
+    try:
+        summarize_history(token)
+    except Exception as e:
+        logger.error(f"Chat summary error for {token}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(token)
+
+
+def schedule_summary(token):
+    """
+    Queues a summary pass once a user's history reaches CHAT_SUMMARY_TRIGGER
+    messages. Runs on a background thread, at most one pending pass per user.
+    Returns the Future, or None if nothing was queued.
+    """
+    if len(get_session(token).get('chat_history', [])) < CHAT_SUMMARY_TRIGGER:
+        return None
+    with _pending_lock:
+        if token in _pending:
+            return None
+        _pending.add(token)
+    return _executor.submit(_run_summary, token)
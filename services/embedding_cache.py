@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-entry bookkeeping on top of the vector bytes (key tuple, OrderedDict node, array header)
+_ENTRY_OVERHEAD = 200
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, sha256(text)).
+    Tier 1 is an in-memory LRU bounded by a byte budget; tier 2 is a SQLite
+    file holding vectors as packed little-endian float32 blobs, so lab-report
+    boilerplate embedded before a restart is not embedded again. Past
+    max_disk_rows the file drops the rows least recently written or read
+    from disk; a disk read's time is written with the next batch of vectors.
+    Pass db_path=None for a memory-only cache.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, db_path=None, max_disk_rows=200000):
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.max_disk_rows = max_disk_rows
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes_since_trim = 0
+        self._disk_reads = {}  # key -> time of a disk hit not yet written to last_used
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_writes": 0}
+
+        if db_path:
+            self._open_db(db_path)
+
+    # --- Disk tier ---
+    def _open_db(self, db_path):
+        try:
+            folder = os.path.dirname(db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            # Files from before last_used start from their creation times
+            if "last_used" not in {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}:
+                conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE embeddings SET last_used = created")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache disabled on disk ({db_path}): {e}")
+            self._conn = None
+
+    def _disk_get(self, model, text_hash):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT dim, vector FROM embeddings WHERE model = ? AND text_hash = ?",
+                (model, text_hash)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache read error: {e}")
+            return None
+        if not row:
+            return None
+        dim, blob = row
+        vector = np.frombuffer(blob, dtype='<f4')
+        return vector if len(vector) == dim else None
+
+    def _disk_put_many(self, entries):
+        """Writes (key, vector) pairs, plus pending disk-read times, in one transaction."""
+        if self._conn is None:
+            return
+        now = time.time()
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(model, text_hash, len(vector), vector.astype('<f4').tobytes(), now, now)
+                 for (model, text_hash), vector in entries]
+            )
+            self._write_disk_reads()
+            self._conn.commit()
+            self.counters["disk_writes"] += len(entries)
+            self._writes_since_trim += len(entries)
+            if self._writes_since_trim >= 500:
+                self._writes_since_trim = 0
+                self._trim_disk()
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache write error: {e}")
+
+    def _write_disk_reads(self):
+        reads, self._disk_reads = self._disk_reads, {}
+        if reads:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE model = ? AND text_hash = ?",
+                [(used, model, text_hash) for (model, text_hash), used in reads.items()]
+            )
+
+    def _trim_disk(self):
+        # Least recently used rows go first once the file holds more than max_disk_rows
+        self._write_disk_reads()
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_disk_rows
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+            self.counters["evictions"] += excess
+
+    # --- Memory tier ---
+    def _remember(self, key, vector):
+        size = vector.nbytes + _ENTRY_OVERHEAD
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes + _ENTRY_OVERHEAD
+        self._memory[key] = vector
+        self._bytes += size
+
+        while self._bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes + _ENTRY_OVERHEAD
+            self.counters["evictions"] += 1
+
+    # --- Public API ---
+    @staticmethod
+    def key_for(model, text):
+        return (model, hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def get(self, model, text):
+        """The cached vector as a list of floats, or None."""
+        key = self.key_for(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters["hits"] += 1
+                return vector.tolist()
+
+            vector = self._disk_get(*key)
+            if vector is not None:
+                self.counters["disk_hits"] += 1
+                self._disk_reads[key] = time.time()
+                self._remember(key, vector)
+                return vector.tolist()
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, model, text, vector):
+        self.set_many(model, [(text, vector)])
+
+    def set_many(self, model, items):
+        """Caches (text, vector) pairs; the disk tier writes them all in one commit. Empty vectors are skipped."""
+        entries = [(self.key_for(model, text), np.asarray(vector, dtype=np.float32))
+                   for text, vector in items if vector is not None and len(vector)]
+        if not entries:
+            return
+        with self._lock:
+            for key, packed in entries:
+                self._remember(key, packed)
+            self._disk_put_many(entries)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+            if disk and self._conn is not None:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._conn is not None,
+            })
+        return stats
+
+    def __len__(self):
+        return len(self._memory)
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IngestCache:
+    """
+    Results of a full PDF ingest (text, chunks, embedding matrix, diagnosis)
+    keyed by the SHA-256 of the uploaded file, so re-uploading the same report
+    skips parsing, embedding and the diagnosis prompt.
+    Entries are stored per `version` (the chat + embedding models): switching
+    models makes old entries miss. Total payload size is capped with LRU
+    eviction on last use. Without db_path the table lives in memory.
+    """
+
+    def __init__(self, version, max_bytes=256 * 1024 * 1024, db_path=None):
+        self.version = version
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "invalidations": 0}
+        self._conn = self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            if db_path:
+                folder = os.path.dirname(db_path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(db_path or ":memory:", check_same_thread=False, timeout=5)
+            if db_path:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingests (
+                    file_hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    chunks TEXT NOT NULL,
+                    matrix BLOB,
+                    dim INTEGER NOT NULL,
+                    diagnosis TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (file_hash, version)
+                )
+            """)
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            logger.error(f"Ingest cache disabled ({db_path}): {e}")
+            return None
+
+    def get(self, file_hash):
+        """Returns {"text", "chunks", "matrix", "diagnosis"} or None."""
+        if self._conn is None:
+            return None
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT text, chunks, matrix, dim, diagnosis FROM ingests WHERE file_hash = ? AND version = ?",
+                    (file_hash, self.version)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE ingests SET last_used = ? WHERE file_hash = ? AND version = ?",
+                        (time.time(), file_hash, self.version)
+                    )
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Ingest cache read error: {e}")
+                row = None
+
+            if not row:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+
+        text, chunks, blob, dim, diagnosis = row
+        matrix = None
+        if blob is not None:
+            # Copy: frombuffer over the blob is read-only
+            matrix = np.frombuffer(blob, dtype=np.float32).reshape(-1, dim).copy()
+        return {"text": text, "chunks": json.loads(chunks), "matrix": matrix, "diagnosis": json.loads(diagnosis)}
+
+    def set(self, file_hash, text, chunks, matrix, diagnosis):
+        if self._conn is None:
+            return
+        chunks_json = json.dumps(chunks)
+        diagnosis_json = json.dumps(diagnosis)
+        blob, dim = None, 0
+        if matrix is not None and getattr(matrix, "size", 0):
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            blob, dim = matrix.tobytes(), matrix.shape[1]
+        size = len(text) + len(chunks_json) + len(diagnosis_json) + (len(blob) if blob else 0)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ingests "
+                    "(file_hash, version, text, chunks, matrix, dim, diagnosis, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (file_hash, self.version, text, chunks_json, blob, dim, diagnosis_json, size, time.time())
+                )
+                self.counters["writes"] += 1
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Ingest cache write error: {e}")
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ingests").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT file_hash, version, size FROM ingests ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if not row:
+                break
+            self._conn.execute("DELETE FROM ingests WHERE file_hash = ? AND version = ?", row[:2])
+            total -= row[2]
+            self.counters["evictions"] += 1
+
+    def invalidate(self, file_hash=None):
+        """Drops one file's entries (every version), or everything when file_hash is None. Returns rows removed."""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            if file_hash is None:
+                cursor = self._conn.execute("DELETE FROM ingests")
+            else:
+                cursor = self._conn.execute("DELETE FROM ingests WHERE file_hash = ?", (file_hash,))
+            self._conn.commit()
+            self.counters["invalidations"] += cursor.rowcount
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            entries, total = 0, 0
+            if self._conn is not None:
+                entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ingests").fetchone()
+            stats.update({
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "version": self.version,
+            })
+        return stats
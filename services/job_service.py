@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_WORKERS, JOB_RESULT_TTL
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, kind, owner, dedupe_key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.dedupe_key = dedupe_key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # Bumped on every status change so SSE listeners can wait for "anything new"
+        self.version = 0
+        self.changed = threading.Condition()
+
+    @property
+    def is_finished(self):
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        if self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+def fingerprint(payload):
+    """Stable hash of a JSON-able request body, used to spot identical submissions."""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class JobManager:
+    """
+    Runs long Ollama generations (weekly meal plans, workouts) on a bounded
+    thread pool so the Flask worker can answer with a job id straight away.
+    Identical in-flight submissions from the same user share one job.
+    Finished jobs are kept for `ttl` seconds for polling, then dropped by the
+    next submit, poll or SSE lookup (get) or stats call.
+    """
+
+    def __init__(self, max_workers=2, ttl=600):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bioflow-job")
+        self._jobs = {}
+        self._inflight = {}  # (owner, kind, dedupe_key) -> job id
+        self._lock = threading.Lock()
+
+    def submit(self, owner, kind, fn, *args, dedupe_key=None, **kwargs):
+        """
+        Queues fn(*args, **kwargs). Returns (job, created); created is False
+        when an identical job from this owner is still queued or running.
+        """
+        with self._lock:
+            self._expire()
+            inflight_key = (owner, kind, dedupe_key) if dedupe_key else None
+            if inflight_key and inflight_key in self._inflight:
+                existing = self._jobs.get(self._inflight[inflight_key])
+                if existing and not existing.is_finished:
+                    return existing, False
+
+            job = Job(kind, owner, dedupe_key)
+            self._jobs[job.id] = job
+            if inflight_key:
+                self._inflight[inflight_key] = job.id
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"🧵 Job queued: {kind} ({job.id})")
+        return job, True
+
+    def _set_status(self, job, status, result=None, error=None):
+        with job.changed:
+            job.status = status
+            if status == RUNNING:
+                job.started = time.time()
+            elif status in (DONE, FAILED):
+                job.finished = time.time()
+                job.result = result
+                job.error = error
+            job.version += 1
+            job.changed.notify_all()
+
+    def _run(self, job, fn, args, kwargs):
+        self._set_status(job, RUNNING)
+        try:
+            result = fn(*args, **kwargs)
+            self._set_status(job, DONE, result=result)
+        except Exception as e:
+            logger.error(f"Job Error ({job.kind} {job.id}): {e}")
+            self._set_status(job, FAILED, error="Generation failed")
+        finally:
+            with self._lock:
+                key = (job.owner, job.kind, job.dedupe_key)
+                if self._inflight.get(key) == job.id:
+                    self._inflight.pop(key, None)
+            logger.info(f"🧵 Job {job.status}: {job.kind} ({job.id}) in {job.finished - job.created:.1f}s")
+
+    def _expire(self):
+        # Caller holds self._lock
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def wait_for_change(self, job, seen_version, timeout):
+        """Blocks until the job's version moves past seen_version or timeout elapses."""
+        with job.changed:
+            job.changed.wait_for(lambda: job.version != seen_version, timeout=timeout)
+            return job.version
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            jobs = list(self._jobs.values())
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in jobs:
+            counts[job.status] += 1
+        counts["workers"] = self.max_workers
+        return counts
+
+
+job_manager = JobManager(max_workers=JOB_WORKERS, ttl=JOB_RESULT_TTL)
@@ -1,9 +1,15 @@
 import json
 import re
 import logging
+from services.metrics import registry
+from services.tracing import traced, annotate
 
 logger = logging.getLogger(__name__)
 
+# How each model reply was parsed: "direct", "repaired", "legacy", or "failed" (caller falls back)
+JSON_PARSES = registry.counter(
+    "bioflow_json_parse_total", "Model replies by the clean_and_parse_json path that parsed them.", ["path"])
+
 def clean_json_output(text):
     """
     STACK-BASED CLEANER: Finds the first valid JSON object or array
@@ -172,7 +178,306 @@ def remove_json_comments(text):
     return "".join(output)
 
 
-def clean_and_parse_json(text):
+# ==========================================
+# SINGLE-PASS REPAIRER
+# ==========================================
+_KEY, _COLON, _VALUE, _AFTER = range(4)
+_STRING_SPECIAL = re.compile(r'["\\]')
+_JSON_START = re.compile(r'[{\[]')
+_LITERAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-.")
+_WHITESPACE = frozenset(" \t\r\n")
+_TOKEN = re.compile(r'[ \t\r\n]+|[A-Za-z0-9+\-.]+|.', re.S)
+_NUMBER_TAIL = re.compile(r'[^0-9]+$')
+_DECODER = json.JSONDecoder(strict=False)
+
+
+class StreamingJSONRepairer:
+    """
+    One-pass replacement for the clean_json_output -> remove_json_comments ->
+    regex -> fix_truncated_json pipeline. Characters can be fed in chunks as
+    they arrive from a stream. It skips prose or ``` fences before the first
+    { or [, drops // and /* */ comments and trailing commas, stops when the
+    root value closes, and on close() balances whatever was cut off (open
+    string, dangling key or colon, partial literal, open containers).
+    Lazy keys and rogue quotes are left to the legacy pipeline.
+    """
+
+    def __init__(self):
+        self._out = []
+        self._stack = []      # open containers: '{' or '['
+        self._expect = []     # per container: _KEY, _COLON, _VALUE or _AFTER
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._slash = False   # saw '/' outside a string, next char decides
+        self._comment = None  # '//' or '/*'
+        self._comment_star = False
+        self._pending_comma = False
+        self._literal = []
+
+    @property
+    def done(self):
+        """True once the root object/array has closed; later input is ignored."""
+        return self._done
+
+    @property
+    def depth(self):
+        return len(self._stack)
+
+    # --- Structure helpers ---
+    def _open(self, ch):
+        self._out.append(ch)
+        self._stack.append(ch)
+        self._expect.append(_KEY if ch == '{' else _VALUE)
+
+    def _value_done(self):
+        if self._expect:
+            self._expect[-1] = _AFTER
+
+    def _close_top(self):
+        opener = self._stack.pop()
+        self._expect.pop()
+        self._out.append('}' if opener == '{' else ']')
+        self._on_container_closed(len(self._stack))
+        if not self._stack:
+            self._done = True
+        else:
+            self._value_done()
+
+    def _on_container_closed(self, depth):
+        """Hook for subclasses; called after a container at `depth` closes."""
+
+    def _before_token(self):
+        if self._pending_comma:
+            self._pending_comma = False
+            self._out.append(',')
+            self._expect[-1] = _KEY if self._stack[-1] == '{' else _VALUE
+
+    def _flush_literal(self, final=False):
+        if not self._literal:
+            return
+        literal = "".join(self._literal)
+        self._literal = []
+        if final:
+            literal = self._complete_literal(literal)
+            if literal is None:
+                return
+        self._out.append(literal)
+        self._value_done()
+
+    @staticmethod
+    def _complete_literal(literal):
+        for word in ("true", "false", "null"):
+            if word.startswith(literal):
+                return word
+        trimmed = _NUMBER_TAIL.sub('', literal)
+        return trimmed or None
+
+    # --- Input ---
+    def feed(self, chunk):
+        out = self._out
+        i, n = 0, len(chunk)
+
+        while i < n and not self._done:
+            if not self._started:
+                m = _JSON_START.search(chunk, i)
+                if not m:
+                    return
+                self._started = True
+                self._open(m.group())
+                i = m.end()
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    out.append(chunk[i])
+                    i += 1
+                    continue
+                m = _STRING_SPECIAL.search(chunk, i)
+                if not m:
+                    out.append(chunk[i:])
+                    return
+                j = m.start()
+                out.append(chunk[i:j + 1])
+                i = j + 1
+                if chunk[j] == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._expect[-1] = _COLON
+                    else:
+                        self._value_done()
+                continue
+
+            if self._comment == '//':
+                j = chunk.find('\n', i)
+                if j < 0:
+                    return
+                self._comment = None
+                i = j + 1
+                continue
+            if self._comment == '/*':
+                if self._comment_star and chunk[i] == '/':
+                    self._comment = None
+                    i += 1
+                    continue
+                j = chunk.find('*/', i)
+                if j < 0:
+                    self._comment_star = chunk.endswith('*')
+                    return
+                self._comment = None
+                i = j + 2
+                continue
+
+            # Whitespace runs and literal runs come back as one token
+            token = _TOKEN.match(chunk, i).group()
+            i += len(token)
+            ch = token[0]
+
+            if self._slash:
+                self._slash = False
+                if ch == '/' or ch == '*':
+                    self._comment = '//' if ch == '/' else '/*'
+                    self._comment_star = False
+                    continue
+                self._before_token()
+                out.append('/')
+            if ch == '/':
+                self._flush_literal()
+                self._slash = True
+                continue
+
+            if ch in _LITERAL_CHARS:
+                if not self._literal:
+                    self._before_token()
+                self._literal.append(token)
+                continue
+            self._flush_literal()
+
+            if ch in _WHITESPACE:
+                continue
+            if ch == ',':
+                self._pending_comma = True
+            elif ch == '}' or ch == ']':
+                # A trailing comma before a closer is dropped
+                self._pending_comma = False
+                opener = '{' if ch == '}' else '['
+                if opener in self._stack:
+                    # Auto-close anything the model forgot inside this container
+                    while self._stack[-1] != opener:
+                        self._close_top()
+                    self._close_top()
+            else:
+                self._before_token()
+                if ch == '"':
+                    out.append(ch)
+                    self._in_string = True
+                    self._string_is_key = self._expect[-1] == _KEY
+                elif ch == ':':
+                    out.append(ch)
+                    self._expect[-1] = _VALUE
+                elif ch == '{' or ch == '[':
+                    self._open(ch)
+                else:
+                    # Unknown punctuation: keep it so the parse fails and the legacy path runs
+                    out.append(ch)
+
+    def close(self):
+        """Repaired JSON text for everything fed so far, or None if no JSON started."""
+        if not self._started:
+            return None
+        if self._done:
+            return "".join(self._out)
+
+        if self._in_string:
+            if self._escape and self._out:
+                self._out[-1] = self._out[-1][:-1]
+            self._out.append('"')
+            self._in_string = False
+            if self._string_is_key:
+                self._expect[-1] = _COLON
+            else:
+                self._value_done()
+        self._flush_literal(final=True)
+
+        while self._stack:
+            if self._stack[-1] == '{':
+                if self._expect[-1] == _COLON:
+                    self._out.append(': null')
+                elif self._expect[-1] == _VALUE:
+                    self._out.append('null')
+            self._close_top()
+        return "".join(self._out)
+
+
+class StreamingArrayParser(StreamingJSONRepairer):
+    """
+    Emits the objects/arrays inside a streamed JSON array as soon as each one
+    closes, e.g. the days of a plan. Handles a bare array (`[{...}, ...]`) and
+    an array that is the first value of a wrapper object (`{"plan": [...]}`).
+    feed() returns the elements completed by that chunk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._item_depth = None  # depth of the array whose elements we emit
+        self._item_start = None  # index in self._out where the current element began
+        self._root_has_value = False
+        self._ready = []
+
+    def _open(self, ch):
+        depth = len(self._stack)
+        if self._item_depth is None and ch == '[' and (depth == 0 or (depth == 1 and not self._root_has_value)):
+            self._item_depth = depth + 1
+        elif depth == self._item_depth:
+            self._item_start = len(self._out)
+        super()._open(ch)
+
+    def _before_token(self):
+        if self._pending_comma and len(self._stack) == 1:
+            self._root_has_value = True
+        super()._before_token()
+
+    def _on_container_closed(self, depth):
+        if depth == self._item_depth and self._item_start is not None:
+            self._emit(self._item_start)
+            self._item_start = None
+
+    def _emit(self, start):
+        try:
+            self._ready.append(json.loads("".join(self._out[start:]), strict=False))
+        except json.JSONDecodeError:
+            logger.warning("Skipping an array element that could not be parsed")
+
+    def feed(self, chunk):
+        super().feed(chunk)
+        return self._drain()
+
+    def close(self):
+        """Elements completed by balancing a truncated stream (usually a partial last element)."""
+        super().close()
+        return self._drain()
+
+    def _drain(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+
+@traced("json.repair")
+def repair_json(text):
+    """Single-pass extraction + repair. Returns JSON text, or None if the text has no JSON."""
+    repairer = StreamingJSONRepairer()
+    repairer.feed(text)
+    return repairer.close()
+
+
+@traced("json.legacy_repair")
+def legacy_clean_and_parse_json(text):
+    """The original multi-pass pipeline, kept for lazy keys / rogue quotes the single pass does not fix."""
     # 1. Use stack-based extractor to isolate JSON block
     cleaned = clean_json_output(text)
 
@@ -194,3 +499,31 @@ def clean_and_parse_json(text):
             return json.loads(balanced)
         except json.JSONDecodeError:
             return None
+
+
+def _parsed(path, data):
+    JSON_PARSES.inc(path=path)
+    annotate(path=path)
+    return data
+
+
+@traced("json.parse")
+def clean_and_parse_json(text):
+    if not text:
+        return _parsed("failed", None)
+    # Most replies are valid JSON, maybe wrapped in prose or ``` fences:
+    # let the C decoder read from the first bracket and ignore what follows
+    m = _JSON_START.search(text)
+    if m:
+        try:
+            return _parsed("direct", _DECODER.raw_decode(text, m.start())[0])
+        except json.JSONDecodeError:
+            pass
+    repaired = repair_json(text)
+    if repaired is not None:
+        try:
+            return _parsed("repaired", json.loads(repaired, strict=False))
+        except json.JSONDecodeError:
+            pass
+    data = legacy_clean_and_parse_json(text)
+    return _parsed("legacy" if data is not None else "failed", data)
@@ -0,0 +1,123 @@
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    OLLAMA_URL,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_CHAT_TIMEOUT,
+    OLLAMA_STREAM_TIMEOUT,
+    OLLAMA_EMBED_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+base_url = OLLAMA_URL.replace("/api/generate", "").replace("/api/chat", "").rstrip("/")
+
+
+class OllamaClient:
+    """
+    Shared HTTP client for every Ollama call.
+    A single requests.Session keeps a pool of keep-alive connections, so
+    embedding 60 chunks reuses a few sockets instead of opening 60.
+    The urllib3 pool is thread-safe; the session itself is created lazily
+    (after any gunicorn fork) under a lock.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, timeouts=None, stream_timeout=300.0):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.stream_timeout = stream_timeout
+        # Read timeouts keyed by endpoint path, e.g. {"/api/chat": 60}
+        self.timeouts = dict(timeouts or {})
+        self._session = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    s.mount("http://", adapter)
+                    s.mount("https://", adapter)
+                    s.headers.update({"Connection": "keep-alive"})
+                    self._session = s
+        return self._session
+
+    def timeout_for(self, url, stream=False):
+        """(connect, read) timeout for an endpoint. Streams get the longer idle budget."""
+        if stream:
+            return (self.connect_timeout, self.stream_timeout)
+        read = self.timeouts.get(urlparse(url).path, OLLAMA_CHAT_TIMEOUT)
+        return (self.connect_timeout, read)
+
+    def post(self, url, json=None, stream=False, timeout=None):
+        if timeout is None:
+            timeout = self.timeout_for(url, stream)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.post(url, json=json, stream=stream, timeout=timeout)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def stats(self):
+        """
+        Pool statistics. `connections_opened` counts real TCP connects made by
+        urllib3, so `reused` = requests that rode an existing keep-alive socket.
+        """
+        opened = 0
+        pooled_requests = 0
+        idle = 0
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened += pool.num_connections
+                    pooled_requests += pool.num_requests
+                    if pool.pool is not None:
+                        # Empty slots are None placeholders; real entries are idle sockets
+                        idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._lock:
+            total, errors = self._requests, self._errors
+
+        return {
+            "pool_size": self.pool_size,
+            "requests": total,
+            "errors": errors,
+            "connections_opened": opened,
+            "connections_idle": idle,
+            "reused": max(pooled_requests - opened, 0),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+ollama_client = OllamaClient(
+    pool_size=OLLAMA_POOL_SIZE,
+    connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+    stream_timeout=OLLAMA_STREAM_TIMEOUT,
+    timeouts={
+        "/api/chat": OLLAMA_CHAT_TIMEOUT,
+        "/api/embeddings": OLLAMA_EMBED_TIMEOUT,
+        "/api/embed": OLLAMA_EMBED_TIMEOUT,
+    }
+)
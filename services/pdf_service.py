@@ -1,20 +1,167 @@
+import io
 import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
+from config import PDF_PARSE_WORKERS, PDF_PARALLEL_MIN_PAGES, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from services.chunker import chunk_pages
+from services.tracing import span, traced, annotate, record_span
 
 logger = logging.getLogger(__name__)
 
-def advanced_pdf_parse(filepath):
-    """Extracts text and splits it into logical chunks for RAG."""
-    full_text = ""
-    chunks = []
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Process pool shared by all uploads, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a multi-threaded Flask process can copy held locks into the child
+            _pool = ProcessPoolExecutor(max_workers=PDF_PARSE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _word_rows(page):
+    """
+    Table-like rows rebuilt from word positions: words on the same line, split into
+    cells wherever the horizontal gap is wider than a space (column boundaries).
+    """
+    lines = {}
+    for word in page.extract_words():
+        lines.setdefault(round(word['top'] / 3), []).append(word)
+    rows = []
+    for _, words in sorted(lines.items()):
+        words.sort(key=lambda w: w['x0'])
+        cells = [[words[0]['text']]]
+        for prev, word in zip(words, words[1:]):
+            if word['x0'] - prev['x1'] > 0.8 * (word['bottom'] - word['top']):
+                cells.append([])
+            cells[-1].append(word['text'])
+        rows.append([" ".join(cell) for cell in cells])
+    return rows
+
+
+def _page_rows(page):
+    """Rows from ruled tables first, then from word positions for unruled layouts."""
+    try:
+        rows = [[cell or "" for cell in row] for table in page.extract_tables() for row in table]
+        rows.extend(_word_rows(page))
+        return rows
+    except Exception as e:
+        logger.warning(f"Row extraction failed on a page: {e}")
+        return []
+
+
+def _extract_page(page, index):
+    started = time.perf_counter()
+    text = page.extract_text()
+    rows = _page_rows(page)
+    return index, text, rows, time.perf_counter() - started
+
+
+def _open(source):
+    """pdfplumber handle for a path, raw bytes or a seekable file-like object."""
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    return pdfplumber.open(source)
+
+
+def _extract_range(source, start, stop):
+    """
+    Worker, run in a child process: one (index, text, rows, seconds) tuple per
+    page in [start, stop), as _extract_page returns.
+    """
+    with _open(source) as pdf:
+        return [_extract_page(pdf.pages[i], i) for i in range(start, stop)]
+
+
+def _extract_parallel(source, page_count):
+    workers = min(PDF_PARSE_WORKERS, page_count)
+    if not isinstance(source, (str, os.PathLike, bytes, bytearray)):
+        # Open file objects cannot cross the process boundary; workers get the bytes
+        source.seek(0)
+        source = source.read()
+    # Contiguous ranges, so each worker opens the document once
+    step = -(-page_count // workers)
+    pool = _get_pool()
+    futures = [pool.submit(_extract_range, source, start, min(start + step, page_count))
+               for start in range(0, page_count, step)]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def advanced_pdf_parse(source):
+    """Extracts text and splits it into logical chunks for RAG (chunk texts only)."""
+    report = parse_pdf_report(source)
+    return report["text"], [chunk["text"] for chunk in report["chunks"]]
+
+
+@traced("pdf.parse")
+def parse_pdf_report(source):
+    """
+    Full text, RAG chunks ({"text", "page", "start", "end"}, see services/chunker.py)
+    and table rows (lists of cell strings, for the biomarker extractor).
+    `source` is a file path, the PDF bytes, or a seekable file-like object (e.g. an upload stream).
+    """
+    started = time.perf_counter()
+    pages = []
+    parallel = False
     try:
-        with pdfplumber.open(filepath) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text: continue
-                full_text += text + "\n"
-                page_chunks = [c.strip() for c in text.split('\n\n') if len(c) > 50]
-                chunks.extend(page_chunks)
+        with _open(source) as pdf:
+            page_count = len(pdf.pages)
+            parallel = PDF_PARSE_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+            if not parallel:
+                pages = [_extract_page(page, i) for i, page in enumerate(pdf.pages)]
+        if parallel:
+            try:
+                pages = _extract_parallel(source, page_count)
+            except Exception as e:
+                logger.error(f"Parallel PDF extraction failed, retrying in-process: {e}")
+                shutdown_pool()
+                with _open(source) as pdf:
+                    pages = [_extract_page(page, i) for i, page in enumerate(pdf.pages)]
     except Exception as e:
         logger.error(f"PDF Error: {e}")
-    return full_text, chunks
+    record_span("pdf.extract", started, time.perf_counter(), pages=len(pages), parallel=parallel)
+
+    # Reassemble in page order, whatever order the workers finished in
+    pages.sort(key=lambda p: p[0])
+    texts = []
+    page_texts = []  # (page number, offset in full_text, text) for the chunker
+    offset = 0
+    rows = []
+    for index, text, page_rows, seconds in pages:
+        logger.debug(f"📄 Page {index + 1}: {seconds * 1000:.0f} ms")
+        rows.extend(page_rows)
+        if not text: continue
+        texts.append(text)
+        page_texts.append((index + 1, offset, text))
+        offset += len(text) + 1
+
+    if pages:
+        slowest = max(pages, key=lambda p: p[3])
+        logger.info(f"📄 Parsed {len(pages)} pages in {time.perf_counter() - started:.2f}s "
+                    f"(slowest: page {slowest[0] + 1}, {slowest[3]:.2f}s)")
+    full_text = "".join(text + "\n" for text in texts)
+    with span("pdf.chunk"):
+        chunks = chunk_pages(page_texts, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    annotate(pages=len(pages), chunks=len(chunks), rows=len(rows))
+    return {"text": full_text, "chunks": chunks, "rows": rows}
@@ -0,0 +1,180 @@
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+
+
+def collapse(frame):
+    """One stack in collapsed ("folded") form, root first: file:function;file:function."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Statistical profiler: one background thread samples the stacks of every
+    registered thread each `interval` seconds. Costs nothing while idle; a few
+    percent of one core while requests are being profiled.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id=None):
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="bioflow-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id=None):
+        """The collapsed-stack counts sampled for the thread since start()."""
+        with self._lock:
+            return self._targets.pop(thread_id or threading.get_ident(), Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = list(self._targets)
+            frames = sys._current_frames()
+            stacks = {tid: collapse(frames[tid]) for tid in targets if tid in frames}
+            with self._lock:
+                for tid, stack in stacks.items():
+                    if tid in self._targets:
+                        self._targets[tid][stack] += 1
+
+
+class RequestProfile:
+    """Profiles the current thread from start() to stop(), in "sample" or "cprofile" mode."""
+
+    # cProfile hooks the interpreter's profiler; only one request uses it at a time
+    _cprofile_lock = threading.Lock()
+
+    def __init__(self, mode, sampler):
+        self.mode = mode
+        self._sampler = sampler
+        self._profile = None
+        self.started = None
+
+    def start(self):
+        if self.mode == "cprofile" and RequestProfile._cprofile_lock.acquire(blocking=False):
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            # Sampling also stands in when another request holds cProfile
+            self.mode = "sample"
+            self._sampler.start()
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Returns (seconds, result): collapsed-stack Counter or cProfile.Profile."""
+        seconds = time.perf_counter() - self.started
+        if self._profile is not None:
+            self._profile.disable()
+            RequestProfile._cprofile_lock.release()
+            return seconds, self._profile
+        return seconds, self._sampler.stop()
+
+
+class ProfileStore:
+    """
+    Profile files under PROFILE_DIR/<route>/ (the newest PROFILE_KEEP per route) and
+    an in-memory index of recent profiled requests for the admin page.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP, index_size=200):
+        self.directory = directory
+        self.keep = keep
+        self._recent = deque(maxlen=index_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def route_key(method, route):
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{method}_{route}").strip("_")
+
+    def save(self, method, route, status, seconds, result, trace_id=None):
+        """Writes one request's profile; returns its index entry."""
+        key = self.route_key(method, route)
+        folder = os.path.join(self.directory, key)
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            profile_id = next(self._ids)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{profile_id:06d}-{seconds * 1000:.0f}ms"
+
+        if isinstance(result, cProfile.Profile):
+            path = os.path.join(folder, stem + ".prof")
+            result.dump_stats(path)
+            samples = None
+        else:
+            path = os.path.join(folder, stem + ".collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in result.most_common())
+            samples = sum(result.values())
+
+        entry = {"id": profile_id, "method": method, "route": route, "status": status,
+                 "duration_ms": round(seconds * 1000, 1), "mode": "cprofile" if samples is None else "sample",
+                 "samples": samples, "path": path, "trace_id": trace_id, "at": time.time()}
+        with self._lock:
+            self._recent.append(entry)
+        self._prune(folder)
+        return entry
+
+    def _prune(self, folder):
+        if not self.keep:
+            return
+        # File names start with the timestamp and id, so name order is age order
+        for stale in sorted(os.listdir(folder))[:-self.keep]:
+            try:
+                os.remove(os.path.join(folder, stale))
+            except OSError:
+                pass
+
+    def slowest(self, limit=50):
+        with self._lock:
+            entries = list(self._recent)
+        return sorted(entries, key=lambda e: e["duration_ms"], reverse=True)[:limit]
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((e for e in self._recent if e["id"] == profile_id), None)
+
+
+def profile_text(entry, limit=40):
+    """Readable text for one saved profile: pstats by cumulative time, or the hottest collapsed stacks."""
+    if entry["mode"] == "cprofile":
+        out = io.StringIO()
+        pstats.Stats(entry["path"], stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    with open(entry["path"], encoding="utf-8") as f:
+        lines = f.readlines()[:limit]
+    return "".join(lines)
+
+
+sampler = StackSampler()
+profile_store = ProfileStore()
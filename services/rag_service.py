@@ -1,47 +1,125 @@
-import hashlib
-import requests
 import logging
-from config import OLLAMA_URL, EMBEDDING_MODEL
+import numpy as np
+from config import EMBEDDING_MODEL, EMBED_BATCH_SIZE, EMBED_CACHE_MAX_BYTES, EMBED_CACHE_PATH
+from services.ollama_client import ollama_client, base_url
+from services.embedding_cache import EmbeddingCache
+from services.metrics import registry
+from services.tracing import span, traced, annotate
 
 logger = logging.getLogger(__name__)
 
-base_url = OLLAMA_URL.replace("/api/generate", "").replace("/api/chat", "").rstrip("/")
 EMBED_ENDPOINT = f"{base_url}/api/embeddings"
+EMBED_BATCH_ENDPOINT = f"{base_url}/api/embed"
 
-embedding_cache = {}
+EMBED_DURATION = registry.histogram(
+    "bioflow_ollama_embed_duration_seconds", "Seconds per Ollama embedding call.", ["endpoint"])
+
+embedding_cache = EmbeddingCache(max_bytes=EMBED_CACHE_MAX_BYTES, db_path=EMBED_CACHE_PATH or None)
+
+# Flipped off the first time Ollama answers /api/embed with 404 (pre-0.3 servers)
+_batch_supported = True
 
 # ==========================================
+@traced("rag.embed_query")
 def get_embedding(text):
     if not text:
         return []
-    text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
 
-    cached = embedding_cache.get(text_hash)
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    annotate(cached=bool(cached))
     if cached:
         return cached
+    return _embed_single(text)
 
-    # Simple cache eviction
-    if len(embedding_cache) > 2000:
-        embedding_cache.clear()
 
+def _embed_single(text):
     try:
-        r = requests.post(EMBED_ENDPOINT, json={
-            "model": EMBEDDING_MODEL,
-            "prompt": text
-        }, timeout=30)
+        with EMBED_DURATION.time(endpoint="embeddings"), span("ollama.embed", inputs=1):
+            r = ollama_client.post(EMBED_ENDPOINT, json={
+                "model": EMBEDDING_MODEL,
+                "prompt": text
+            })
         if r.status_code != 200:
              logger.error(f"Embedding Error: Status {r.status_code}")
              return []
 
         vector = r.json().get('embedding')
         if vector:
-            embedding_cache[text_hash] = vector
+            embedding_cache.set(EMBEDDING_MODEL, text, vector)
             return vector
     except Exception as e:
         logger.error(f"Embedding Error: {e}")
     return []
 
 
+def _embed_batch(texts):
+    """One /api/embed call for several inputs. Returns None if the batch could not be embedded."""
+    global _batch_supported
+    try:
+        with EMBED_DURATION.time(endpoint="embed"), span("ollama.embed", inputs=len(texts)):
+            r = ollama_client.post(EMBED_BATCH_ENDPOINT, json={
+                "model": EMBEDDING_MODEL,
+                "input": texts
+            })
+        if r.status_code == 404:
+            logger.warning("Batch embedding endpoint not available. Falling back to /api/embeddings.")
+            _batch_supported = False
+            return None
+        if r.status_code != 200:
+            logger.error(f"Batch Embedding Error: Status {r.status_code}")
+            return None
+
+        vectors = r.json().get('embeddings')
+        if not vectors or len(vectors) != len(texts):
+            logger.error("Batch Embedding Error: response size does not match input")
+            return None
+        return vectors
+    except Exception as e:
+        logger.error(f"Batch Embedding Error: {e}")
+    return None
+
+
+@traced("rag.embed_batch")
+def get_embeddings(texts, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embeds many texts, returning vectors in input order ([] for failures).
+    Cached texts are skipped; the rest go to /api/embed in batches, falling
+    back to one /api/embeddings call per text when batching is unavailable.
+    """
+    results = [[] for _ in texts]
+    pending = {}  # text -> [indices]
+
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        if text in pending:
+            pending[text].append(i)
+            continue
+        cached = embedding_cache.get(EMBEDDING_MODEL, text)
+        if cached:
+            results[i] = cached
+        else:
+            pending[text] = [i]
+
+    items = list(pending.items())
+    batch_size = max(1, int(batch_size))
+    annotate(texts=len(texts), to_embed=len(items))
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        vectors = _embed_batch([text for text, _ in batch]) if _batch_supported else None
+        if vectors is not None:
+            # One disk commit for the whole batch
+            embedding_cache.set_many(EMBEDDING_MODEL, [(text, vector) for (text, _), vector in zip(batch, vectors)])
+
+        for n, (text, indices) in enumerate(batch):
+            vector = vectors[n] if vectors is not None else _embed_single(text)
+            for i in indices:
+                results[i] = vector or []
+
+    return results
+
+
 def cosine_similarity(v1, v2):
     if not v1 or not v2:
         return 0.0
@@ -51,16 +129,74 @@ def cosine_similarity(v1, v2):
     return dot / (mag1 * mag2) if mag1 * mag2 > 0 else 0
 
 
+def build_embedding_matrix(embeddings):
+    """
+    Stacks embedding vectors into a row-normalized float32 matrix, so cosine
+    similarity against every chunk is one matrix-vector product.
+    Missing or mis-sized vectors become zero rows to keep row i aligned with chunk i.
+    """
+    dim = next((len(v) for v in embeddings if v is not None and len(v)), 0)
+    matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+    for i, vec in enumerate(embeddings):
+        if vec is not None and len(vec) == dim:
+            matrix[i] = vec
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+@traced("rag.top_k")
+def top_k_similar(matrix, query_vec, top_k=3):
+    """Row indices of the top_k most similar rows, best first."""
+    q = np.asarray(query_vec, dtype=np.float32)
+    if matrix.size == 0 or q.ndim != 1 or q.shape[0] != matrix.shape[1]:
+        return []
+    norm = np.linalg.norm(q)
+    if norm == 0:
+        return []
+
+    scores = matrix @ (q / norm)
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return []
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind='stable')].tolist()
+
+
+def get_embedding_matrix(session):
+    """
+    The session's normalized embedding matrix.
+    Sessions filled the old way (a list of float vectors in session['embeddings'])
+    are converted on the fly.
+    """
+    matrix = session.get('embedding_matrix')
+    if matrix is not None and len(matrix):
+        return matrix
+    embeddings = session.get('embeddings')
+    if embeddings is not None and len(embeddings):
+        return build_embedding_matrix(embeddings)
+    return matrix
+
+
+@traced("rag.retrieve")
 def retrieve_relevant_context(session, query, top_k=3):
     chunks = session.get('raw_text_chunks', [])
-    embeddings = session.get('embeddings', [])
-    if not chunks or not embeddings:
+    matrix = get_embedding_matrix(session)
+    if not chunks or matrix is None or not len(matrix):
         return ""
 
     q_vec = get_embedding(query)
     if not q_vec:
         return ""
 
-    scores = sorted([(cosine_similarity(q_vec, emb), chunk) for emb, chunk in zip(embeddings, chunks)],
-                    key=lambda x: x[0], reverse=True)
-    return "\n---\n".join([s[1] for s in scores[:top_k]])
+    n = min(len(chunks), len(matrix))
+    best = top_k_similar(matrix[:n], q_vec, top_k)
+    meta = session.get('chunk_meta') or []
+    # Page labels let the model cite where a value came from
+    return "\n---\n".join(
+        f"[Page {meta[i]['page']}] {chunks[i]}" if i < len(meta) else chunks[i] for i in best
+    )
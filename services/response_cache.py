@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    """Case/whitespace-insensitive form of request inputs so 'Iron ' and 'iron' share an entry."""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip().lower()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def make_cache_key(action, inputs, model, temperature, prompt=""):
+    """`prompt` is the app's prompt template (system + task), so editing it retires old answers."""
+    template = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    raw = json.dumps([action, _normalize(inputs or {}), model, temperature, template], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache for deterministic AI answers with a per-entry TTL.
+    Values are kept as JSON strings: their length is the memory charge, and
+    every hit hands back a fresh copy that callers may mutate.
+    An optional SQLite file keeps entries across restarts.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, db_path=None):
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # key -> (expires, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            folder = os.path.dirname(db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            logger.error(f"Response cache disabled on disk ({db_path}): {e}")
+            self._conn = None
+
+    def _drop(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _remember(self, key, expires, payload):
+        self._drop(key)
+        self._memory[key] = (expires, payload)
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes and len(self._memory) > 1:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, payload = entry
+                if expires >= now:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return json.loads(payload)
+                self._drop(key)
+                self.counters["expired"] += 1
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT payload, expires FROM responses WHERE key = ? AND expires >= ?", (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Response cache read error: {e}")
+                    row = None
+                if row:
+                    payload, expires = row
+                    self._remember(key, expires, payload)
+                    self.counters["disk_hits"] += 1
+                    return json.loads(payload)
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value, ttl):
+        payload = json.dumps(value)
+        expires = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires, payload)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, payload, expires) VALUES (?, ?, ?)",
+                        (key, payload, expires)
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Response cache write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._conn is not None,
+            })
+        return stats
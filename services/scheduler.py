@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from services.metrics import registry
+from services.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0   # /chat_agent streaming
+PRIORITY_MINI_APP = 1      # mini-apps, strategies, recipes, PDF diagnosis
+PRIORITY_BULK = 2          # weekly meal / workout plan generation
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_MINI_APP: "mini_app",
+    PRIORITY_BULK: "bulk",
+}
+
+
+QUEUE_WAIT = registry.histogram(
+    "bioflow_ollama_queue_wait_seconds", "Seconds a call waited for an Ollama slot.", ["priority"])
+SHED = registry.counter(
+    "bioflow_ollama_shed_total", "Calls shed after exceeding their class's queue budget.", ["priority"])
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request waited longer than its class's queue budget."""
+
+
+class OllamaScheduler:
+    """
+    Admission control in front of Ollama, which really serves one or two
+    generations at a time. At most `max_in_flight` calls run concurrently;
+    the rest queue by priority class, FIFO within a class. A caller whose
+    wait exceeds its class budget is shed with SchedulerOverloaded so the
+    route can serve its fallback instead of hanging.
+    Threads queue with slot() and coroutines with async_slot(); both share
+    one queue and one in-flight budget.
+    """
+
+    def __init__(self, max_in_flight=2, budgets=None):
+        self.max_in_flight = max(1, int(max_in_flight))
+        # Seconds a class may wait before being shed; None = wait forever
+        self.budgets = dict(budgets or {})
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._async_waiters = {}  # ticket -> (loop, future) of coroutines waiting in async_slot()
+        self._waits = {p: {"count": 0, "total": 0.0, "max": 0.0} for p in PRIORITY_NAMES}
+        self._shed = {p: 0 for p in PRIORITY_NAMES}
+
+    def _admissible(self, ticket):
+        return self._in_flight < self.max_in_flight and self._waiting[0] == ticket
+
+    def _notify(self):
+        """Wakes every waiting thread and coroutine; the head of the queue re-checks. Call under self._cond."""
+        self._cond.notify_all()
+        for loop, future in self._async_waiters.values():
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _shed_ticket(self, ticket, max_wait):
+        priority = ticket[0]
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        self._shed[priority] = self._shed.get(priority, 0) + 1
+        SHED.inc(priority=PRIORITY_NAMES.get(priority, priority))
+        self._notify()
+        return SchedulerOverloaded(
+            f"{PRIORITY_NAMES.get(priority, priority)} request waited {max_wait:.1f}s for Ollama"
+        )
+
+    def _leave_queue(self, ticket):
+        """Drops a ticket that gives up waiting, so the ones behind it can move up. Call under self._cond."""
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._notify()
+
+    def _admit(self, ticket, start):
+        priority = ticket[0]
+        heapq.heappop(self._waiting)
+        self._in_flight += 1
+        waited = time.monotonic() - start
+        stats = self._waits.setdefault(priority, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += waited
+        stats["max"] = max(stats["max"], waited)
+        # The next ticket may also fit if there is spare capacity
+        self._notify()
+        return waited
+
+    def _acquire(self, priority, max_wait):
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        deadline = start + max_wait if max_wait is not None else None
+
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while not self._admissible(ticket):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise self._shed_ticket(ticket, max_wait)
+                    self._cond.wait(remaining)
+            except BaseException:
+                # Interrupted while queued (KeyboardInterrupt, a killed green thread): leave the line
+                self._leave_queue(ticket)
+                raise
+            return self._admit(ticket, start)
+
+    async def _acquire_async(self, priority, max_wait):
+        """_acquire() for coroutines: waits on a future instead of blocking the event loop's thread."""
+        loop = asyncio.get_running_loop()
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        deadline = start + max_wait if max_wait is not None else None
+
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._admissible(ticket):
+                        return self._admit(ticket, start)
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise self._shed_ticket(ticket, max_wait)
+                    # Registered under the lock, so a release after this check still wakes us
+                    future = loop.create_future()
+                    self._async_waiters[ticket] = (loop, future)
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._cond:
+                        self._async_waiters.pop(ticket, None)
+        except asyncio.CancelledError:
+            # The client went away while queued: give up the place in line
+            with self._cond:
+                self._leave_queue(ticket)
+            raise
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._notify()
+
+    def _record_wait(self, priority, started, waited):
+        QUEUE_WAIT.observe(waited, priority=PRIORITY_NAMES.get(priority, priority))
+        record_span("ollama.queue", started, time.perf_counter(), priority=PRIORITY_NAMES.get(priority, priority))
+        if waited > 1:
+            logger.info(f"⏳ Waited {waited:.1f}s for an Ollama slot ({PRIORITY_NAMES.get(priority, priority)})")
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_MINI_APP, max_wait=None):
+        """Holds one Ollama slot for the duration of the block. Yields the seconds spent queued."""
+        if max_wait is None:
+            max_wait = self.budgets.get(priority)
+        started = time.perf_counter()
+        waited = self._acquire(priority, max_wait)
+        self._record_wait(priority, started, waited)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_slot(self, priority=PRIORITY_MINI_APP, max_wait=None):
+        """slot() for coroutines (`async with`). Cancelling the task while queued leaves the queue."""
+        if max_wait is None:
+            max_wait = self.budgets.get(priority)
+        started = time.perf_counter()
+        waited = await self._acquire_async(priority, max_wait)
+        self._record_wait(priority, started, waited)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            waits = {}
+            for priority, s in self._waits.items():
+                waits[PRIORITY_NAMES.get(priority, str(priority))] = {
+                    "count": s["count"],
+                    "avg_seconds": s["total"] / s["count"] if s["count"] else 0.0,
+                    "max_seconds": s["max"],
+                }
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "queue_depth": sum(depth.values()),
+                "queue_depth_by_class": depth,
+                "wait": waits,
+                "shed": {PRIORITY_NAMES.get(p, str(p)): n for p, n in self._shed.items()},
+            }
@@ -1,27 +1,94 @@
+import logging
 import threading
+from config import SESSION_BACKEND, SESSION_DB_PATH, SESSION_MAX_BYTES, SESSION_IDLE_TTL, SESSION_SWEEP_INTERVAL
+from services.session_store import create_session_store
+from services.user_session import UserSession
+
+logger = logging.getLogger(__name__)
+
+# Dict-like: MemorySessionStore or SQLiteSessionStore (see SESSION_BACKEND).
+# Both evict least recently used sessions past SESSION_MAX_BYTES.
+sessions = create_session_store(SESSION_BACKEND, SESSION_DB_PATH, SESSION_MAX_BYTES, SESSION_IDLE_TTL)
+
+# Per-session locks, striped: a token always maps to the same lock, users on
+# different stripes never wait for each other, and the map never grows.
+LOCK_STRIPES = 64
+_stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+
+def session_lock_for(token):
+    """The lock serialising changes to one session (re-entrant, shared with ~1/64 of other tokens)."""
+    return _stripes[hash(token) % LOCK_STRIPES]
+
+
+
+_sweeper = None
+_sweeper_stop = threading.Event()
+
+
+def _sweep_loop(interval):
+    while not _sweeper_stop.wait(interval):
+        try:
+            expired = sessions.sweep()
+            if expired:
+                logger.info(f"🧹 Expired {expired} idle sessions")
+        except Exception as e:
+            logger.error(f"Session sweeper error: {e}")
+
+
+def start_sweeper(interval=SESSION_SWEEP_INTERVAL):
+    """Starts the idle-session sweeper once per process (threads don't survive a pre-fork, so it starts lazily)."""
+    global _sweeper
+    if not SESSION_IDLE_TTL or (_sweeper and _sweeper.is_alive()):
+        return
+    _sweeper_stop.clear()
+    _sweeper = threading.Thread(target=_sweep_loop, args=(interval,), name="bioflow-session-sweeper", daemon=True)
+    _sweeper.start()
 
-sessions = {}
-session_lock = threading.Lock()
 
 def get_session(token):
     if not token:
         raise ValueError("Token is required")
 
-    with session_lock:
-        if len(sessions) > 100 and token not in sessions:
-            try:
-                # Python 3.7+ dicts preserve insertion order.
-                # next(iter(sessions)) gets the oldest inserted key (simple LRU approximation).
-                first_key = next(iter(sessions))
-                sessions.pop(first_key, None)
-            except (RuntimeError, StopIteration):
-                pass
-
-        if token not in sessions:
-            sessions[token] = {
-                "blood_context": {},
-                "raw_text_chunks": [],
-                "embeddings": [],
-                "chat_history": []
-            }
-        return sessions[token]
+    start_sweeper()
+    with session_lock_for(token):
+        # Reading marks the session as recently used
+        user_session = sessions.get(token)
+        if user_session is None:
+            user_session = UserSession()
+            sessions[token] = user_session
+        return user_session
+
+
+def update_session(token, fn=None, **fields):
+    """
+    Atomically changes one session: under its lock, reads the current state,
+    sets `fields`, calls fn(user_session) and saves. Returns fn's result.
+    Routes use this (not get_session + mutate) for every write, so concurrent
+    requests of one user never lose each other's changes. The stripe lock covers
+    this process's threads; the store's transaction() covers other worker processes.
+    """
+    if not token:
+        raise ValueError("Token is required")
+
+    with session_lock_for(token), sessions.transaction(token):
+        user_session = get_session(token)
+        user_session.update(fields)
+        result = fn(user_session) if fn else None
+        save_session(token, user_session)
+        return result
+
+
+def append_chat_message(token, role, text):
+    """Adds one turn to the session's chat history."""
+    update_session(token, lambda s: s.setdefault('chat_history', []).append({"role": role, "text": text}))
+
+
+def save_session(token, user_session):
+    """Writes a session's changes back to the store. Call after mutating what get_session returned."""
+    sessions.save(token, user_session)
+
+
+def session_stats():
+    """Gauges: session count, estimated bytes, evictions and idle expiries."""
+    return sessions.stats()
@@ -0,0 +1,481 @@
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+import numpy as np
+from services.user_session import UserSession, ChatHistory, HEAVY_FIELDS, LAZY
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_bytes(value):
+    """Rough in-memory size of a session value: payload bytes plus a little per-container overhead."""
+    if value is None or value is LAZY:
+        return 0
+    if isinstance(value, UserSession):
+        return 96 + sum(estimate_bytes(v) for v in value.sizes())
+    if isinstance(value, ChatHistory):
+        # deque blocks + one (Role, text) tuple per message; the Role members are shared
+        return 632 + sum(64 + len(text) for _, text in value.turns())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + 8 * len(value) + sum(estimate_bytes(v) for v in value)
+    return 16
+
+
+def as_user_session(value):
+    """Sessions assigned as plain dicts (older call sites, tests) are converted on the way in."""
+    return value if isinstance(value, UserSession) else UserSession(value)
+
+
+# Longest a read's last_used waits in memory before the SQLite store writes it
+TOUCH_FLUSH_SECONDS = 5
+
+# Shards of the in-memory map: each has its own lock, so lookups of different users rarely meet
+SHARDS = 64
+
+
+class _Shard:
+    """One slice of MemorySessionStore, least recently used first."""
+    __slots__ = ("data", "sizes", "last_used", "recency", "total", "lock")
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.sizes = {}
+        self.last_used = {}  # token -> time.time(), for idle expiry
+        self.recency = {}  # token -> store-wide use counter, for LRU order across shards
+        self.total = 0
+        self.lock = threading.RLock()
+
+    def remove(self, token):
+        del self.data[token]
+        self.total -= self.sizes.pop(token, 0)
+        self.last_used.pop(token, None)
+        self.recency.pop(token, None)
+
+
+class MemorySessionStore(MutableMapping):
+    """
+    Sessions kept in this process only: lost on restart and invisible to other workers.
+    The map is split into SHARDS shards by token hash, each with its own lock.
+    Reads mark a session as recently used. Once the estimated size of all
+    sessions passes max_bytes, the least recently used ones are evicted.
+    sweep() drops sessions idle for longer than idle_ttl seconds.
+    """
+
+    def __init__(self, max_bytes=0, idle_ttl=0, shards=SHARDS):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._shards = [_Shard() for _ in range(shards)]
+        self._clock = itertools.count()
+        # Only for eviction and the counters; lookups never take it
+        self._lock = threading.Lock()
+        self.counters = {"evictions": 0, "expired": 0}
+
+    def _shard(self, token):
+        return self._shards[hash(token) % len(self._shards)]
+
+    def _touch(self, shard, token):
+        shard.data.move_to_end(token)
+        shard.last_used[token] = time.time()
+        shard.recency[token] = next(self._clock)
+
+    def __getitem__(self, token):
+        shard = self._shard(token)
+        with shard.lock:
+            user_session = shard.data[token]
+            self._touch(shard, token)
+            return user_session
+
+    def __setitem__(self, token, user_session):
+        self.save(token, user_session)
+
+    def __delitem__(self, token):
+        shard = self._shard(token)
+        with shard.lock:
+            shard.remove(token)
+
+    def __iter__(self):
+        # Least recently used first, across shards
+        entries = []
+        for shard in self._shards:
+            with shard.lock:
+                entries.extend((used, token) for token, used in shard.recency.items())
+        return iter([token for _, token in sorted(entries)])
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self._shards)
+
+    def __contains__(self, token):
+        return token in self._shard(token).data
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.data.clear()
+                shard.sizes.clear()
+                shard.last_used.clear()
+                shard.recency.clear()
+                shard.total = 0
+
+    @contextmanager
+    def transaction(self, token):
+        """Nothing to do: only this process sees these sessions, and session_lock_for serialises its threads."""
+        yield
+
+    def save(self, token, user_session):
+        # Routes mutate the stored object itself; saving re-measures it and marks it used
+        user_session = as_user_session(user_session)
+        user_session.pack()
+        size = estimate_bytes(user_session)
+        shard = self._shard(token)
+        with shard.lock:
+            shard.total += size - shard.sizes.get(token, 0)
+            shard.sizes[token] = size
+            shard.data[token] = user_session
+            self._touch(shard, token)
+        self._evict(keep=token)
+
+    def _total(self):
+        return sum(shard.total for shard in self._shards)
+
+    def _evict(self, keep):
+        if not self.max_bytes or self._total() <= self.max_bytes:
+            return
+        with self._lock:
+            while self._total() > self.max_bytes:
+                # The oldest session is at the head of one of the shards
+                heads = []
+                for shard in self._shards:
+                    with shard.lock:
+                        head = next((t for t in shard.data if t != keep), None)
+                        if head is not None:
+                            heads.append((shard.recency[head], head, shard))
+                if not heads:
+                    break
+                _, oldest, shard = min(heads, key=lambda h: h[0])
+                with shard.lock:
+                    if oldest not in shard.data:
+                        continue
+                    shard.remove(oldest)
+                self.counters["evictions"] += 1
+                logger.debug(f"Session evicted (memory budget): {oldest}")
+
+    def sweep(self, now=None):
+        """Removes sessions idle for longer than idle_ttl. Returns how many were removed."""
+        if not self.idle_ttl:
+            return 0
+        cutoff = (now or time.time()) - self.idle_ttl
+        expired = 0
+        for shard in self._shards:
+            with shard.lock:
+                # LRU order: stop at the first session used since the cutoff
+                for token in list(shard.data):
+                    if shard.last_used.get(token, 0) >= cutoff:
+                        break
+                    shard.remove(token)
+                    expired += 1
+        with self._lock:
+            self.counters["expired"] += expired
+        return expired
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, backend="memory", sessions=len(self), bytes=self._total(),
+                        max_bytes=self.max_bytes, idle_ttl=self.idle_ttl)
+
+
+class SQLiteSessionStore(MutableMapping):
+    """
+    Sessions in a SQLite file in WAL mode, shared by every worker process and
+    kept across restarts. Light fields (blood_context, chat_history, weekly_plan...)
+    are one JSON document; each heavy field is its own row, with the embedding
+    matrix stored as raw float32 bytes.
+    Reads return a UserSession whose heavy fields load on first access;
+    changes are written back with save().
+    Saves refresh last_used at once; reads only note the time, and the notes are
+    written in one batch by the next save or sweep, or every TOUCH_FLUSH_SECONDS.
+    Each session's stored size is kept next to it,
+    so the LRU budget (max_bytes) and idle expiry (idle_ttl) apply across all workers.
+    Eviction/expiry counters are per process.
+    transaction(token) holds the database write lock from a read to its save, so
+    read-modify-writes from different processes cannot lose each other's changes.
+    """
+
+    def __init__(self, db_path, max_bytes=0, idle_ttl=0):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        # Re-entrant: reads and saves run inside transaction(), which holds it throughout
+        self._lock = threading.RLock()
+        self._depth = 0  # nested transaction() calls of the thread holding _lock
+        # Reads not yet written to last_used: token -> time
+        self._touched = {}
+        self._touch_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self.counters = {"evictions": 0, "expired": 0}
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_fields (
+                token TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value BLOB NOT NULL,
+                dim INTEGER,
+                PRIMARY KEY (token, field)
+            )
+        """)
+        self._conn.commit()
+
+    def _commit(self):
+        # Inside transaction() the outermost block commits
+        if not self._depth:
+            self._conn.commit()
+
+    @contextmanager
+    def transaction(self, token):
+        """
+        Runs the block in one BEGIN IMMEDIATE transaction: reads and saves of any
+        session inside it are committed together, and other processes' writes wait
+        (up to the 5 s busy timeout) until it ends. Threads of this process share the
+        connection, so they wait too; keep the block short.
+        """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield
+            except BaseException as e:
+                self._depth = 0
+                self._conn.rollback()
+                logger.error(f"Session transaction for {token} rolled back: {e!r}")
+                raise
+            self._depth = 0
+            self._conn.commit()
+
+    def __getitem__(self, token):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE token = ?", (token,)).fetchone()
+            if row is None:
+                raise KeyError(token)
+            fields = [f for (f,) in self._conn.execute(
+                "SELECT field FROM session_fields WHERE token = ?", (token,)
+            )]
+        with self._touch_lock:
+            self._touched[token] = time.time()
+            due = time.monotonic() - self._flushed_at >= TOUCH_FLUSH_SECONDS
+        if due:
+            self.flush_touches()
+        return UserSession(json.loads(row[0]), lazy_fields=fields, loader=lambda field: self.load_field(token, field))
+
+    def _write_touches(self):
+        # Caller holds _lock and commits
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        if touched:
+            self._conn.executemany("UPDATE sessions SET last_used = MAX(last_used, ?) WHERE token = ?",
+                                   [(used, token) for token, used in touched.items()])
+
+    def flush_touches(self):
+        """Writes the last_used times of sessions read since the last flush, in one commit."""
+        with self._lock:
+            try:
+                self._write_touches()
+                self._commit()
+            except sqlite3.Error as e:
+                if self._depth:
+                    raise
+                self._conn.rollback()
+                logger.error(f"Session last_used flush failed: {e}")
+
+    def __setitem__(self, token, user_session):
+        self.save(token, user_session)
+
+    def __delitem__(self, token):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+            self._conn.execute("DELETE FROM session_fields WHERE token = ?", (token,))
+            self._commit()
+        if not cursor.rowcount:
+            raise KeyError(token)
+
+    def __iter__(self):
+        # Least recently used first
+        self.flush_touches()
+        with self._lock:
+            tokens = [t for (t,) in self._conn.execute("SELECT token FROM sessions ORDER BY last_used")]
+        return iter(tokens)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def __contains__(self, token):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE token = ?", (token,)).fetchone() is not None
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.execute("DELETE FROM session_fields")
+            self._commit()
+
+    def load_field(self, token, field):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, dim FROM session_fields WHERE token = ? AND field = ?", (token, field)
+            ).fetchone()
+        if row is None:
+            # Removed by another worker since this session was read
+            return None if field == "embedding_matrix" else []
+        value, dim = row
+        if dim is not None:
+            # Copy: frombuffer over the blob is read-only
+            return np.frombuffer(value, dtype=np.float32).reshape(-1, dim).copy()
+        return json.loads(value)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, np.ndarray):
+            matrix = np.ascontiguousarray(value, dtype=np.float32)
+            return matrix.tobytes(), (matrix.shape[1] if matrix.ndim == 2 else len(matrix))
+        return json.dumps(value).encode("utf-8"), None
+
+    def save(self, token, user_session):
+        """Writes the light fields, plus the heavy fields that were replaced since the session was read."""
+        user_session = as_user_session(user_session)
+        loaded = user_session.loaded if user_session.loaded is not None else {}
+        light, changed, keep = {}, {}, []
+        for key, value in user_session.stored_items():
+            if key in HEAVY_FIELDS and value is not None:
+                keep.append(key)
+                if value is not LAZY and loaded.get(key) is not value:
+                    changed[key] = self._encode(value)
+            else:
+                light[key] = value
+
+        with self._lock:
+            try:
+                self._write_touches()
+                data = json.dumps(light)
+                self._conn.execute(
+                    "INSERT INTO sessions (token, data, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(token) DO UPDATE SET data = excluded.data, last_used = excluded.last_used",
+                    (token, data, time.time())
+                )
+                placeholders = ",".join("?" * len(keep))
+                self._conn.execute(
+                    f"DELETE FROM session_fields WHERE token = ? AND field NOT IN ({placeholders})",
+                    (token, *keep)
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_fields (token, field, value, dim) VALUES (?, ?, ?, ?)",
+                    [(token, field, value, dim) for field, (value, dim) in changed.items()]
+                )
+                self._conn.execute(
+                    "UPDATE sessions SET size = ? + (SELECT COALESCE(SUM(LENGTH(value)), 0) "
+                    "FROM session_fields WHERE token = ?) WHERE token = ?",
+                    (len(data), token, token)
+                )
+                self._evict(keep=token)
+                self._commit()
+            except sqlite3.Error as e:
+                if self._depth:
+                    # Part of a transaction(): the outermost block rolls all of it back
+                    raise
+                self._conn.rollback()
+                logger.error(f"Session save failed for {token}: {e}")
+                return
+
+        for field in changed:
+            loaded[field] = user_session.raw(field)
+
+    def _delete(self, tokens):
+        self._conn.executemany("DELETE FROM sessions WHERE token = ?", [(t,) for t in tokens])
+        self._conn.executemany("DELETE FROM session_fields WHERE token = ?", [(t,) for t in tokens])
+
+    def _evict(self, keep):
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT token, size FROM sessions WHERE token != ? ORDER BY last_used LIMIT 1", (keep,)
+            ).fetchone()
+            if not row:
+                break
+            self._delete([row[0]])
+            total -= row[1]
+            self.counters["evictions"] += 1
+            logger.debug(f"Session evicted (size budget): {row[0]}")
+
+    def sweep(self, now=None):
+        """Removes sessions idle for longer than idle_ttl. Returns how many were removed."""
+        if not self.idle_ttl:
+            return 0
+        cutoff = (now or time.time()) - self.idle_ttl
+        with self._lock:
+            try:
+                self._write_touches()
+                tokens = [t for (t,) in self._conn.execute(
+                    "SELECT token FROM sessions WHERE last_used < ?", (cutoff,)
+                )]
+                self._delete(tokens)
+                self._commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Session sweep failed: {e}")
+                return 0
+            self.counters["expired"] += len(tokens)
+        return len(tokens)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+            return dict(self.counters, backend="sqlite", sessions=count, bytes=total,
+                        max_bytes=self.max_bytes, idle_ttl=self.idle_ttl)
+
+
+def create_session_store(backend, db_path=None, max_bytes=0, idle_ttl=0):
+    """"memory" (default) or "sqlite"; an unusable SQLite file falls back to memory with an error."""
+    if backend == "sqlite":
+        try:
+            store = SQLiteSessionStore(db_path, max_bytes, idle_ttl)
+            logger.info(f"🗄️ Sessions stored in {db_path}")
+            return store
+        except sqlite3.Error as e:
+            logger.error(f"Session DB unavailable ({db_path}), keeping sessions in memory: {e}")
+    elif backend != "memory":
+        logger.warning(f"Unknown SESSION_BACKEND '{backend}', keeping sessions in memory")
+    return MemorySessionStore(max_bytes, idle_ttl)
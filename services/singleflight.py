@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+
+def request_fingerprint(payload):
+    """Hash of the parts of an Ollama request that decide its answer."""
+    key = {
+        "model": payload.get("model"),
+        "messages": payload.get("messages"),
+        "options": payload.get("options"),
+        "format": payload.get("format"),
+    }
+    raw = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _LeaderGone(Exception):
+    """Set on the shared future when the leader was interrupted (cancelled, closed, Ctrl-C) rather than failed."""
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+    The first caller (the leader) runs the function; callers that arrive
+    while it is in flight wait for the leader's result or exception.
+    Waiters share a concurrent.futures.Future, so threads use do() and
+    coroutines use do_async() against the same in-flight table.
+    Only ordinary exceptions are shared: if the leader itself is cancelled
+    or interrupted, one of the waiters takes over and runs the call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"executed": 0, "coalesced": 0}
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.counters["executed"] += 1
+            return future, True
+
+    def _settle(self, key, future, result=None, exception=None):
+        # Forget first, so a waiter retrying after _LeaderGone starts a new call instead of rejoining this one
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except _LeaderGone:
+                continue
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._settle(key, future, exception=e)
+            raise
+        except BaseException:
+            self._settle(key, future, exception=_LeaderGone())
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled waiter must not cancel the future the others share
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderGone:
+                continue
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except Exception as e:
+            self._settle(key, future, exception=e)
+            raise
+        except BaseException:
+            self._settle(key, future, exception=_LeaderGone())
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self._calls)
+        return stats
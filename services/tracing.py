@@ -0,0 +1,222 @@
+"""
+Lightweight request tracing.
+
+    python -m services.tracing traces.jsonl trace.json [--trace-id ID]
+
+Every request gets a trace id (the X-Trace-Id header, or a new one), carried
+in a contextvar. Nested spans around routes, RAG, Ollama calls, PDF parsing
+and JSON repair are appended to TRACE_PATH as JSON lines. Run this module to
+convert the JSONL into Chrome trace-event JSON for chrome://tracing, Perfetto
+or speedscope. With TRACE_PATH unset, span() and @traced cost one check.
+"""
+import argparse
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import TRACE_PATH
+
+# perf_counter() is monotonic but has no epoch; this maps it to wall-clock time
+_EPOCH = time.time() - time.perf_counter()
+_current = contextvars.ContextVar("bioflow_span", default=None)
+_TRACE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_id():
+    return uuid.uuid4().hex[:16]
+
+
+def valid_trace_id(value):
+    return bool(value) and bool(_TRACE_ID.match(value))
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attrs", "thread")
+
+    def __init__(self, name, parent=None, trace_id=None, attrs=None, start=None):
+        self.trace_id = trace_id or (parent.trace_id if parent else new_id())
+        self.span_id = new_id()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+        self.thread = threading.get_ident()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, end=None):
+        self.end = time.perf_counter() if end is None else end
+        if sink is not None:
+            sink.write(self.to_dict())
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "ts": round(_EPOCH + self.start, 6),
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "pid": os.getpid(),
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class JsonlSink:
+    """Appends one JSON object per finished span to a local file, opened on the first write."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+sink = JsonlSink(TRACE_PATH) if TRACE_PATH else None
+
+
+def current_span():
+    return _current.get()
+
+
+def current_trace_id():
+    span_ = _current.get()
+    return span_.trace_id if span_ else None
+
+
+def start_span(name, trace_id=None, **attrs):
+    """Starts a span and makes it current. Returns (span, token) for end_span; (None, None) when tracing is off."""
+    if sink is None:
+        return None, None
+    span_ = Span(name, _current.get(), trace_id, attrs)
+    return span_, _current.set(span_)
+
+
+def end_span(span_, token):
+    if span_ is None:
+        return
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Ended from another context, e.g. a generator closed by the garbage collector
+        pass
+    span_.finish()
+
+
+@contextmanager
+def span(name, **attrs):
+    """A child of the current span for the duration of the block."""
+    span_, token = start_span(name, **attrs)
+    try:
+        yield span_
+    except Exception as e:
+        if span_ is not None:
+            span_.set(error=type(e).__name__)
+        raise
+    finally:
+        end_span(span_, token)
+
+
+def traced(name):
+    """Decorator: runs the function (or coroutine function) inside span(name). Not for generators; use `with span()` in them."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if sink is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if sink is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attrs):
+    """Adds attributes to the current span, if any."""
+    span_ = _current.get()
+    if span_ is not None:
+        span_.attrs.update(attrs)
+
+
+def record_span(name, start, end, **attrs):
+    """A finished child of the current span for an interval timed elsewhere (perf_counter values)."""
+    if sink is None:
+        return
+    Span(name, _current.get(), attrs=attrs, start=start).finish(end)
+
+
+# ==========================================
+# Chrome trace export
+# ==========================================
+def read_spans(path, trace_id=None):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if trace_id is None or r["trace_id"] == trace_id]
+
+
+def to_chrome_trace(records):
+    """Complete ("X") trace events; nesting on a thread comes from time containment."""
+    events = []
+    for r in records:
+        events.append({
+            "name": r["name"],
+            "cat": r["name"].split(".")[0],
+            "ph": "X",
+            "ts": r["ts"] * 1e6,
+            "dur": r["duration_ms"] * 1e3,
+            "pid": r.get("pid", 0),
+            "tid": r.get("thread", 0),
+            "args": dict(r.get("attrs") or {}, trace_id=r["trace_id"], span_id=r["span_id"],
+                         parent_id=r["parent_id"]),
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path, out_path, trace_id=None):
+    """Converts a JSONL span file to Chrome trace JSON. Returns the number of spans written."""
+    records = read_spans(path, trace_id)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(records), f)
+    return len(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spans', help="JSONL file written with TRACE_PATH")
+    parser.add_argument('out', help="Chrome trace JSON to write")
+    parser.add_argument('--trace-id', help="only this request's spans")
+    args = parser.parse_args()
+    count = export_chrome_trace(args.spans, args.out, args.trace_id)
+    print(f"Wrote {count} spans to {args.out}")
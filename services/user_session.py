@@ -0,0 +1,251 @@
+import json
+from collections import deque
+from collections.abc import Sequence
+from enum import Enum
+import numpy as np
+from config import CHAT_HISTORY_MAX_TURNS
+
+# Large per-report fields: the SQLite store keeps them in their own rows and only reads them on access
+HEAVY_FIELDS = ("raw_text_chunks", "chunk_meta", "embeddings", "embedding_matrix")
+
+# Placeholder for a heavy field that has not been read from the store yet
+LAZY = object()
+
+# Always present, like the keys of the old default session dict
+_CORE_FIELDS = ("blood_context", "raw_text_chunks", "chunk_meta", "embeddings", "embedding_matrix", "chat_history")
+
+
+class Role(Enum):
+    """Chat roles; every turn points at one of these members instead of its own string."""
+    USER = "user"
+    AI = "ai"
+    SYSTEM = "system"
+
+
+class ChatHistory(Sequence):
+    """
+    Bounded chat history: a ring buffer of (Role, text) tuples holding the last
+    `maxlen` messages. Reads look like the old list of {"role", "text"} dicts.
+    """
+    __slots__ = ("_turns",)
+
+    def __init__(self, messages=(), maxlen=CHAT_HISTORY_MAX_TURNS):
+        self._turns = deque(maxlen=maxlen or None)
+        self.extend(messages)
+
+    @property
+    def maxlen(self):
+        return self._turns.maxlen
+
+    def append(self, message):
+        self._turns.append((Role(message["role"]), message["text"]))
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def clear(self):
+        self._turns.clear()
+
+    def discard_oldest(self, count):
+        """Drops the `count` oldest messages (e.g. once they are folded into a summary)."""
+        for _ in range(min(count, len(self._turns))):
+            self._turns.popleft()
+
+    def turns(self):
+        """The stored (Role, text) tuples, oldest first."""
+        return iter(self._turns)
+
+    @staticmethod
+    def _message(turn):
+        return {"role": turn[0].value, "text": turn[1]}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(self._turns[i]) for i in range(*index.indices(len(self._turns)))]
+        return self._message(self._turns[index])
+
+    def __iter__(self):
+        return (self._message(turn) for turn in self._turns)
+
+    def __len__(self):
+        return len(self._turns)
+
+    def __eq__(self, other):
+        if isinstance(other, (ChatHistory, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def to_list(self):
+        return list(self)
+
+    def __repr__(self):
+        return f"ChatHistory({len(self)}/{self.maxlen} messages)"
+
+
+class UserSession:
+    """
+    One user's state, with dict-style access (session['chat_history'], .get, 'key' in session).
+
+    - blood_context is kept as compact JSON bytes. The first read decodes it into a
+      dict that later reads share, so in-place changes stick; pack() folds it back
+      into bytes, which the stores do on save.
+    - chat_history is a ChatHistory ring buffer (CHAT_HISTORY_MAX_TURNS messages).
+    - Embeddings live only in embedding_matrix (float32); assigning legacy
+      `embeddings` vectors converts them (an empty list changes nothing), and reading
+      `embeddings` returns the matrix rows as lists ([] without a matrix).
+    - Other keys (weekly_plan, ...) go to a small extras dict.
+    With a loader (the SQLite store), heavy fields start as LAZY and are read on first access.
+    """
+    __slots__ = ("_blood_context", "_blood_dict", "_chat_history", "raw_text_chunks", "chunk_meta", "embedding_matrix",
+                 "extras", "loaded", "_loader")
+
+    def __init__(self, data=None, lazy_fields=(), loader=None):
+        self._blood_context = b"{}"
+        self._blood_dict = None  # decoded blood_context, until pack()
+        self._chat_history = ChatHistory()
+        self.raw_text_chunks = []
+        self.chunk_meta = []
+        self.embedding_matrix = None
+        self.extras = None
+        # field -> object as loaded; identity tells the store the field was not replaced
+        self.loaded = {} if loader else None
+        self._loader = loader
+        for field in lazy_fields:
+            if field in HEAVY_FIELDS and field != "embeddings":
+                setattr(self, field, LAZY)
+        if data:
+            self.update(data)
+
+    # --- dict-style access ---
+
+    def __getitem__(self, key):
+        if key == "blood_context":
+            if self._blood_dict is None:
+                self._blood_dict = json.loads(self._blood_context)
+            return self._blood_dict
+        if key == "chat_history":
+            return self._chat_history
+        if key == "embeddings":
+            matrix = self["embedding_matrix"]
+            return [] if matrix is None else matrix.tolist()
+        if key in HEAVY_FIELDS:
+            value = getattr(self, key)
+            if value is LAZY:
+                value = self._loader(key)
+                setattr(self, key, value)
+                self.loaded[key] = value
+            return value
+        if self.extras is None:
+            raise KeyError(key)
+        return self.extras[key]
+
+    def __setitem__(self, key, value):
+        if key == "blood_context":
+            self._blood_context = json.dumps(value if value is not None else {}, separators=(",", ":")).encode()
+            self._blood_dict = None
+        elif key == "chat_history":
+            self._chat_history = value if isinstance(value, ChatHistory) else ChatHistory(value or ())
+        elif key == "embeddings":
+            if value is not None and len(value):
+                from services.rag_service import build_embedding_matrix
+                self.embedding_matrix = build_embedding_matrix(value)
+        elif key == "embedding_matrix":
+            self.embedding_matrix = None if value is None else np.asarray(value, dtype=np.float32)
+        elif key in HEAVY_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = value
+
+    def __delitem__(self, key):
+        if key in _CORE_FIELDS:
+            self[key] = {"blood_context": {}, "chat_history": (), "embedding_matrix": None}.get(key, [])
+        elif self.extras is not None and key in self.extras:
+            del self.extras[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in _CORE_FIELDS or (self.extras is not None and key in self.extras)
+
+    def __iter__(self):
+        yield from _CORE_FIELDS
+        if self.extras:
+            yield from list(self.extras)
+
+    def __len__(self):
+        return len(_CORE_FIELDS) + len(self.extras or ())
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def update(self, data=(), **fields):
+        for key, value in dict(data, **fields).items():
+            self[key] = value
+
+    # --- storage helpers ---
+
+    def pack(self):
+        """Folds a decoded (possibly changed) blood_context back into compact JSON bytes."""
+        if self._blood_dict is not None:
+            self["blood_context"] = self._blood_dict
+
+    def raw(self, key):
+        """A heavy field as stored, without loading it (may be LAZY)."""
+        return getattr(self, key)
+
+    def stored_items(self):
+        """(key, value) for persisting: JSON-ready light fields, heavy fields as stored (possibly LAZY)."""
+        yield "blood_context", self._blood_dict if self._blood_dict is not None else json.loads(self._blood_context)
+        yield "chat_history", self._chat_history.to_list()
+        for key in HEAVY_FIELDS:
+            if key != "embeddings":
+                yield key, getattr(self, key)
+        if self.extras:
+            yield from list(self.extras.items())
+
+    def sizes(self):
+        """Stored values for size estimates: JSON bytes, (Role, text) turns, raw heavy fields, extras."""
+        yield self._blood_context
+        yield self._chat_history
+        yield self.raw_text_chunks
+        yield self.chunk_meta
+        yield self.embedding_matrix
+        if self.extras:
+            yield self.extras
+
+    def to_dict(self):
+        data = dict(self.items())
+        data["chat_history"] = self._chat_history.to_list()
+        return data
+
+    def __repr__(self):
+        return f"UserSession({', '.join(self)})"
@@ -55,6 +55,65 @@ export function apiSlice() {
             }
         },
 
+        // Submits a long generation as a background job and polls until the result is ready.
+        async runJob(url, body) {
+            const res = await fetch(url, {
+                method: 'POST', headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({ ...body, async: true })
+            });
+            if (res.status === 401) {
+                window.location.href = '/login';
+                return;
+            }
+            if (res.status !== 202) return res.json();
+
+            let job = await res.json();
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1500));
+                const poll = await fetch(`${job.status_url}?token=${encodeURIComponent(this.token)}`);
+                if (!poll.ok) throw new Error('Job lost');
+                job = { ...job, ...(await poll.json()) };
+            }
+            if (job.status !== 'done') throw new Error(job.error || 'Job failed');
+            return job.result;
+        },
+
+        // Streams a plan as NDJSON; onDay(day, index) fires as soon as each day is generated.
+        async streamPlan(url, body, onDay) {
+            const res = await fetch(url, {
+                method: 'POST', headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({ ...body, stream: true })
+            });
+            if (res.status === 401) {
+                window.location.href = '/login';
+                return;
+            }
+            if (!res.ok || !res.body) throw new Error('Stream failed');
+
+            const plan = [];
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            const handle = (line) => {
+                if (!line.trim()) return;
+                const event = JSON.parse(line);
+                if (event.type === 'day') {
+                    plan[event.index] = event.day;
+                    if (onDay) onDay(event.day, event.index);
+                }
+            };
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handle);
+            }
+            handle(buffer);
+            return plan;
+        },
+
         handleAnalysisSuccess(data) {
             // 3. Save the specific bloodwork data
             this.context = data;
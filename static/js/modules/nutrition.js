@@ -281,32 +281,8 @@ export function nutritionSlice() {
 
         async executePlanGeneration(strategyName) {
             try {
-                const [mealRes, workoutRes] = await Promise.all([
-                    fetch('/generate_week', {
-                        method: 'POST', headers: {'Content-Type': 'application/json'},
-                        body: JSON.stringify({
-                            token: this.token,
-                            strategy_name: strategyName,
-                            blood_strategies: this.bloodStrategies,
-                            lifestyle: this.userChoices
-                        })
-                    }),
-                    fetch('/generate_workout', {
-                        method: 'POST', headers: {'Content-Type': 'application/json'},
-                        body: JSON.stringify({
-                            token: this.token,
-                            strategy_name: strategyName,
-                            fitness_strategy: this.selectedFitnessStrategy?.title || strategyName,
-                            lifestyle: this.userChoices
-                        })
-                    })
-                ]);
-
-                const data = await mealRes.json();
-                const workoutData = await workoutRes.json();
-
                 // Assign valid dates to the week plan starting from TODAY
-                this.weekPlan = data.map((daily, index) => {
+                const toMealDay = (daily, index) => {
                     const targetDate = new Date();
                     targetDate.setDate(new Date().getDate() + index); // Today + index
                     const dateStr = targetDate.toISOString().split('T')[0];
@@ -319,7 +295,29 @@ export function nutritionSlice() {
                         date: dateStr,
                         completed: false
                     };
-                });
+                };
+
+                // Meal days stream in one by one; the workout plan runs as a background job
+                const streamedDays = [];
+                const [data, workoutData] = await Promise.all([
+                    this.streamPlan('/generate_week', {
+                        token: this.token,
+                        strategy_name: strategyName,
+                        blood_strategies: this.bloodStrategies,
+                        lifestyle: this.userChoices
+                    }, (daily, index) => {
+                        streamedDays[index] = toMealDay(daily, index);
+                        this.weekPlan = streamedDays.filter(Boolean);
+                    }),
+                    this.runJob('/generate_workout', {
+                        token: this.token,
+                        strategy_name: strategyName,
+                        fitness_strategy: this.selectedFitnessStrategy?.title || strategyName,
+                        lifestyle: this.userChoices
+                    })
+                ]);
+
+                this.weekPlan = data.map(toMealDay);
 
                 // Assign valid dates to the workout plan starting from TODAY
                 this.workoutPlan = workoutData.map((daily, index) => {
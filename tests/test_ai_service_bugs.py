@@ -5,7 +5,7 @@ import json
 
 class TestAIService(unittest.TestCase):
 
-    @patch('services.ai_service.requests.post')
+    @patch('services.ai_service.ollama_client.post')
     def test_query_ollama_system_instruction_persistence(self, mock_post):
         # 1. First call: Return a tool call
         # 2. Second call: Return a final JSON answer
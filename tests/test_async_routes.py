@@ -0,0 +1,257 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import json
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asgi import application
+from app import app
+import services.ai_service as ai_service
+import routes.mini_apps as routes_mini_apps
+from services import async_ollama
+from services.async_ollama import AsyncOllamaClient, async_ollama_client
+from services.metrics import registry
+from services.session_service import get_session
+from benchmarks.mock_ollama import MockOllama
+
+
+def run(coro):
+    """Runs `coro` on a fresh event loop, closing the loop's Ollama pool afterwards."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_ollama_client.aclose()
+    return asyncio.run(main())
+
+
+async def call(path, body=None, method="POST", headers=(), disconnect_after_first_chunk=False):
+    """Drives the ASGI app like a server would; returns (status, headers, body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {"type": "http", "http_version": "1.1", "method": method, "scheme": "http", "path": path,
+             "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+                         *[(k.lower().encode(), v.encode()) for k, v in headers]],
+             "server": ("testserver", 80), "client": ("127.0.0.1", 50000)}
+    messages = []
+    disconnected = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if disconnect_after_first_chunk and message["type"] == "http.response.body" and message.get("body"):
+            disconnected.set()
+
+    await application(scope, receive, send)
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], response_headers, b"".join(m.get("body", b"") for m in messages[1:]).decode()
+
+
+def session_cookie(user_id):
+    value = app.session_interface.get_signing_serializer(app).dumps({"user_id": user_id})
+    return ("Cookie", f"{app.config['SESSION_COOKIE_NAME']}={value}")
+
+
+class AsyncTestCase(unittest.TestCase):
+    token_latency = 0
+
+    def setUp(self):
+        self.mock = MockOllama(ttft=0, token_latency=self.token_latency, embed_latency=0, seed=3)
+        url = self.mock.start()
+        self.addCleanup(self.mock.stop)
+        patcher = patch.object(ai_service, 'CHAT_ENDPOINT', f"{url}/api/chat")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestAsyncOllama(AsyncTestCase):
+
+    def test_query_ollama(self):
+        self.assertEqual(run(async_ollama.query_ollama("Define ferritin", "Reply in JSON"))["status"], "Safe")
+        self.assertEqual(self.mock.counters["chat"], 1)
+
+    def test_stream_ollama(self):
+        async def collect():
+            return [chunk async for chunk in async_ollama.stream_ollama([{"role": "user", "content": "Hi"}])]
+
+        chunks = run(collect())
+        self.assertGreater(len(chunks), 1)
+        self.assertIn("ferritin", "".join(chunks))
+
+    def test_stream_reports_http_errors(self):
+        async def collect():
+            return "".join([chunk async for chunk in async_ollama.stream_ollama([{"role": "user", "content": "Hi"}])])
+
+        with patch.object(ai_service, 'CHAT_ENDPOINT', self.mock.url + "/api/missing"):
+            self.assertIn("trouble connecting", run(collect()))
+
+
+class TestAsyncClientPools(unittest.TestCase):
+
+    def test_one_pool_per_loop_all_closed_by_aclose(self):
+        client = AsyncOllamaClient(pool_size=2)
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        self.addCleanup(other_loop.close)
+
+        async def pool():
+            return client.http
+
+        other = asyncio.run_coroutine_threadsafe(pool(), other_loop).result(5)
+
+        async def main():
+            mine = client.http
+            self.assertIs(client.http, mine)
+            self.assertIsNot(mine, other)
+            self.assertEqual(client.stats()["pools"], 2)
+            await client.aclose()
+            return mine
+
+        mine = asyncio.run(main())
+        self.assertTrue(mine.is_closed)
+        self.assertTrue(other.is_closed)
+        self.assertEqual(client.stats()["pools"], 0)
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(5)
+
+    def test_pools_of_ended_loops_are_dropped(self):
+        client = AsyncOllamaClient(pool_size=2)
+
+        async def pool():
+            return client.http
+
+        with self.assertLogs('services.async_ollama', level='WARNING'):
+            first = asyncio.run(pool())
+            second = asyncio.run(pool())
+        self.assertIsNot(first, second)
+        self.assertEqual(client.stats()["pools"], 1)
+
+
+class TestAsyncRoutes(AsyncTestCase):
+
+    def test_mini_app(self):
+        status, headers, body = run(call('/suggest_supplement', {"focus": "sleep"}))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['x-cache'], 'BYPASS')
+        self.assertEqual(json.loads(body)["status"], "Safe")
+
+    def test_cache_io_stays_off_the_event_loop(self):
+        cache = routes_mini_apps.mini_app_cache
+        threads = []
+
+        def record(method):
+            def call(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return method(*args, **kwargs)
+            return call
+
+        async def twice():
+            loop_thread = threading.current_thread()
+            first = await call('/define_term', {"term": "async-cache-probe"})
+            second = await call('/define_term', {"term": "async-cache-probe"})
+            return loop_thread, first, second
+
+        with patch.object(cache, 'get', side_effect=record(cache.get)), \
+                patch.object(cache, 'set', side_effect=record(cache.set)):
+            loop_thread, first, second = run(twice())
+        self.assertEqual((first[1]['x-cache'], second[1]['x-cache']), ('MISS', 'HIT'))
+        self.assertEqual(len(threads), 3)  # get, set, get
+        self.assertNotIn(loop_thread, threads)
+
+    def test_invalid_json(self):
+        async def bad():
+            scope_body = b"{not json"
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": scope_body, "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+
+            await application({"type": "http", "method": "POST", "path": "/suggest_supplement", "headers": [],
+                               "query_string": b""}, receive, send)
+            return messages[0]["status"]
+
+        self.assertEqual(run(bad()), 400)
+
+    def test_chat_agent_requires_login(self):
+        status, _, body = run(call('/chat_agent', {"message": "Hi"}))
+        self.assertEqual(status, 401)
+        self.assertEqual(json.loads(body), {"error": "Unauthorized"})
+
+    def test_chat_agent_streams_and_saves_history(self):
+        user_id = "async-chat@example.com"
+        with patch('routes.health_routes.schedule_summary') as summary:
+            status, headers, body = run(call('/chat_agent', {"message": "Why am I tired?"},
+                                             headers=[session_cookie(user_id)]))
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['content-type'].startswith('text/plain'))
+        self.assertIn("ferritin", body)
+        history = [m['text'] for m in get_session(user_id)['chat_history']]
+        self.assertEqual(history, ["Why am I tired?", body])
+        summary.assert_called_once_with(user_id)
+
+    def test_other_routes_go_to_flask(self):
+        status, _, body = run(call('/', method="GET"))
+        self.assertEqual(status, 200)
+        self.assertIn("<html", body.lower())
+
+
+class TestDisconnect(AsyncTestCase):
+    # About 2 seconds of tokens, so the stream is still running when the client leaves
+    token_latency = 0.05
+
+    def test_disconnect_cancels_the_ollama_stream(self):
+        user_id = "async-leaver@example.com"
+        cancelled = registry.get("bioflow_ollama_requests_total")
+        before = cancelled.value(kind="chat_stream", priority="interactive", outcome="cancelled")
+
+        started = time.perf_counter()
+        with patch('routes.health_routes.schedule_summary'):
+            status, _, body = run(call('/chat_agent', {"message": "Hello?"}, headers=[session_cookie(user_id)],
+                                       disconnect_after_first_chunk=True))
+        self.assertEqual(status, 200)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertNotIn("recheck", body.lower())
+        self.assertEqual(ai_service.ollama_scheduler.stats()["in_flight"], 0)
+        self.assertEqual(cancelled.value(kind="chat_stream", priority="interactive", outcome="cancelled"), before + 1)
+        # The partial answer is not saved
+        self.assertEqual([m['text'] for m in get_session(user_id)['chat_history']], ["Hello?"])
+
+    def test_disconnect_does_not_fail_an_identical_waiting_call(self):
+        async def scenario():
+            # Two identical mini-app queries share one Ollama call; the first caller leaves
+            leaver = asyncio.ensure_future(async_ollama.query_ollama("Define ferritin", "Reply in JSON"))
+            await asyncio.sleep(0.1)
+            waiter = asyncio.ensure_future(async_ollama.query_ollama("Define ferritin", "Reply in JSON"))
+            await asyncio.sleep(0.1)
+            leaver.cancel()
+            answer = await waiter
+            return answer, leaver.cancelled()
+
+        answer, cancelled = run(scenario())
+        self.assertTrue(cancelled)
+        self.assertEqual(answer["status"], "Safe")
+        # The waiter took over with its own call
+        self.assertEqual(self.mock.counters["chat"], 2)
+        self.assertEqual(ai_service.ollama_scheduler.stats()["in_flight"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch
+from io import BytesIO
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.biomarker_service import parse_row, extract_biomarkers, extract_patient_name
+from services.pdf_service import parse_pdf_report
+from benchmarks.fixtures import make_pdf
+
+PANEL = [
+    [(72, "Patient Name: Jane Doe")],
+    [(72, "Test"), (260, "Result"), (330, "Units"), (400, "Reference Interval")],
+    [(72, "Vitamin D, 25-Hydroxy"), (260, "18.2"), (330, "ng/mL"), (400, "30.0 - 100.0"), (500, "L")],
+    [(72, "Hemoglobin A1c"), (260, "5.4"), (330, "%"), (400, "4.8 - 5.6")],
+    [(72, "LDL Chol Calc (NIH)"), (260, "131"), (330, "mg/dL"), (400, "0 - 99"), (500, "H")],
+    [(72, "Ferritin, Serum"), (260, "45"), (330, "ng/mL"), (400, "30 - 400")],
+]
+
+
+class TestParseRow(unittest.TestCase):
+
+    def test_synonyms_units_and_report_ranges(self):
+        self.assertEqual(parse_row(["25-OH Vitamin D", "45", "nmol/L", "75-250"]),
+                         {"name": "Vitamin D", "value": "45", "unit": "nmol/L", "status": "Low", "range": "75-250"})
+        self.assertEqual(parse_row("HDL Cholesterol 38 mg/dL >39")["status"], "Low")
+        self.assertEqual(parse_row("WBC 6.1 x10E3/uL 3.4 - 10.8")["unit"], "x10^3/uL")
+        self.assertEqual(parse_row("CRP < 0.5 mg/L")["value"], "<0.5")
+
+    def test_default_range_with_unit_conversion(self):
+        # 40 nmol/L is ~16 ng/mL, below the 30 ng/mL default
+        self.assertEqual(parse_row("Vitamin D 40 nmol/L")["status"], "Low")
+        self.assertEqual(parse_row("Glucose 5.0 mmol/L")["status"], "Normal")
+        self.assertEqual(parse_row("Cortisol 25 ug/dL H")["status"], "High")
+
+    def test_rejects_prose_and_ambiguous_abbreviations(self):
+        self.assertIsNone(parse_row("Iron binding notes 2023"))
+        self.assertIsNone(parse_row("K 4.2"))
+        self.assertIsNone(parse_row("Page 1 of 3"))
+        self.assertEqual(parse_row("K 4.2 mmol/L")["name"], "Potassium")
+
+    def test_patient_name(self):
+        self.assertEqual(extract_patient_name("Patient Name: Jane Doe\nDOB: 1980"), "Jane Doe")
+        self.assertIsNone(extract_patient_name("No identifiers here"))
+
+
+class TestReportExtraction(unittest.TestCase):
+
+    def test_word_positions_recover_columns(self):
+        report = parse_pdf_report(make_pdf([PANEL]))
+        self.assertIn(["Vitamin D, 25-Hydroxy", "18.2", "ng/mL", "30.0 - 100.0", "L"], report["rows"])
+
+        markers = {m["name"]: m for m in extract_biomarkers(report["rows"], report["text"])}
+        self.assertEqual(list(markers), ["Vitamin D", "HbA1c", "LDL Cholesterol", "Ferritin"])
+        self.assertEqual(markers["Vitamin D"]["status"], "Low")
+        self.assertEqual(markers["LDL Cholesterol"]["status"], "High")
+        self.assertEqual(markers["HbA1c"]["range"], "4.8-5.6")
+
+    def test_long_reports_are_fully_covered(self):
+        # Markers past the old 8000-character prompt cut-off are still found
+        filler = [[(72, f"Comment line {i} with no results in it at all")] for i in range(40)]
+        report = parse_pdf_report(make_pdf([filler] * 6 + [PANEL]))
+        self.assertGreater(report["text"].index("Ferritin"), 8000)
+        self.assertIn("Ferritin", [m["name"] for m in extract_biomarkers(report["rows"], report["text"])])
+
+    @patch('routes.health_routes.query_ollama')
+    @patch('routes.health_routes.get_embeddings', return_value=[])
+    def test_init_context_asks_llm_for_narrative_only(self, mock_embed, mock_query):
+        from app import app
+        from routes.health_routes import ingest_cache
+        ingest_cache.invalidate()
+        mock_query.return_value = {"health_score": 70, "summary": "Low vitamin D", "issues": [{"title": "Vitamin D"}],
+                                   "biomarkers": [{"name": "Invented"}]}
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 'panel@example.com'
+
+        response = client.post('/init_context', data={'file': (BytesIO(make_pdf([PANEL])), 'panel.pdf')},
+                               content_type='multipart/form-data')
+        data = response.get_json()
+
+        self.assertEqual(data['patient_name'], "Jane Doe")
+        self.assertEqual([b['name'] for b in data['biomarkers']],
+                         ["Vitamin D", "HbA1c", "LDL Cholesterol", "Ferritin"])
+        prompt = mock_query.call_args[0][0]
+        self.assertIn("- Vitamin D: 18.2 ng/mL (Low, ref 30-100)", prompt)
+        self.assertNotIn("Reference Interval", prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
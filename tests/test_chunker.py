@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.chunker import chunk_pages, count_tokens
+
+
+def _pages(texts):
+    """(page_number, offset, text) triples laid out the way pdf_service builds full_text."""
+    pages, offset = [], 0
+    for number, text in enumerate(texts, start=1):
+        pages.append((number, offset, text))
+        offset += len(text) + 1
+    return pages, "".join(t + "\n" for t in texts)
+
+
+class TestChunker(unittest.TestCase):
+
+    def test_dense_text_without_blank_lines_is_windowed(self):
+        text = " ".join(f"Ferritin reading {i} reflects stored iron and drops before hemoglobin does." for i in range(60))
+        pages, full_text = _pages([text])  # one giant line, no blank lines
+        chunks = chunk_pages(pages, max_tokens=50, overlap_tokens=10)
+
+        self.assertGreater(len(chunks), 5)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk["text"]), 50)
+            self.assertEqual(chunk["page"], 1)
+            self.assertTrue(full_text[chunk["start"]:chunk["end"]].startswith(chunk["text"][:20]))
+
+    def test_repeated_headers_footers_are_dropped(self):
+        body = "\n".join(f"Note {i}: discuss sleep and recovery habits with your doctor." for i in range(5))
+        texts = [f"ACME Diagnostics Report\n{body}\nPage {n} of 3" for n in range(1, 4)]
+        chunks = chunk_pages(_pages(texts)[0], max_tokens=500)
+        joined = "\n".join(c["text"] for c in chunks)
+        self.assertNotIn("ACME Diagnostics", joined)
+        self.assertNotIn("Page 2 of 3", joined)
+        self.assertIn("discuss sleep", joined)
+
+    def test_table_rows_stay_whole_and_carry_the_header(self):
+        rows = [f"Marker{i} {10 + i} mg/dL 5 - 40" for i in range(30)]
+        text = "Test Result Units Reference\n" + "\n".join(rows)
+        chunks = chunk_pages(_pages([text])[0], max_tokens=40, overlap_tokens=0)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            lines = chunk["text"].split("\n")
+            self.assertEqual(lines[0], "Test Result Units Reference")
+            for line in lines[1:]:
+                self.assertIn(line, rows)
+
+    def test_overlap_and_dedup(self):
+        lines = [f"Line {i} talks about a different lifestyle topic entirely." for i in range(20)]
+        chunks = chunk_pages(_pages(["\n".join(lines)])[0], max_tokens=40, overlap_tokens=12)
+        first, second = chunks[0]["text"].split("\n"), chunks[1]["text"].split("\n")
+        self.assertEqual(first[-1], second[0])
+
+        repeated = "Avoid alcohol before bed to improve deep sleep quality."
+        text = "\n".join(["Hydrate well in the morning before training.", repeated,
+                          "Walk for ten minutes after each meal.", repeated])
+        chunks = chunk_pages(_pages([text])[0], max_tokens=count_tokens(repeated), overlap_tokens=0)
+        self.assertEqual([c["text"] for c in chunks].count(repeated), 1)
+        self.assertEqual(len(chunks), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
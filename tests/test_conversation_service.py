@@ -0,0 +1,152 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from utils import sessions
+from services.chunker import count_tokens
+from services.user_session import UserSession, ChatHistory
+from services.conversation_service import (build_chat_messages, summarize_history, schedule_summary, fit_context,
+                                           CHAT_INSTRUCTIONS)
+
+
+def chat(turns, words=60):
+    return [{"role": "user" if i % 2 == 0 else "ai", "text": f"turn {i} " + "iron ferritin fatigue " * (words // 3)}
+            for i in range(turns)]
+
+
+def prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+class TestPromptBudget(unittest.TestCase):
+    def test_prompt_cost_is_constant(self):
+        rag = "\n---\n".join(f"[Page {i}] " + "Ferritin 12 ng/mL low. " * 40 for i in range(3))
+        sizes = []
+        # Every one of these conversations is longer than the budget
+        for turns in (40, 70, 100):
+            user_session = UserSession({"blood_context": {"summary": "Low iron"}, "chat_history": chat(turns),
+                                        "conversation_summary": "Patient reports fatigue. " * 100})
+            messages = build_chat_messages(user_session, "What should I eat?", rag, budget=1500)
+            sizes.append(prompt_tokens(messages))
+            # The patient summary and the new question are never pushed out
+            self.assertIn("PATIENT SUMMARY: Low iron", messages[0]["content"])
+            self.assertEqual(messages[-1], {"role": "user", "content": "What should I eat?"})
+        self.assertLessEqual(max(sizes), 1500)
+        self.assertLess(max(sizes) - min(sizes), 100)
+
+    def test_shares_flow_to_history_when_unused(self):
+        user_session = UserSession({"chat_history": chat(100, words=15)})
+        messages = build_chat_messages(user_session, "Hi", "", budget=1000)
+        self.assertIn("EARLIER IN THIS CONVERSATION: None yet.", messages[0]["content"])
+        history_tokens = prompt_tokens(messages[1:-1])
+        self.assertGreater(history_tokens, 1000 - count_tokens(CHAT_INSTRUCTIONS) - 60)
+
+    def test_fit_context_keeps_whole_chunks(self):
+        rag = "first chunk text\n---\nsecond chunk text\n---\nthird"
+        self.assertEqual(fit_context(rag, 6), "first chunk text\n---\nsecond chunk text")
+        self.assertEqual(fit_context("one two three four", 2), "one two …")
+
+
+class TestSummarizer(unittest.TestCase):
+    def setUp(self):
+        sessions.clear()
+
+    @patch('services.conversation_service.query_ollama')
+    def test_folds_older_turns(self, mock_query):
+        sessions['s@example.com'] = {"chat_history": chat(14, words=9)}
+
+        def reply_meanwhile(*args, **kwargs):
+            # The user keeps chatting while the summary is written
+            sessions['s@example.com']['chat_history'].append({"role": "user", "text": "new question"})
+            return {"summary": "Fatigue from low ferritin; advised red meat."}
+
+        mock_query.side_effect = reply_meanwhile
+        self.assertTrue(summarize_history('s@example.com'))
+
+        user_session = sessions['s@example.com']
+        self.assertEqual(user_session['conversation_summary'], "Fatigue from low ferritin; advised red meat.")
+        texts = [m['text'] for m in user_session['chat_history']]
+        self.assertEqual(len(texts), 7)
+        self.assertTrue(texts[0].startswith("turn 8 "))
+        self.assertEqual(texts[-1], "new question")
+        self.assertIn("turn 0", mock_query.call_args[0][0])
+
+    @patch('services.conversation_service.query_ollama')
+    def test_folds_when_the_cap_drops_messages_meanwhile(self, mock_query):
+        # History at its cap: every new message pushes the oldest out
+        sessions['s@example.com'] = {"chat_history": ChatHistory(chat(14, words=9), maxlen=14)}
+
+        def reply_meanwhile(*args, **kwargs):
+            for i in range(3):
+                sessions['s@example.com']['chat_history'].append({"role": "user", "text": f"new question {i}"})
+            return {"summary": "Fatigue from low ferritin."}
+
+        mock_query.side_effect = reply_meanwhile
+        self.assertTrue(summarize_history('s@example.com'))
+
+        user_session = sessions['s@example.com']
+        self.assertEqual(user_session['conversation_summary'], "Fatigue from low ferritin.")
+        texts = [m['text'] for m in user_session['chat_history']]
+        self.assertEqual(len(texts), 9)
+        self.assertTrue(texts[0].startswith("turn 8 "))
+        self.assertEqual(texts[-1], "new question 2")
+
+    @patch('services.conversation_service.query_ollama')
+    def test_skips_and_logs_when_history_is_replaced(self, mock_query):
+        sessions['s@example.com'] = {"chat_history": chat(14)}
+
+        def clear_meanwhile(*args, **kwargs):
+            sessions['s@example.com']['chat_history'] = [{"role": "user", "text": "fresh start"}]
+            return {"summary": "Old chat."}
+
+        mock_query.side_effect = clear_meanwhile
+        with self.assertLogs('services.conversation_service', level='WARNING'):
+            self.assertFalse(summarize_history('s@example.com'))
+        self.assertNotIn('conversation_summary', sessions['s@example.com'])
+        self.assertEqual(len(sessions['s@example.com']['chat_history']), 1)
+
+    @patch('services.conversation_service.query_ollama', return_value=None)
+    def test_failure_keeps_history(self, mock_query):
+        sessions['s@example.com'] = {"chat_history": chat(14)}
+        self.assertFalse(summarize_history('s@example.com'))
+        self.assertEqual(len(sessions['s@example.com']['chat_history']), 14)
+
+    @patch('services.conversation_service.query_ollama', return_value={"summary": "Short."})
+    def test_scheduled_in_background_once(self, mock_query):
+        sessions['s@example.com'] = {"chat_history": chat(4)}
+        self.assertIsNone(schedule_summary('s@example.com'))
+
+        sessions['s@example.com'] = {"chat_history": chat(12)}
+        schedule_summary('s@example.com').result(timeout=5)
+        self.assertEqual(sessions['s@example.com']['conversation_summary'], "Short.")
+        self.assertEqual(len(sessions['s@example.com']['chat_history']), 6)
+
+
+class TestChatRoute(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        sessions.clear()
+        with self.app.session_transaction() as sess:
+            sess['user_id'] = 'chat@example.com'
+
+    @patch('routes.health_routes.schedule_summary')
+    @patch('routes.health_routes.stream_ollama')
+    def test_summary_in_prompt_and_scheduled_after_stream(self, mock_stream, mock_schedule):
+        mock_stream.return_value = iter(["Eat more iron."])
+        sessions['chat@example.com'] = {"conversation_summary": "Discussed fatigue.", "chat_history": chat(2)}
+
+        response = self.app.post('/chat_agent', json={'message': 'And breakfast?'})
+        self.assertEqual(response.data.decode('utf-8'), "Eat more iron.")
+
+        messages = mock_stream.call_args[0][0]
+        self.assertIn("EARLIER IN THIS CONVERSATION: Discussed fatigue.", messages[0]["content"])
+        self.assertEqual(len(messages), 4)
+        mock_schedule.assert_called_once_with('chat@example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
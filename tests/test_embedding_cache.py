@@ -0,0 +1,80 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lru_respects_byte_budget(self):
+        # Each 100-dim float32 vector costs 400 bytes + overhead; room for two
+        cache = EmbeddingCache(max_bytes=1300, db_path=None)
+        cache.set("m", "a", [1.0] * 100)
+        cache.set("m", "b", [2.0] * 100)
+        self.assertIsNotNone(cache.get("m", "a"))  # touch "a" so "b" is least recent
+        cache.set("m", "c", [3.0] * 100)
+
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertEqual(cache.get("m", "a")[0], 1.0)
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 1300)
+
+    def test_survives_restart_via_disk(self):
+        cache = EmbeddingCache(db_path=self.db_path)
+        cache.set("nomic", "Vitamin D 25-OH", [0.5, -0.25, 1.0])
+
+        warm = EmbeddingCache(db_path=self.db_path)
+        self.assertEqual(warm.get("nomic", "Vitamin D 25-OH"), [0.5, -0.25, 1.0])
+        self.assertIsNone(warm.get("other-model", "Vitamin D 25-OH"))
+        stats = warm.stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+        # Promoted into memory on the first disk hit
+        warm.get("nomic", "Vitamin D 25-OH")
+        self.assertEqual(warm.stats()["hits"], 1)
+
+    def test_set_many_commits_once(self):
+        cache = EmbeddingCache(db_path=self.db_path)
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+        cache.set_many("nomic", [(f"chunk {i}", [float(i), 1.0]) for i in range(20)] + [("empty", [])])
+
+        self.assertEqual(statements.count("COMMIT"), 1)
+        self.assertEqual(cache.stats()["disk_writes"], 20)
+        self.assertEqual(EmbeddingCache(db_path=self.db_path).get("nomic", "chunk 7"), [7.0, 1.0])
+
+    def test_disk_trim_drops_least_recently_used(self):
+        cache = EmbeddingCache(db_path=self.db_path, max_disk_rows=2)
+        for text in ("a", "b"):
+            cache.set("m", text, [1.0])
+            time.sleep(0.01)
+
+        # A fresh process reads "a" from disk, so "b" is now the least recently used row
+        warm = EmbeddingCache(db_path=self.db_path, max_disk_rows=2)
+        self.assertIsNotNone(warm.get("m", "a"))
+        time.sleep(0.01)
+        warm.set("m", "c", [1.0])
+        warm._trim_disk()
+
+        cold = EmbeddingCache(db_path=self.db_path)
+        self.assertIsNone(cold.get("m", "b"))
+        self.assertIsNotNone(cold.get("m", "a"))
+        self.assertIsNotNone(cold.get("m", "c"))
+
+
+if __name__ == '__main__':
+    unittest.main()
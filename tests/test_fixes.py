@@ -18,15 +18,16 @@ class TestBugs(unittest.TestCase):
         self.app.testing = True
         sessions.clear()
 
-    @patch('routes.health_routes.advanced_pdf_parse')
-    @patch('routes.health_routes.get_embedding')
+    @patch('routes.health_routes.parse_pdf_report')
+    @patch('routes.health_routes.get_embeddings')
     @patch('routes.health_routes.query_ollama')
     def test_shared_session_bug_fixed(self, mock_query, mock_embed, mock_parse):
         # This test now verifies the fix
 
         # Setup mocks
-        mock_parse.return_value = ("Content", ["Chunk1"])
-        mock_embed.return_value = [0.1, 0.2]
+        mock_parse.return_value = {"text": "Content", "chunks": [{"text": "Chunk1", "page": 1, "start": 0, "end": 6}],
+                                   "rows": []}
+        mock_embed.return_value = [[0.1, 0.2]]
         mock_query.return_value = {"summary": "User A Data", "issues": []}
 
         # Request 1: User A uploads file without token
@@ -41,7 +42,7 @@ class TestBugs(unittest.TestCase):
         # Verify no None session created
         self.assertNotIn(None, sessions)
 
-    @patch('services.ai_service.requests.post')
+    @patch('services.ai_service.ollama_client.post')
     def test_query_ollama_crash_fixed(self, mock_post):
         # Simulate 500 Internal Server Error with HTML body
         mock_response = MagicMock()
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+from io import BytesIO
+import hashlib
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from utils import sessions
+from routes.health_routes import ingest_cache
+from services.ingest_cache import IngestCache
+
+DIAGNOSIS = {"summary": "Low iron", "issues": [{"title": "Ferritin"}]}
+
+
+class TestIngestCache(unittest.TestCase):
+
+    def test_round_trip_and_versioning(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ingest.sqlite3")
+            matrix = np.eye(2, 3, dtype=np.float32)
+            IngestCache("m1", db_path=path).set("abc", "text", ["c1", "c2"], matrix, DIAGNOSIS)
+
+            entry = IngestCache("m1", db_path=path).get("abc")
+            self.assertEqual(entry["chunks"], ["c1", "c2"])
+            self.assertEqual(entry["diagnosis"], DIAGNOSIS)
+            np.testing.assert_array_equal(entry["matrix"], matrix)
+            # Another model version never sees it
+            self.assertIsNone(IngestCache("m2", db_path=path).get("abc"))
+
+    def test_lru_size_cap(self):
+        cache = IngestCache("m1", max_bytes=100)
+        cache.set("a", "x" * 30, [], None, {})
+        cache.set("b", "y" * 30, [], None, {})
+        cache.get("a")
+        cache.set("c", "z" * 30, [], None, {})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class TestInitContextCache(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        sessions.clear()
+        ingest_cache.invalidate()
+        with self.app.session_transaction() as sess:
+            sess['user_id'] = 'ingest@example.com'
+
+    def _upload(self, content=b"%PDF-1.4 report"):
+        return self.app.post('/init_context', data={'file': (BytesIO(content), 'r.pdf')},
+                             content_type='multipart/form-data')
+
+    @patch('routes.health_routes.query_ollama')
+    @patch('routes.health_routes.get_embeddings')
+    @patch('routes.health_routes.parse_pdf_report')
+    @patch('routes.admin_routes.ADMIN_TOKEN', 'secret')
+    def test_reupload_skips_parse_embed_and_llm(self, mock_parse, mock_embed, mock_query):
+        chunk = {"text": "Ferritin 12 ng/mL is low for an adult.", "page": 1, "start": 0, "end": 38}
+        mock_parse.return_value = {"text": "Ferritin 12", "chunks": [chunk], "rows": []}
+        mock_embed.return_value = [[0.6, 0.8]]
+        mock_query.return_value = DIAGNOSIS
+
+        first = self._upload()
+        sessions.clear()
+        second = self._upload()
+
+        self.assertEqual(second.get_json(), first.get_json())
+        self.assertEqual((mock_parse.call_count, mock_embed.call_count, mock_query.call_count), (1, 1, 1))
+        user_session = sessions['ingest@example.com']
+        self.assertEqual(user_session['raw_text_chunks'], ["Ferritin 12 ng/mL is low for an adult."])
+        self.assertEqual(user_session['embedding_matrix'].shape, (1, 2))
+
+        # Invalidate through the admin endpoint: the next upload is parsed again
+        file_hash = hashlib.sha256(b"%PDF-1.4 report").hexdigest()
+        response = self.app.post('/admin/ingest_cache/invalidate', json={'file_hash': file_hash},
+                                 headers={'X-Admin-Token': 'secret'})
+        self.assertEqual(response.get_json(), {"removed": 1})
+        self._upload()
+        self.assertEqual(mock_parse.call_count, 2)
+
+    @patch('routes.health_routes.query_ollama', return_value=None)
+    @patch('routes.health_routes.get_embeddings', return_value=[])
+    @patch('routes.health_routes.parse_pdf_report', return_value={"text": "", "chunks": [], "rows": []})
+    def test_fallback_diagnosis_is_not_cached(self, mock_parse, mock_embed, mock_query):
+        self._upload()
+        self._upload()
+        self.assertEqual(mock_query.call_count, 2)
+
+    def test_admin_requires_token_or_loopback_opt_in(self):
+        # Closed by default, even from localhost (a reverse proxy makes every request look local)
+        self.assertEqual(self.app.get('/admin/ingest_cache').status_code, 403)
+        with patch('routes.admin_routes.ADMIN_ALLOW_LOOPBACK', True):
+            response = self.app.get('/admin/ingest_cache', environ_base={'REMOTE_ADDR': '10.0.0.7'})
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(self.app.get('/admin/ingest_cache').status_code, 200)
+        with patch('routes.admin_routes.ADMIN_TOKEN', 'secret'):
+            self.assertEqual(self.app.get('/admin/ingest_cache').status_code, 403)
+            ok = self.app.get('/admin/ingest_cache', headers={'X-Admin-Token': 'secret'})
+            self.assertEqual(ok.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
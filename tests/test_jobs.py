@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from utils import sessions
+from services.job_service import JobManager, job_manager
+
+
+def _wait_for_job(client, job_id, query=''):
+    for _ in range(200):
+        data = client.get(f'/jobs/{job_id}{query}').get_json()
+        if data['status'] in ('done', 'failed'):
+            return data
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        sessions.clear()
+
+    @patch('routes.workout_routes.query_ollama')
+    def test_async_workout_is_deduplicated(self, mock_query):
+        release = threading.Event()
+
+        def slow_query(*args, **kwargs):
+            release.wait(2)
+            return [{"day": "Mon", "focus": "Legs"}]
+
+        mock_query.side_effect = slow_query
+        body = {'token': 'job-token', 'strategy_name': 'Strength', 'lifestyle': {}, 'async': True}
+
+        first = self.app.post('/generate_workout', json=body)
+        second = self.app.post('/generate_workout', json=body)
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(first.get_json()['job_id'], second.get_json()['job_id'])
+        self.assertTrue(second.get_json()['deduplicated'])
+
+        release.set()
+        job_id = first.get_json()['job_id']
+        result = _wait_for_job(self.app, job_id, '?token=job-token')
+        self.assertEqual(result['status'], 'done')
+        self.assertEqual(result['result'][0]['focus'], "Legs")
+        self.assertEqual(mock_query.call_count, 1)
+
+        # Other users cannot read the job
+        self.assertEqual(self.app.get(f'/jobs/{job_id}?token=someone-else').status_code, 404)
+
+        # SSE replays the final state and closes
+        events = self.app.get(f'/jobs/{job_id}/events?token=job-token')
+        self.assertEqual(events.mimetype, 'text/event-stream')
+        self.assertIn('event: done', events.get_data(as_text=True))
+
+    @patch('routes.meal_routes.query_ollama')
+    def test_async_week_saves_plan(self, mock_query):
+        mock_query.return_value = [{"day": "Mon", "meals": [{"title": "Eggs"}]}]
+        with self.app.session_transaction() as sess:
+            sess['user_id'] = 'jobs@example.com'
+
+        response = self.app.post('/generate_week', json={'strategy_name': 'Keto', 'async': True})
+        self.assertEqual(response.status_code, 202)
+
+        result = _wait_for_job(self.app, response.get_json()['job_id'])
+        self.assertEqual(result['result'][0]['meals'][0]['title'], "Eggs")
+        self.assertEqual(sessions['jobs@example.com']['weekly_plan'][0]['day'], "Mon")
+        self.assertGreaterEqual(job_manager.stats()['done'], 1)
+
+
+class TestJobExpiry(unittest.TestCase):
+    def test_finished_jobs_expire_without_new_submissions(self):
+        manager = JobManager(max_workers=1, ttl=0.05)
+        job, _ = manager.submit("owner", "kind", lambda: "plan")
+        for _ in range(200):
+            if job.is_finished:
+                break
+            time.sleep(0.01)
+        self.assertIs(manager.get(job.id), job)
+
+        time.sleep(0.1)
+        # Polling (or an SSE stream looking the job up) drops expired results
+        self.assertIsNone(manager.get(job.id))
+        self.assertEqual(manager.stats()['done'], 0)
+        self.assertEqual(manager._jobs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
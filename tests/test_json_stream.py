@@ -0,0 +1,87 @@
+import unittest
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.json_cleaner import (
+    StreamingJSONRepairer, StreamingArrayParser, repair_json, clean_and_parse_json, legacy_clean_and_parse_json
+)
+from data.fallbacks import FALLBACK_MEAL_PLAN
+
+
+class TestStreamingJSONRepairer(unittest.TestCase):
+
+    def test_chunked_feed_matches_whole_input(self):
+        text = 'Here you go:\n```json\n' + json.dumps(FALLBACK_MEAL_PLAN, indent=2) + '\n```'
+        whole = repair_json(text)
+        for size in (1, 7, 64):
+            repairer = StreamingJSONRepairer()
+            for i in range(0, len(text), size):
+                repairer.feed(text[i:i + size])
+            self.assertEqual(repairer.close(), whole)
+        self.assertEqual(json.loads(whole), FALLBACK_MEAL_PLAN)
+
+    def test_truncated_output_is_balanced(self):
+        text = json.dumps(FALLBACK_MEAL_PLAN)
+        for cut in range(1, len(text), 37):
+            repaired = repair_json(text[:cut])
+            self.assertIsInstance(json.loads(repaired), (dict, list))
+
+    def test_comments_and_trailing_commas(self):
+        text = '{\n  // plan\n  "a": [1, 2,], /* note */ "b": "x // not a comment",\n}'
+        self.assertEqual(json.loads(repair_json(text)), {"a": [1, 2], "b": "x // not a comment"})
+
+    def test_done_after_top_level_value(self):
+        repairer = StreamingJSONRepairer()
+        repairer.feed('{"a": {"b": 1}} trailing prose {"c": 2}')
+        self.assertTrue(repairer.done)
+        self.assertEqual(repairer.depth, 0)
+
+
+class TestStreamingArrayParser(unittest.TestCase):
+
+    def _collect(self, text, size=5):
+        parser = StreamingArrayParser()
+        items = []
+        for i in range(0, len(text), size):
+            items.extend(parser.feed(text[i:i + size]))
+        return items + parser.close()
+
+    def test_bare_and_wrapped_arrays(self):
+        self.assertEqual(self._collect(json.dumps(FALLBACK_MEAL_PLAN)), FALLBACK_MEAL_PLAN)
+        self.assertEqual(self._collect(json.dumps({"plan": FALLBACK_MEAL_PLAN})), FALLBACK_MEAL_PLAN)
+
+    def test_nested_arrays_of_a_single_object_are_not_items(self):
+        self.assertEqual(self._collect(json.dumps(FALLBACK_MEAL_PLAN[0])), [])
+
+    def test_truncated_stream_keeps_completed_days(self):
+        text = json.dumps(FALLBACK_MEAL_PLAN)
+        cut = text.index('"day"', text.index('"day"', 10) + 1) + 20  # inside the third day
+        items = self._collect(text[:cut])
+        self.assertEqual(items[:2], FALLBACK_MEAL_PLAN[:2])
+        self.assertEqual(len(items), 3)
+
+
+class TestCleanAndParseParity(unittest.TestCase):
+
+    def test_matches_legacy_pipeline(self):
+        cases = [
+            '{"a": 1}',
+            'Sure! ```json\n{"a": [1, 2]}\n```',
+            '{"a": "b", "c": [1, 2',
+            '[{"x": 1}, {"y": 2},]',
+            '{"a": 1, // one\n "b": 2}',
+            'Note [1]: {"a": 1}',
+        ]
+        for case in cases:
+            self.assertEqual(clean_and_parse_json(case), legacy_clean_and_parse_json(case), case)
+
+    def test_empty_input(self):
+        self.assertIsNone(clean_and_parse_json(""))
+        self.assertIsNone(clean_and_parse_json(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+import services.ai_service as ai_service
+from services.ai_service import query_ollama, stream_ollama, OLLAMA_REQUESTS, OLLAMA_TTFT, OLLAMA_TOKENS_PER_SECOND
+from services.json_cleaner import clean_and_parse_json, JSON_PARSES
+from services.metrics import MetricsRegistry, FALLBACKS_SERVED
+from routes.metrics_routes import ROUTE_DURATION
+from benchmarks.mock_ollama import MockOllama
+from data.fallbacks import FALLBACK_DIAGNOSIS
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_exposition(self):
+        h = self.registry.histogram("t_seconds", "Test.", ["route"], buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            h.observe(value, route="/x")
+        text = self.registry.render()
+        self.assertIn("# TYPE t_seconds histogram", text)
+        self.assertIn('t_seconds_bucket{route="/x",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="1"} 2', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="+Inf"} 3', text)
+        self.assertIn('t_seconds_count{route="/x"} 3', text)
+        self.assertEqual(h.value(route="/x"), (3, 5.55))
+
+    def test_counter_labels_and_escaping(self):
+        c = self.registry.counter("t_total", "Test.", ["name"])
+        c.inc(name='say "hi"')
+        c.inc(2, name='say "hi"')
+        self.assertIn('t_total{name="say \\"hi\\""} 3', self.registry.render())
+        with self.assertRaises(ValueError):
+            c.inc(other="x")
+
+    def test_registering_twice_returns_the_same_metric(self):
+        first = self.registry.counter("t_total", "Test.")
+        self.assertIs(self.registry.counter("t_total", "Test."), first)
+
+    def test_gauge_function(self):
+        self.registry.gauge("t_depth", "Test.", ["cls"], function=lambda: {("bulk",): 2})
+        self.assertIn('t_depth{cls="bulk"} 2', self.registry.render())
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = MockOllama(ttft=0.01, token_latency=0, embed_latency=0, seed=3)
+        url = self.mock.start()
+        self.addCleanup(self.mock.stop)
+        patcher = patch.object(ai_service, 'CHAT_ENDPOINT', f"{url}/api/chat")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_chat_call_metrics(self):
+        ok = OLLAMA_REQUESTS.value(kind="chat", priority="mini_app", outcome="ok")
+        ttft = OLLAMA_TTFT.value(kind="chat")[0]
+        self.assertEqual(query_ollama("Diagnose metrics test"), FALLBACK_DIAGNOSIS)
+        self.assertEqual(OLLAMA_REQUESTS.value(kind="chat", priority="mini_app", outcome="ok"), ok + 1)
+        self.assertEqual(OLLAMA_TTFT.value(kind="chat")[0], ttft + 1)
+
+    def test_stream_metrics(self):
+        rates = OLLAMA_TOKENS_PER_SECOND.value(kind="chat_stream")[0]
+        ttft = OLLAMA_TTFT.value(kind="chat_stream")
+        text = "".join(stream_ollama([{"role": "user", "content": "Hi"}]))
+        self.assertIn("ferritin", text)
+        self.assertEqual(OLLAMA_TOKENS_PER_SECOND.value(kind="chat_stream")[0], rates + 1)
+        count, total = OLLAMA_TTFT.value(kind="chat_stream")
+        self.assertEqual(count, ttft[0] + 1)
+        self.assertGreaterEqual(total - ttft[1], 0.01)
+
+    def test_json_parse_paths(self):
+        failed = JSON_PARSES.value(path="failed")
+        repaired = JSON_PARSES.value(path="repaired")
+        self.assertIsNone(clean_and_parse_json("no json here"))
+        self.assertEqual(clean_and_parse_json('{"a": [1, 2'), {"a": [1, 2]})
+        self.assertEqual(JSON_PARSES.value(path="failed"), failed + 1)
+        self.assertEqual(JSON_PARSES.value(path="repaired"), repaired + 1)
+
+    def test_fallback_and_route_metrics(self):
+        client = app.test_client()
+        served = FALLBACKS_SERVED.value(name="mini_app:suggest_supplement")
+        routes = ROUTE_DURATION.value(blueprint="mini_apps_bp", route="/<action>", method="POST", status=200)[0]
+        with patch('routes.mini_apps.query_ollama', return_value=None):
+            client.post('/suggest_supplement', json={"focus": "sleep"})
+        self.assertEqual(FALLBACKS_SERVED.value(name="mini_app:suggest_supplement"), served + 1)
+        self.assertEqual(
+            ROUTE_DURATION.value(blueprint="mini_apps_bp", route="/<action>", method="POST", status=200)[0],
+            routes + 1)
+
+        with patch('routes.admin_routes.ADMIN_ALLOW_LOOPBACK', True):
+            response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('bioflow_fallback_responses_total{name="mini_app:suggest_supplement"}', response.data.decode())
+
+    def test_metrics_requires_admin(self):
+        response = app.test_client().get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
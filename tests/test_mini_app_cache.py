@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from routes.mini_apps import mini_app_cache
+from routes.mini_apps_config import APP_CONFIGS
+from services.response_cache import ResponseCache, make_cache_key
+
+
+class TestMiniAppCache(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        mini_app_cache.clear()
+
+    @patch('routes.mini_apps.query_ollama')
+    def test_define_term_is_cached(self, mock_query):
+        mock_query.return_value = {"definition": "A storage protein for iron."}
+
+        first = self.app.post('/define_term', json={'term': 'Ferritin'})
+        second = self.app.post('/define_term', json={'term': '  ferritin '})
+
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.get_json(), first.get_json())
+        self.assertEqual(mock_query.call_count, 1)
+
+        forced = self.app.post('/define_term', json={'term': 'Ferritin'}, headers={'Cache-Control': 'no-cache'})
+        self.assertEqual(forced.headers['X-Cache'], 'BYPASS')
+        self.assertEqual(mock_query.call_count, 2)
+
+    @patch('routes.mini_apps.query_ollama')
+    def test_prompt_edit_invalidates(self, mock_query):
+        mock_query.return_value = {"definition": "A storage protein for iron."}
+        self.app.post('/define_term', json={'term': 'Ferritin'})
+
+        edited = dict(APP_CONFIGS['define_term'], prompt=APP_CONFIGS['define_term']['prompt'] + " Be brief.")
+        with patch.dict(APP_CONFIGS, {'define_term': edited}):
+            response = self.app.post('/define_term', json={'term': 'Ferritin'})
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(mock_query.call_count, 2)
+
+    @patch('routes.mini_apps.query_ollama')
+    def test_creative_apps_and_fallbacks_are_not_cached(self, mock_query):
+        mock_query.return_value = {"pairings": ["a", "b", "c"]}
+        self.app.post('/flavor_pairing', json={'ingredient': 'basil'})
+        response = self.app.post('/flavor_pairing', json={'ingredient': 'basil'})
+        self.assertEqual(response.headers['X-Cache'], 'BYPASS')
+        self.assertEqual(mock_query.call_count, 2)
+
+        mock_query.return_value = None
+        self.app.post('/check_food_interaction', json={'item1': 'a', 'item2': 'b'})
+        self.app.post('/check_food_interaction', json={'item1': 'a', 'item2': 'b'})
+        self.assertEqual(mock_query.call_count, 4)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_key_depends_on_model_and_temperature(self):
+        base = make_cache_key("define_term", {"term": "Iron"}, "gemma3:4b", 0.1)
+        self.assertEqual(base, make_cache_key("define_term", {"term": " iron"}, "gemma3:4b", 0.1))
+        self.assertNotEqual(base, make_cache_key("define_term", {"term": "iron"}, "llama3", 0.1))
+        self.assertNotEqual(base, make_cache_key("define_term", {"term": "iron"}, "gemma3:4b", 0.0))
+        self.assertNotEqual(make_cache_key("define_term", {"term": "iron"}, "gemma3:4b", 0.1, "Define {term}."),
+                            make_cache_key("define_term", {"term": "iron"}, "gemma3:4b", 0.1, "Explain {term}."))
+
+    def test_ttl_and_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "responses.sqlite3")
+            cache = ResponseCache(db_path=path)
+            cache.set("short", {"v": 1}, ttl=0.01)
+            cache.set("long", {"v": 2}, ttl=60)
+            time.sleep(0.02)
+            self.assertIsNone(cache.get("short"))
+
+            warm = ResponseCache(db_path=path)
+            self.assertEqual(warm.get("long"), {"v": 2})
+            self.assertEqual(warm.stats()["disk_hits"], 1)
+
+    def test_lru_byte_budget(self):
+        cache = ResponseCache(max_bytes=30)  # each value serializes to 12 bytes
+        cache.set("a", "x" * 10, ttl=60)
+        cache.set("b", "y" * 10, ttl=60)
+        cache.get("a")
+        cache.set("c", "z" * 10, ttl=60)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
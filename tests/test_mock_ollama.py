@@ -0,0 +1,65 @@
+import unittest
+import json
+import sys
+import os
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_ollama import MockOllama
+from benchmarks.load import percentile
+from services.json_cleaner import clean_and_parse_json
+
+
+class TestMockOllama(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = MockOllama(ttft=0, token_latency=0, embed_latency=0, dim=8, seed=1)
+        self.url = self.mock.start()
+        self.addCleanup(self.mock.stop)
+
+    def chat(self, content, **payload):
+        body = {"model": "m", "messages": [{"role": "user", "content": content}], **payload}
+        return requests.post(f"{self.url}/api/chat", json=body, stream=payload.get("stream", True), timeout=5)
+
+    def test_streaming_chat_is_ndjson(self):
+        lines = [json.loads(line) for line in self.chat("Hello").iter_lines() if line]
+        self.assertFalse(lines[0]["done"])
+        self.assertTrue(lines[-1]["done"])
+        self.assertEqual(lines[-1]["eval_count"], len(lines) - 1)
+        self.assertGreater(lines[-1]["eval_duration"], 0)
+        self.assertIn("ferritin", "".join(l["message"]["content"] for l in lines))
+
+    def test_json_chat_matches_prompt(self):
+        reply = self.chat("Create a 7 DAYS meal plan", stream=False, format="json").json()
+        plan = json.loads(reply["message"]["content"])
+        self.assertEqual(len(plan), 7)
+
+    def test_malformed_rate(self):
+        self.mock.malformed_rate = 1.0
+        content = self.chat("Diagnose", stream=False, format="json").json()["message"]["content"]
+        with self.assertRaises(ValueError):
+            json.loads(content)
+        self.assertEqual(self.mock.counters["malformed"], 1)
+        # The damage is the kind the app's repair path recovers from
+        self.assertIsInstance(clean_and_parse_json(content), dict)
+
+    def test_embeddings_are_deterministic(self):
+        single = requests.post(f"{self.url}/api/embeddings", json={"prompt": "iron"}, timeout=5).json()
+        batch = requests.post(f"{self.url}/api/embed", json={"input": ["iron", "zinc"]}, timeout=5).json()
+        self.assertEqual(len(single["embedding"]), 8)
+        self.assertEqual(batch["embeddings"][0], single["embedding"])
+        self.assertNotEqual(batch["embeddings"][1], single["embedding"])
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
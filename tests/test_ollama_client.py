@@ -0,0 +1,60 @@
+import unittest
+import json
+import threading
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ollama_client import OllamaClient
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = json.dumps({"ok": True}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOllamaClient(unittest.TestCase):
+
+    def test_timeouts_per_endpoint(self):
+        client = OllamaClient(connect_timeout=2, timeouts={"/api/embeddings": 15}, stream_timeout=99)
+        self.assertEqual(client.timeout_for("http://x/api/embeddings"), (2, 15))
+        self.assertEqual(client.timeout_for("http://x/api/chat", stream=True), (2, 99))
+
+    def test_connections_are_reused(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _EchoHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/embeddings"
+
+        client = OllamaClient(pool_size=2)
+        try:
+            for _ in range(5):
+                r = client.post(url, json={"prompt": "x"})
+                self.assertEqual(r.json(), {"ok": True})
+
+            stats = client.stats()
+            self.assertEqual(stats["requests"], 5)
+            self.assertEqual(stats["connections_opened"], 1)
+            self.assertEqual(stats["reused"], 4)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+from io import BytesIO
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import pdf_service
+from benchmarks.fixtures import make_pdf
+
+
+class TestAdvancedPdfParse(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.texts = [f"Page {i} Ferritin {20 + i} ng/mL" for i in range(6)]
+        cls.path = os.path.join(cls.tmp.name, "report.pdf")
+        with open(cls.path, "wb") as f:
+            f.write(make_pdf(cls.texts))
+
+    @classmethod
+    def tearDownClass(cls):
+        pdf_service.shutdown_pool()
+        cls.tmp.cleanup()
+
+    def test_single_process_below_threshold(self):
+        with patch.object(pdf_service, 'PDF_PARALLEL_MIN_PAGES', 100), \
+                patch.object(pdf_service, '_extract_parallel') as parallel:
+            text, _ = pdf_service.advanced_pdf_parse(self.path)
+        parallel.assert_not_called()
+        self.assertEqual(text.splitlines(), self.texts)
+
+    def test_parallel_keeps_page_order(self):
+        with patch.object(pdf_service, 'PDF_PARSE_WORKERS', 2), \
+                patch.object(pdf_service, 'PDF_PARALLEL_MIN_PAGES', 2):
+            text, _ = pdf_service.advanced_pdf_parse(self.path)
+        self.assertEqual(text.splitlines(), self.texts)
+
+    def test_pool_failure_falls_back_to_single_process(self):
+        with patch.object(pdf_service, 'PDF_PARSE_WORKERS', 2), \
+                patch.object(pdf_service, 'PDF_PARALLEL_MIN_PAGES', 2), \
+                patch.object(pdf_service, '_extract_parallel', side_effect=OSError("no processes")):
+            text, _ = pdf_service.advanced_pdf_parse(self.path)
+        self.assertEqual(text.splitlines(), self.texts)
+
+    def test_bytes_and_file_objects(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.assertEqual(pdf_service.advanced_pdf_parse(data)[0].splitlines(), self.texts)
+        stream = BytesIO(data)
+        stream.seek(10)  # callers may hand over a stream that was already read (e.g. hashed)
+        self.assertEqual(pdf_service.advanced_pdf_parse(stream)[0].splitlines(), self.texts)
+
+        with patch.object(pdf_service, 'PDF_PARSE_WORKERS', 2), \
+                patch.object(pdf_service, 'PDF_PARALLEL_MIN_PAGES', 2):
+            text, _ = pdf_service.advanced_pdf_parse(BytesIO(data))
+        self.assertEqual(text.splitlines(), self.texts)
+
+
+class TestUploadWithoutTempFiles(unittest.TestCase):
+
+    @patch('routes.health_routes.query_ollama', return_value={"summary": "ok", "issues": []})
+    @patch('routes.health_routes.get_embeddings', return_value=[])
+    def test_init_context_parses_from_request_stream(self, mock_embed, mock_query):
+        from app import app
+        from routes.health_routes import ingest_cache
+        ingest_cache.invalidate()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 'pdf@example.com'
+
+        pdf = make_pdf(["Glucose 92 mg/dL"])
+        with tempfile.TemporaryDirectory() as uploads, \
+                patch('routes.health_routes.UPLOAD_FOLDER', uploads), \
+                patch('routes.health_routes.parse_pdf_report', wraps=pdf_service.parse_pdf_report) as parse:
+            response = client.post('/init_context', data={'file': (BytesIO(pdf), 'r.pdf')},
+                                   content_type='multipart/form-data')
+            self.assertEqual(os.listdir(uploads), [])
+            self.assertIn("Glucose: 92 mg/dL", mock_query.call_args[0][0])
+
+            # Debug mode keeps a copy of each upload
+            with patch('routes.health_routes.KEEP_UPLOADS', True):
+                ingest_cache.invalidate()
+                client.post('/init_context', data={'file': (BytesIO(pdf), 'r.pdf')},
+                            content_type='multipart/form-data')
+            self.assertEqual(len(os.listdir(uploads)), 1)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(parse.call_args_list[0][0][0], str)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from utils import sessions
+from services.ai_service import stream_ollama_json
+from data.fallbacks import FALLBACK_MEAL_PLAN, FALLBACK_WORKOUT_PLAN
+
+
+class TestStreamOllamaJson(unittest.TestCase):
+
+    @patch('services.ai_service.ollama_client.post')
+    def test_days_are_yielded_as_they_close(self, mock_post):
+        text = json.dumps({"plan": FALLBACK_MEAL_PLAN[:3]})
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        sent = []
+
+        def generate_lines():
+            for piece in pieces:
+                sent.append(piece)
+                yield json.dumps({"message": {"content": piece}}).encode('utf-8')
+
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_lines = generate_lines
+        response.__enter__.return_value = response
+        mock_post.return_value = response
+
+        days = stream_ollama_json("plan")
+        first = next(days)
+        self.assertEqual(first, FALLBACK_MEAL_PLAN[0])
+        # The first day arrives long before the model has finished
+        self.assertLess(len(sent), len(pieces) / 2)
+        self.assertEqual(list(days), FALLBACK_MEAL_PLAN[1:3])
+
+    @patch('services.ai_service.ollama_client.post')
+    def test_http_error_yields_nothing(self, mock_post):
+        response = MagicMock()
+        response.status_code = 500
+        response.__enter__.return_value = response
+        mock_post.return_value = response
+        self.assertEqual(list(stream_ollama_json("plan")), [])
+
+
+class TestPlanStreamRoutes(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        sessions.clear()
+        with self.app.session_transaction() as sess:
+            sess['user_id'] = 'stream@example.com'
+
+    @patch('routes.meal_routes.stream_ollama_json')
+    def test_week_streams_ndjson_and_saves_plan(self, mock_stream):
+        days = [{"day": "Mon", "meals": []}, {"day": "Tue", "meals": []}]
+        mock_stream.return_value = iter(days)
+
+        response = self.app.post('/generate_week?stream=1', json={'strategy_name': 'Keto'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual([e['day'] for e in events if e['type'] == 'day'], days)
+        self.assertEqual(events[-1], {"type": "done", "days": 2, "fallback": False})
+        self.assertEqual(sessions['stream@example.com']['weekly_plan'], days)
+
+    @patch('routes.workout_routes.stream_ollama_json')
+    def test_workout_sse_falls_back(self, mock_stream):
+        mock_stream.return_value = iter([])
+
+        response = self.app.post('/generate_workout', json={'token': 't', 'stream': True},
+                                 headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertEqual(body.count('event: day'), len(FALLBACK_WORKOUT_PLAN))
+        self.assertIn('"fallback": true', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+import routes.profiling_routes as profiling_routes
+from services.profiler import StackSampler, ProfileStore, profile_text
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+def slow_query(**kwargs):
+    busy(0.05)
+    return {"name": "Magnesium", "reason": "sleep"}
+
+
+class TestStackSampler(unittest.TestCase):
+
+    def test_samples_registered_thread(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        busy(0.05)
+        stacks = sampler.stop()
+        self.assertGreater(sum(stacks.values()), 5)
+        self.assertTrue(any("test_profiling.py:busy" in stack for stack in stacks))
+
+    def test_other_threads_are_not_sampled(self):
+        sampler = StackSampler(interval=0.001)
+        worker = threading.Thread(target=busy, args=(0.05,))
+        sampler.start()
+        worker.start()
+        worker.join()
+        stacks = sampler.stop()
+        self.assertFalse(any("busy" in stack for stack in stacks))
+
+
+class TestRequestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ProfileStore(tmp.name, keep=2)
+        for patcher in (patch.object(profiling_routes, 'profile_store', self.store),
+                        patch('routes.admin_routes.ADMIN_ALLOW_LOOPBACK', True),
+                        patch('routes.mini_apps.query_ollama', side_effect=slow_query)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def post(self, **headers):
+        response = self.client.post('/suggest_supplement', json={"focus": "sleep"}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        return response
+
+    def test_header_profiles_request(self):
+        response = self.post(**{'X-Profile': '1'})
+        self.assertEqual(response.headers['X-Profile'], 'sample')
+        [entry] = self.store.slowest()
+        self.assertEqual((entry["method"], entry["route"], entry["status"]), ("POST", "/<action>", 200))
+        self.assertGreaterEqual(entry["duration_ms"], 50)
+        self.assertTrue(entry["path"].endswith(".collapsed"))
+        self.assertIn("mini_apps.py:handle_mini_app", profile_text(entry))
+
+    def test_cprofile_mode(self):
+        self.post(**{'X-Profile': 'cprofile'})
+        [entry] = self.store.slowest()
+        self.assertEqual(entry["mode"], "cprofile")
+        self.assertIn("handle_mini_app", profile_text(entry))
+
+    def test_header_ignored_for_non_admin(self):
+        with patch('routes.admin_routes.ADMIN_TOKEN', 'secret'):
+            response = self.post(**{'X-Profile': '1'})
+        self.assertNotIn('X-Profile', response.headers)
+        self.assertEqual(self.store.slowest(), [])
+
+    def test_global_mode_keeps_only_slow_requests(self):
+        with patch.object(profiling_routes, 'PROFILE_REQUESTS', True), \
+                patch.object(profiling_routes, 'PROFILE_MIN_MS', 10_000):
+            response = self.post()
+        self.assertEqual(response.headers['X-Profile'], 'sample')
+        self.assertEqual(self.store.slowest(), [])
+
+    def test_old_profiles_are_pruned(self):
+        for _ in range(3):
+            self.post(**{'X-Profile': '1'})
+        oldest = min(self.store.slowest(), key=lambda e: e["id"])
+        self.assertFalse(os.path.exists(oldest["path"]))
+        self.assertEqual(self.client.get(f'/admin/profiles/{oldest["id"]}').status_code, 404)
+
+    def test_admin_pages(self):
+        self.post(**{'X-Profile': 'cprofile'})
+        [entry] = self.store.slowest()
+        page = self.client.get('/admin/profiles')
+        self.assertEqual(page.status_code, 200)
+        self.assertIn(f'/admin/profiles/{entry["id"]}', page.data.decode())
+        detail = self.client.get(f'/admin/profiles/{entry["id"]}')
+        self.assertEqual(detail.mimetype, 'text/plain')
+        self.assertIn("cumulative", detail.data.decode())
+        raw = self.client.get(f'/admin/profiles/{entry["id"]}?raw=1')
+        self.assertIn('attachment', raw.headers['Content-Disposition'])
+        raw.close()
+        self.assertEqual(self.client.get('/admin/profiles', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code, 403)
+
+    def test_list_limit_is_validated(self):
+        for _ in range(2):
+            self.post(**{'X-Profile': '1'})
+        for limit, expected in (("abc", 2), ("-5", 1), ("0", 1), ("1", 1), ("100000", 2)):
+            response = self.client.get(f'/admin/profiles?format=json&limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.get_json()), expected, limit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_MODEL
+from services import rag_service
+from services.embedding_cache import EmbeddingCache
+from services.rag_service import (get_embeddings, build_embedding_matrix,
+                                  top_k_similar, retrieve_relevant_context)
+
+
+def _response(status, payload):
+    r = MagicMock()
+    r.status_code = status
+    r.json.return_value = payload
+    return r
+
+
+class TestGetEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = EmbeddingCache(db_path=None)
+        cache_patch = patch.object(rag_service, 'embedding_cache', self.cache)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        rag_service._batch_supported = True
+
+    def tearDown(self):
+        rag_service._batch_supported = True
+
+    @patch('services.rag_service.ollama_client.post')
+    def test_batches_and_skips_cached(self, mock_post):
+        self.cache.set(EMBEDDING_MODEL, "cached", [9.0])
+
+        def fake_post(url, json=None, **kwargs):
+            return _response(200, {"embeddings": [[float(len(t))] for t in json["input"]]})
+
+        mock_post.side_effect = fake_post
+
+        result = get_embeddings(["a", "cached", "bbb", "a", "cc"], batch_size=2)
+
+        self.assertEqual(result, [[1.0], [9.0], [3.0], [1.0], [2.0]])
+        # "a" is deduplicated and "cached" skipped: 3 texts -> 2 batches
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertTrue(all(c.args[0].endswith('/api/embed') for c in mock_post.call_args_list))
+
+    @patch('services.rag_service.ollama_client.post')
+    def test_falls_back_to_single_endpoint(self, mock_post):
+        def fake_post(url, json=None, **kwargs):
+            if url.endswith('/api/embed'):
+                return _response(404, {})
+            return _response(200, {"embedding": [float(len(json["prompt"]))]})
+
+        mock_post.side_effect = fake_post
+
+        result = get_embeddings(["a", "bb"])
+
+        self.assertEqual(result, [[1.0], [2.0]])
+        self.assertFalse(rag_service._batch_supported)
+
+        # Later calls go straight to the per-text endpoint
+        mock_post.reset_mock()
+        get_embeddings(["ccc"])
+        self.assertTrue(mock_post.call_args.args[0].endswith('/api/embeddings'))
+
+
+class TestVectorRetrieval(unittest.TestCase):
+
+    def test_matrix_is_normalized_float32(self):
+        matrix = build_embedding_matrix([[3.0, 4.0], [], [0.0, 2.0]])
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertEqual(matrix.shape, (3, 2))
+        np.testing.assert_allclose(matrix[0], [0.6, 0.8], rtol=1e-6)
+        # Failed embedding keeps its row so chunks stay aligned
+        np.testing.assert_array_equal(matrix[1], [0.0, 0.0])
+
+    def test_top_k_order(self):
+        matrix = build_embedding_matrix([[1, 0], [0, 1], [1, 1], [-1, 0]])
+        self.assertEqual(top_k_similar(matrix, [1, 0.1], top_k=2), [0, 2])
+        self.assertEqual(top_k_similar(matrix, [1, 0.1], top_k=10), [0, 2, 1, 3])
+        self.assertEqual(top_k_similar(matrix, [1, 0, 0]), [])
+
+    @patch('services.rag_service.get_embedding')
+    def test_retrieve_from_matrix_and_legacy_lists(self, mock_embed):
+        mock_embed.return_value = [0.0, 1.0]
+        chunks = ["iron", "vitamin d", "cortisol"]
+        vectors = [[1.0, 0.0], [0.1, 1.0], [0.5, 0.5]]
+
+        session = {"raw_text_chunks": chunks, "embedding_matrix": build_embedding_matrix(vectors)}
+        self.assertEqual(retrieve_relevant_context(session, "q", top_k=2), "vitamin d\n---\ncortisol")
+
+        legacy = {"raw_text_chunks": chunks, "embeddings": vectors}
+        self.assertEqual(retrieve_relevant_context(legacy, "q", top_k=2), "vitamin d\n---\ncortisol")
+
+        session["chunk_meta"] = [{"page": 1, "start": 0, "end": 4}, {"page": 3, "start": 90, "end": 99},
+                                 {"page": 2, "start": 40, "end": 48}]
+        self.assertEqual(retrieve_relevant_context(session, "q", top_k=2),
+                         "[Page 3] vitamin d\n---\n[Page 2] cortisol")
+
+
+if __name__ == '__main__':
+    unittest.main()
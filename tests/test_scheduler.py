@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.scheduler import (OllamaScheduler, SchedulerOverloaded,
+                                PRIORITY_INTERACTIVE, PRIORITY_MINI_APP, PRIORITY_BULK)
+from services import ai_service
+
+
+class TestOllamaScheduler(unittest.TestCase):
+
+    def test_interactive_jumps_the_queue(self):
+        scheduler = OllamaScheduler(max_in_flight=1)
+        order = []
+
+        def worker(priority, name):
+            with scheduler.slot(priority):
+                order.append(name)
+
+        with scheduler.slot(PRIORITY_MINI_APP):
+            threads = [threading.Thread(target=worker, args=(PRIORITY_BULK, "bulk"))]
+            threads[0].start()
+            time.sleep(0.05)
+            threads.append(threading.Thread(target=worker, args=(PRIORITY_INTERACTIVE, "chat")))
+            threads[1].start()
+            time.sleep(0.05)
+            self.assertEqual(scheduler.stats()["queue_depth"], 2)
+
+        for t in threads:
+            t.join(1)
+        self.assertEqual(order, ["chat", "bulk"])
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+    def test_sheds_over_budget(self):
+        scheduler = OllamaScheduler(max_in_flight=1, budgets={PRIORITY_MINI_APP: 0.05})
+        with scheduler.slot(PRIORITY_BULK):
+            with self.assertRaises(SchedulerOverloaded):
+                with scheduler.slot(PRIORITY_MINI_APP):
+                    pass
+
+        stats = scheduler.stats()
+        self.assertEqual(stats["shed"]["mini_app"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_coroutines_share_the_queue_with_threads(self):
+        scheduler = OllamaScheduler(max_in_flight=1)
+        release = threading.Event()
+
+        def holder():
+            with scheduler.slot(PRIORITY_BULK):
+                release.wait(1)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        time.sleep(0.02)
+
+        async def waiter():
+            # The event loop keeps running while this coroutine is queued
+            ticks = 0
+            task = asyncio.ensure_future(self._hold(scheduler))
+            while not task.done():
+                ticks += 1
+                if ticks == 5:
+                    self.assertEqual(scheduler.stats()["queue_depth"], 1)
+                    release.set()
+                await asyncio.sleep(0.01)
+            return ticks, await task
+
+        ticks, waited = asyncio.run(waiter())
+        thread.join(1)
+        self.assertGreaterEqual(ticks, 5)
+        self.assertGreater(waited, 0.03)
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+    @staticmethod
+    async def _hold(scheduler, priority=PRIORITY_INTERACTIVE):
+        async with scheduler.async_slot(priority) as waited:
+            return waited
+
+    def test_interrupted_wait_leaves_the_queue(self):
+        scheduler = OllamaScheduler(max_in_flight=1)
+        with scheduler.slot(PRIORITY_BULK):
+            with patch.object(scheduler._cond, 'wait', side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    with scheduler.slot(PRIORITY_INTERACTIVE):
+                        pass
+            self.assertEqual(scheduler.stats()["queue_depth"], 0)
+
+        # Nothing is stuck at the head of the queue
+        with scheduler.slot(PRIORITY_MINI_APP, max_wait=0.5) as waited:
+            self.assertLess(waited, 0.5)
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+    def test_async_cancel_and_shed_leave_the_queue(self):
+        scheduler = OllamaScheduler(max_in_flight=1, budgets={PRIORITY_MINI_APP: 0.05})
+
+        async def scenario():
+            async with scheduler.async_slot(PRIORITY_BULK):
+                queued = asyncio.ensure_future(self._hold(scheduler, PRIORITY_INTERACTIVE))
+                await asyncio.sleep(0.02)
+                self.assertEqual(scheduler.stats()["queue_depth"], 1)
+                queued.cancel()
+                await asyncio.sleep(0)
+                self.assertEqual(scheduler.stats()["queue_depth"], 0)
+                with self.assertRaises(SchedulerOverloaded):
+                    await self._hold(scheduler, PRIORITY_MINI_APP)
+
+        asyncio.run(scenario())
+        stats = scheduler.stats()
+        self.assertEqual((stats["in_flight"], stats["queue_depth"], stats["shed"]["mini_app"]), (0, 0, 1))
+
+    @patch('services.ai_service.ollama_client.post')
+    def test_query_ollama_returns_none_when_shed(self, mock_post):
+        scheduler = OllamaScheduler(max_in_flight=1, budgets={PRIORITY_MINI_APP: 0.01})
+        with patch.object(ai_service, 'ollama_scheduler', scheduler):
+            with scheduler.slot(PRIORITY_INTERACTIVE):
+                self.assertIsNone(ai_service.query_ollama("hi"))
+        mock_post.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+import services.session_service as session_service
+from services.session_service import update_session, append_chat_message, get_session, session_lock_for
+from services.session_store import MemorySessionStore, SQLiteSessionStore
+
+USERS = 4
+THREADS_PER_USER = 4
+REQUESTS_PER_THREAD = 10
+
+
+def _append_worker(db_path, worker, count):
+    # A worker process of its own, with its own connection to the shared session file
+    session_service.sessions = SQLiteSessionStore(db_path)
+    for i in range(count):
+        append_chat_message("shared@example.com", "user", f"{worker}-{i}")
+
+
+class SessionConcurrencyMixin:
+    """Runs against whichever store make_store() returns."""
+
+    def setUp(self):
+        self.store = self.make_store()
+        patcher = patch.object(session_service, 'sessions', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_update_session_is_atomic(self):
+        def bump(_):
+            update_session("counter@example.com", lambda s: s.__setitem__('count', s.get('count', 0) + 1))
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(bump, range(400)))
+        self.assertEqual(get_session("counter@example.com")['count'], 400)
+
+    def test_chat_agent_hammered(self):
+        def worker(user):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user
+            for i in range(REQUESTS_PER_THREAD):
+                response = client.post('/chat_agent', json={'message': f'{user} {i}'})
+                self.assertEqual(response.data.decode('utf-8'), f"reply to {user}")
+
+        def reply(messages):
+            user = messages[-1]['content'].split()[0]
+            return iter([f"reply to {user}"])
+
+        users = [f"user{u}@example.com" for u in range(USERS)]
+        with patch('routes.health_routes.stream_ollama', side_effect=reply), \
+                patch('routes.health_routes.retrieve_relevant_context', return_value=""), \
+                patch('routes.health_routes.schedule_summary'), \
+                ThreadPoolExecutor(max_workers=USERS * THREADS_PER_USER) as pool:
+            list(pool.map(worker, users * THREADS_PER_USER))
+
+        expected = THREADS_PER_USER * REQUESTS_PER_THREAD
+        for user in users:
+            history = get_session(user)['chat_history']
+            self.assertEqual(sum(m['role'] == 'user' for m in history), expected)
+            self.assertEqual(sum(m['role'] == 'ai' for m in history), expected)
+            # No turn ever lands in another user's session
+            self.assertTrue(all(m['text'].startswith(user) or m['text'] == f"reply to {user}" for m in history))
+
+
+class TestMemoryStoreConcurrency(SessionConcurrencyMixin, unittest.TestCase):
+    def make_store(self):
+        return MemorySessionStore()
+
+
+class TestSQLiteStoreConcurrency(SessionConcurrencyMixin, unittest.TestCase):
+    def make_store(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteSessionStore(os.path.join(tmp.name, "sessions.sqlite3"))
+        self.addCleanup(store._conn.close)
+        return store
+
+    def test_failed_save_rolls_back_the_whole_update(self):
+        update_session("fail@example.com", count=1)
+
+        def also_touch_another_session(user_session):
+            self.store["other@example.com"] = {"chat_history": []}
+
+        with patch.object(self.store, '_evict', side_effect=sqlite3.OperationalError("disk I/O error")), \
+                self.assertLogs('services.session_store', level='ERROR'):
+            with self.assertRaises(sqlite3.OperationalError):
+                update_session("fail@example.com", also_touch_another_session, count=2)
+
+        self.assertEqual(get_session("fail@example.com")['count'], 1)
+        self.assertNotIn("other@example.com", self.store)
+
+    def test_update_session_is_atomic_across_processes(self):
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_append_worker, args=(self.store.db_path, w, 20)) for w in range(2)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join(60)
+            self.assertEqual(p.exitcode, 0)
+
+        history = [m['text'] for m in get_session("shared@example.com")['chat_history']]
+        self.assertEqual(sorted(history), sorted(f"{w}-{i}" for w in range(2) for i in range(20)))
+
+
+class TestSessionLocks(unittest.TestCase):
+    def test_striping(self):
+        self.assertIs(session_lock_for("a@example.com"), session_lock_for("a@example.com"))
+        locks = {id(session_lock_for(f"user{i}")) for i in range(500)}
+        self.assertEqual(len(locks), session_service.LOCK_STRIPES)
+
+    def test_append_chat_message_creates_history(self):
+        with patch.object(session_service, 'sessions', MemorySessionStore()):
+            append_chat_message("new@example.com", "user", "Hi")
+            self.assertEqual(get_session("new@example.com")['chat_history'], [{"role": "user", "text": "Hi"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
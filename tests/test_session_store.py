@@ -0,0 +1,257 @@
+import unittest
+from unittest.mock import patch
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.session_store import SQLiteSessionStore, MemorySessionStore, create_session_store, estimate_bytes
+from services.user_session import UserSession
+
+
+def _worker(db_path, worker, count):
+    store = SQLiteSessionStore(db_path)
+    for i in range(count):
+        store[f"w{worker}-{i}"] = {"chat_history": [{"role": "user", "text": str(i)}]}
+
+
+def _ingested_session():
+    return {
+        "blood_context": {"summary": "Low iron"},
+        "raw_text_chunks": ["Ferritin 12 ng/mL", "Iron 40 ug/dL"],
+        "chunk_meta": [{"page": 1, "start": 0, "end": 17}, {"page": 1, "start": 18, "end": 31}],
+        "embeddings": [],
+        "embedding_matrix": np.eye(2, 3, dtype=np.float32),
+        "chat_history": [],
+    }
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_with_lazy_heavy_fields(self):
+        SQLiteSessionStore(self.path)["a@example.com"] = _ingested_session()
+
+        # A second store on the same file stands in for another worker process
+        user_session = SQLiteSessionStore(self.path)["a@example.com"]
+        self.assertEqual(user_session["blood_context"], {"summary": "Low iron"})
+        self.assertEqual(user_session.loaded, {})
+        self.assertIn("embedding_matrix", user_session)
+
+        np.testing.assert_array_equal(user_session.get("embedding_matrix"), np.eye(2, 3))
+        self.assertEqual(user_session["chunk_meta"][1]["start"], 18)
+        self.assertEqual(set(user_session.loaded), {"embedding_matrix", "chunk_meta"})
+
+    def test_chat_turn_does_not_rewrite_heavy_fields(self):
+        store = SQLiteSessionStore(self.path)
+        store["a@example.com"] = _ingested_session()
+
+        user_session = store["a@example.com"]
+        user_session.get("embedding_matrix")
+        user_session["chat_history"].append({"role": "user", "text": "Hi"})
+        with patch.object(SQLiteSessionStore, "_encode", wraps=SQLiteSessionStore._encode) as encode:
+            store.save("a@example.com", user_session)
+        encode.assert_not_called()
+
+        reread = store["a@example.com"]
+        self.assertEqual(reread["chat_history"], [{"role": "user", "text": "Hi"}])
+        self.assertEqual(reread["raw_text_chunks"], ["Ferritin 12 ng/mL", "Iron 40 ug/dL"])
+
+    def test_replaced_and_cleared_heavy_fields(self):
+        store = SQLiteSessionStore(self.path)
+        store["a@example.com"] = _ingested_session()
+
+        user_session = store["a@example.com"]
+        user_session["raw_text_chunks"] = ["New report"]
+        user_session["embedding_matrix"] = None
+        store.save("a@example.com", user_session)
+
+        reread = store["a@example.com"]
+        self.assertEqual(reread["raw_text_chunks"], ["New report"])
+        self.assertIsNone(reread["embedding_matrix"])
+        self.assertEqual(len(reread["chunk_meta"]), 2)
+
+    def test_mapping_api(self):
+        store = SQLiteSessionStore(self.path)
+        store["old"] = {"chat_history": []}
+        store["new"] = {}
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store), ["old", "new"])
+        self.assertIn("old", store)
+        self.assertIsNone(store.get("missing"))
+
+        del store["old"]
+        with self.assertRaises(KeyError):
+            del store["old"]
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def test_shared_between_processes(self):
+        SQLiteSessionStore(self.path)
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_worker, args=(self.path, w, 20)) for w in range(3)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join(30)
+            self.assertEqual(p.exitcode, 0)
+
+        store = SQLiteSessionStore(self.path)
+        self.assertEqual(len(store), 60)
+        self.assertEqual(store["w2-7"]["chat_history"][0]["text"], "7")
+
+    def test_transaction_spans_read_and_save_across_connections(self):
+        # Two connections to one file, as two worker processes would have
+        stores = [SQLiteSessionStore(self.path), SQLiteSessionStore(self.path)]
+        stores[0]["tok"] = {"chat_history": []}
+
+        def append(store, worker):
+            for i in range(25):
+                with store.transaction("tok"):
+                    user_session = store["tok"]
+                    user_session["chat_history"].append({"role": "user", "text": f"{worker}-{i}"})
+                    time.sleep(0.001)
+                    store.save("tok", user_session)
+
+        threads = [threading.Thread(target=append, args=(store, w)) for w, store in enumerate(stores)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(SQLiteSessionStore(self.path)["tok"]["chat_history"]), 50)
+
+    def test_transaction_rolls_back_on_error(self):
+        store = SQLiteSessionStore(self.path)
+        store["tok"] = {"chat_history": []}
+        with self.assertRaises(RuntimeError):
+            with store.transaction("tok"):
+                store.save("tok", {"chat_history": [{"role": "user", "text": "lost"}]})
+                raise RuntimeError("boom")
+        self.assertEqual(store["tok"]["chat_history"], [])
+
+
+class TestEviction(unittest.TestCase):
+    def test_memory_lru_by_bytes(self):
+        turn = {"chat_history": [{"role": "user", "text": "x" * 100}]}
+        unit = estimate_bytes(UserSession(turn))
+        store = MemorySessionStore(max_bytes=3 * unit)
+        for token in ("a", "b", "c"):
+            store[token] = dict(turn)
+        store["a"]  # touched: "b" is now the least recently used
+        store["d"] = dict(turn)
+        self.assertEqual(list(store), ["c", "a", "d"])
+
+        # One session with a matrix weighs ~1.5 chat sessions: two light ones go
+        floats = (int(1.5 * unit) - estimate_bytes(UserSession())) // 4
+        store["e"] = {"embedding_matrix": np.zeros((1, floats), dtype=np.float32)}
+        self.assertEqual(list(store), ["d", "e"])
+        stats = store.stats()
+        self.assertEqual((stats["sessions"], stats["evictions"]), (2, 3))
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+
+    def test_memory_idle_sweep(self):
+        store = MemorySessionStore(idle_ttl=60)
+        store["idle"] = {}
+        store["active"] = {}
+        store._shard("idle").last_used["idle"] -= 120
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(list(store), ["active"])
+        self.assertEqual(store.stats()["expired"], 1)
+        self.assertEqual(MemorySessionStore().sweep(), 0)
+
+    def test_memory_shards_do_not_block_each_other(self):
+        store = MemorySessionStore()
+        store["a"] = {}
+        other = next(t for t in (f"user{i}" for i in range(1000)) if store._shard(t) is not store._shard("a"))
+        store[other] = {}
+        result = []
+        with store._shard("a").lock:
+            reader = threading.Thread(target=lambda: result.append(store[other]))
+            reader.start()
+            reader.join(5)
+        self.assertEqual(len(result), 1)
+
+    def test_sqlite_reads_batch_last_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteSessionStore(os.path.join(tmp, "s.sqlite3"), idle_ttl=60)
+            store["a"] = {}
+            store["b"] = {}
+            changes = store._conn.total_changes
+            for _ in range(20):
+                store["a"]
+            self.assertEqual(store._conn.total_changes, changes)
+            # Written by the next save (or sweep, or after TOUCH_FLUSH_SECONDS)
+            store["c"] = {}
+            self.assertEqual(list(store), ["b", "a", "c"])
+            store._conn.close()
+
+    def test_sqlite_budget_and_sweep(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "s.sqlite3")
+            store = SQLiteSessionStore(path, idle_ttl=60)
+            store["guest"] = {}
+            light = store.stats()["bytes"]
+            # Room for the 1000-byte matrix session and one and a half guests
+            store.max_bytes = int(2.5 * light) + 1000
+            store["reader"] = {}
+            store["guest"]
+            store["ingested"] = {"embedding_matrix": np.zeros((1, 250), dtype=np.float32)}
+            self.assertEqual(list(store), ["guest", "ingested"])
+            self.assertEqual(store.stats()["evictions"], 1)
+
+            self.assertEqual(store.sweep(now=time.time() + 120), 2)
+            self.assertEqual(store.stats()["sessions"], 0)
+            self.assertEqual(store._conn.execute("SELECT COUNT(*) FROM session_fields").fetchone()[0], 0)
+            store._conn.close()
+
+    def test_admin_gauges(self):
+        from app import app
+        with patch('routes.admin_routes.ADMIN_ALLOW_LOOPBACK', True):
+            response = app.test_client().get('/admin/sessions')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({"sessions", "bytes", "evictions", "expired"} <= set(response.get_json()))
+
+
+class TestSessionBackendSelection(unittest.TestCase):
+    def test_backends(self):
+        self.assertIsInstance(create_session_store("memory"), MemorySessionStore)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = create_session_store("sqlite", os.path.join(tmp, "s.sqlite3"))
+            self.assertIsInstance(store, SQLiteSessionStore)
+            store._conn.close()
+        # A path SQLite cannot open degrades to memory instead of failing startup
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsInstance(create_session_store("sqlite", tmp), MemorySessionStore)
+
+    def test_routes_persist_through_sqlite_backend(self):
+        from app import app
+        import services.session_service as session_service
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteSessionStore(os.path.join(tmp, "s.sqlite3"))
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 'chat@example.com'
+
+            with patch.object(session_service, 'sessions', store), \
+                    patch('routes.health_routes.stream_ollama', return_value=iter(["Hello"])):
+                response = client.post('/chat_agent', json={'message': 'Hi'})
+                self.assertEqual(response.data.decode('utf-8'), "Hello")
+
+            history = SQLiteSessionStore(store.db_path)['chat@example.com']['chat_history']
+            self.assertEqual([m['text'] for m in history], ['Hi', 'Hello'])
+            store._conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import json
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.singleflight import SingleFlight
+from services import ai_service
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+        results = []
+
+        def slow():
+            calls.append(1)
+            release.wait(2)
+            return "answer"
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(2)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["answer"] * 5)
+        self.assertEqual(flight.stats(), {"executed": 1, "coalesced": 4, "in_flight": 0})
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flight.do("k", failing)
+        # The key is released, so the next call runs again
+        self.assertEqual(flight.do("k", lambda: 1), 1)
+
+    def test_async_callers_coalesce_with_threads(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(2)
+            return "shared"
+
+        leader = threading.Thread(target=flight.do, args=("k", slow))
+        leader.start()
+        time.sleep(0.05)
+
+        async def followers():
+            async def never_called():
+                raise AssertionError("should have joined the in-flight call")
+            tasks = [flight.do_async("k", never_called) for _ in range(3)]
+            asyncio.get_running_loop().call_later(0.05, release.set)
+            return await asyncio.gather(*tasks)
+
+        self.assertEqual(asyncio.run(followers()), ["shared"] * 3)
+        leader.join(2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()["coalesced"], 3)
+
+    def test_cancelled_follower_does_not_break_the_call(self):
+        flight = SingleFlight()
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow():
+                await release.wait()
+                return "shared"
+
+            leader = asyncio.ensure_future(flight.do_async("k", slow))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("k", slow)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            followers[0].cancel()
+            await asyncio.sleep(0.01)
+            release.set()
+            return await leader, await followers[1], followers[0].cancelled()
+
+        self.assertEqual(asyncio.run(scenario()), ("shared", "shared", True))
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_cancelled_async_leader_hands_over(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def scenario():
+            async def call(name):
+                calls.append(name)
+                await asyncio.sleep(0.05)
+                return name
+
+            leader = asyncio.ensure_future(flight.do_async("k", call, "leader"))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("k", call, f"follower{i}")) for i in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            # One follower re-runs the call; the other joins it
+            return await asyncio.gather(*followers), leader.cancelled()
+
+        results, leader_cancelled = asyncio.run(scenario())
+        self.assertTrue(leader_cancelled)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_interrupted_sync_leader_hands_over(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        outcomes = {}
+
+        def interrupted():
+            release.wait(2)
+            raise KeyboardInterrupt
+
+        def leader():
+            try:
+                flight.do("k", interrupted)
+            except BaseException as e:
+                outcomes["leader"] = type(e).__name__
+
+        def follower():
+            outcomes["follower"] = flight.do("k", lambda: "rerun")
+
+        threads = [threading.Thread(target=leader), threading.Thread(target=follower)]
+        threads[0].start()
+        time.sleep(0.05)
+        threads[1].start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(2)
+
+        # The interrupt stays with the leader; the follower gets an ordinary answer, not a BaseException
+        self.assertEqual(outcomes, {"leader": "KeyboardInterrupt", "follower": "rerun"})
+        self.assertEqual(flight.stats(), {"executed": 2, "coalesced": 1, "in_flight": 0})
+
+    @patch('services.ai_service.ollama_client.post')
+    def test_query_ollama_coalesces_identical_prompts(self, mock_post):
+        def slow_post(*args, **kwargs):
+            time.sleep(0.1)
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {"message": {"content": json.dumps({"ok": True})}}
+            return response
+
+        mock_post.side_effect = slow_post
+        flight = SingleFlight()
+        results = []
+
+        with patch.object(ai_service, 'chat_singleflight', flight):
+            threads = [threading.Thread(target=lambda: results.append(ai_service.query_ollama("same")))
+                       for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(2)
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(results, [{"ok": True}] * 4)
+        # Each caller parses its own copy
+        results[0]["ok"] = False
+        self.assertTrue(results[1]["ok"])
+
+
+if __name__ == '__main__':
+    unittest.main()
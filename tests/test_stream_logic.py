@@ -5,7 +5,7 @@ import json
 
 class TestStreamOllama(unittest.TestCase):
 
-    @patch('services.ai_service.requests.post')
+    @patch('services.ai_service.ollama_client.post')
     def test_stream_ollama_normal_text(self, mock_post):
         # Mock a streaming response
         response = MagicMock()
@@ -28,7 +28,7 @@ class TestStreamOllama(unittest.TestCase):
         # Logic buffers first 10 chars, so "Hello" and " world" are combined
         self.assertEqual(result, ["Hello world", "."])
 
-    @patch('services.ai_service.requests.post')
+    @patch('services.ai_service.ollama_client.post')
     def test_stream_ollama_tool_call(self, mock_post):
         # Mock a tool call response
         # It starts with {
@@ -63,7 +63,7 @@ class TestStreamOllama(unittest.TestCase):
         self.assertIn("✅ Analysis:", result[0])
         self.assertIn("BMI: 22.86", result[0])
 
-    @patch('services.ai_service.requests.post')
+    @patch('services.ai_service.ollama_client.post')
     def test_stream_ollama_false_positive_tool(self, mock_post):
         # Starts with { but is not a valid tool call
 
@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch
+import json
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+import services.ai_service as ai_service
+from services import tracing
+from services.tracing import span, traced, JsonlSink
+from benchmarks.mock_ollama import MockOllama
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.sink = JsonlSink(os.path.join(tmp.name, "spans.jsonl"))
+        self.addCleanup(self.sink.close)
+        patcher = patch.object(tracing, 'sink', self.sink)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def spans(self, trace_id=None):
+        return tracing.read_spans(self.sink.path, trace_id)
+
+
+class TestSpans(TracingTestCase):
+
+    def test_nesting_and_annotations(self):
+        @traced("inner")
+        def inner():
+            tracing.annotate(rows=3)
+
+        with span("outer", kind="test") as outer:
+            inner()
+        by_name = {s["name"]: s for s in self.spans()}
+        self.assertEqual(by_name["inner"]["parent_id"], outer.span_id)
+        self.assertEqual(by_name["inner"]["trace_id"], outer.trace_id)
+        self.assertEqual(by_name["inner"]["attrs"], {"rows": 3})
+        self.assertEqual(by_name["outer"]["attrs"], {"kind": "test"})
+        self.assertIsNone(tracing.current_span())
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(KeyError):
+            with span("failing"):
+                raise KeyError("x")
+        self.assertEqual(self.spans()[0]["attrs"]["error"], "KeyError")
+
+    def test_chrome_export(self):
+        with span("outer"):
+            with span("inner"):
+                pass
+        out = os.path.join(os.path.dirname(self.sink.path), "trace.json")
+        self.assertEqual(tracing.export_chrome_trace(self.sink.path, out), 2)
+        with open(out) as f:
+            events = json.load(f)["traceEvents"]
+        outer, inner = sorted(events, key=lambda e: e["ts"])
+        self.assertEqual(outer["ph"], "X")
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertGreaterEqual(outer["ts"] + outer["dur"], inner["ts"] + inner["dur"])
+
+    def test_off_without_sink(self):
+        with patch.object(tracing, 'sink', None):
+            with span("ignored") as s:
+                self.assertIsNone(s)
+            tracing.record_span("ignored", 0, 1)
+        self.assertFalse(os.path.exists(self.sink.path))
+
+
+class TestRequestTracing(TracingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mock = MockOllama(ttft=0, token_latency=0, embed_latency=0, seed=5)
+        url = self.mock.start()
+        self.addCleanup(self.mock.stop)
+        patcher = patch.object(ai_service, 'CHAT_ENDPOINT', f"{url}/api/chat")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_mini_app_trace(self):
+        response = self.client.post('/suggest_supplement', json={"focus": "sleep"},
+                                    headers={'X-Trace-Id': 'req-123'})
+        self.assertEqual(response.headers['X-Trace-Id'], 'req-123')
+        spans = {s["name"]: s for s in self.spans('req-123')}
+        root = spans["POST /<action>"]
+        self.assertIsNone(root["parent_id"])
+        self.assertEqual(root["attrs"]["status"], 200)
+        self.assertEqual(spans["ollama.query"]["parent_id"], root["span_id"])
+        self.assertEqual(spans["ollama.chat"]["parent_id"], spans["ollama.query"]["span_id"])
+        self.assertEqual(spans["ollama.queue"]["parent_id"], spans["ollama.chat"]["span_id"])
+        self.assertEqual(spans["json.parse"]["attrs"]["path"], "direct")
+
+    def test_streamed_chat_trace(self):
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = "trace@example.com"
+        with patch('routes.health_routes.schedule_summary'):
+            response = self.client.post('/chat_agent', json={"message": "Why am I tired?"})
+            self.assertIn("ferritin", response.data.decode())
+            response.close()
+        trace_id = response.headers['X-Trace-Id']
+        spans = {s["name"]: s for s in self.spans(trace_id)}
+        root = spans["POST /chat_agent"]
+        stream = spans["ollama.chat_stream"]
+        # The root span stays open until the streamed body is finished
+        self.assertEqual(stream["parent_id"], root["span_id"])
+        self.assertGreaterEqual(root["ts"] + root["duration_ms"] / 1000, stream["ts"] + stream["duration_ms"] / 1000)
+        self.assertEqual(spans["ollama.generate"]["parent_id"], stream["span_id"])
+        self.assertIn("chat.build_prompt", spans)
+
+        with patch('routes.admin_routes.ADMIN_ALLOW_LOOPBACK', True):
+            trace = self.client.get(f'/admin/traces/{trace_id}?format=chrome').get_json()
+        self.assertEqual(len(trace["traceEvents"]), len(spans))
+
+    def test_invalid_trace_id_is_replaced(self):
+        response = self.client.get('/', headers={'X-Trace-Id': 'bad id'})
+        self.assertNotEqual(response.headers['X-Trace-Id'], 'bad id')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.user_session import UserSession, ChatHistory, Role
+from services.session_store import estimate_bytes, MemorySessionStore, SQLiteSessionStore
+
+
+class TestChatHistory(unittest.TestCase):
+    def test_ring_buffer(self):
+        history = ChatHistory(maxlen=4)
+        for i in range(6):
+            history.append({"role": "user" if i % 2 == 0 else "ai", "text": f"m{i}"})
+
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history[0], {"role": "user", "text": "m2"})
+        self.assertEqual(history[-2:], [{"role": "user", "text": "m4"}, {"role": "ai", "text": "m5"}])
+        self.assertEqual([m["text"] for m in history], ["m2", "m3", "m4", "m5"])
+        # Roles are shared enum members, not one string per message
+        self.assertTrue(all(role is Role.USER for role, _ in list(history.turns())[::2]))
+
+    def test_rejects_unknown_roles(self):
+        with self.assertRaises(ValueError):
+            ChatHistory([{"role": "moderator", "text": "?"}])
+
+
+class TestUserSession(unittest.TestCase):
+    def test_dict_style_access(self):
+        user_session = UserSession({"blood_context": {"summary": "Low iron"}, "weekly_plan": [{"day": "Mon"}]})
+        self.assertEqual(user_session["blood_context"]["summary"], "Low iron")
+        self.assertEqual(user_session.get("weekly_plan")[0]["day"], "Mon")
+        self.assertEqual(user_session.get("missing", "default"), "default")
+        self.assertIn("embedding_matrix", user_session)
+        self.assertNotIn("missing", user_session)
+        self.assertEqual(user_session["chat_history"], [])
+        self.assertEqual(user_session.pop("weekly_plan")[0]["day"], "Mon")
+        self.assertNotIn("weekly_plan", user_session)
+
+    def test_blood_context_is_compact_json(self):
+        user_session = UserSession()
+        user_session["blood_context"] = {"summary": "Healthy", "issues": []}
+        self.assertEqual(user_session._blood_context, b'{"summary":"Healthy","issues":[]}')
+        # Reads share one decoded dict, so in-place changes stick and are packed back
+        user_session["blood_context"]["summary"] = "Changed"
+        user_session["blood_context"]["issues"].append("Low iron")
+        self.assertEqual(user_session["blood_context"]["summary"], "Changed")
+        user_session.pack()
+        self.assertEqual(user_session._blood_context, b'{"summary":"Changed","issues":["Low iron"]}')
+        self.assertIsNone(user_session._blood_dict)
+
+    def test_blood_context_changes_survive_the_stores(self):
+        for store in (MemorySessionStore(), SQLiteSessionStore(":memory:")):
+            store["tok"] = UserSession({"blood_context": {"summary": "Healthy"}})
+            user_session = store["tok"]
+            user_session["blood_context"]["summary"] = "Low iron"
+            store.save("tok", user_session)
+            self.assertEqual(store["tok"]["blood_context"], {"summary": "Low iron"})
+
+    def test_legacy_embeddings_become_a_matrix(self):
+        user_session = UserSession({"raw_text_chunks": ["a", "b"], "embeddings": [[3.0, 4.0], [0.0, 2.0]]})
+        matrix = user_session["embedding_matrix"]
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 1.0]])
+        # Read back as the matrix rows; an empty list does not clear them
+        np.testing.assert_allclose(user_session["embeddings"], [[0.6, 0.8], [0.0, 1.0]])
+        user_session["embeddings"] = []
+        self.assertEqual(len(user_session["embeddings"]), 2)
+        self.assertEqual(UserSession()["embeddings"], [])
+
+    def test_smaller_than_the_dict_layout(self):
+        turns = [{"role": "user" if i % 2 == 0 else "ai", "text": "How is my iron?"} for i in range(40)]
+        old = {"blood_context": {"summary": "Low iron"}, "chat_history": turns, "raw_text_chunks": [],
+               "chunk_meta": [], "embeddings": [], "embedding_matrix": None}
+        self.assertLess(estimate_bytes(UserSession(old)), estimate_bytes(old))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,17 +11,26 @@ from services.ai_service import (
     clean_and_parse_json,
     query_ollama,
     stream_ollama,
+    stream_ollama_json,
+    ollama_scheduler,
+    chat_singleflight,
     CHAT_ENDPOINT,
     base_url
 )
+from services.scheduler import PRIORITY_INTERACTIVE, PRIORITY_MINI_APP, PRIORITY_BULK
+from services.ollama_client import ollama_client
 from services.rag_service import (
     get_embedding,
+    get_embeddings,
     cosine_similarity,
+    build_embedding_matrix,
+    top_k_similar,
     retrieve_relevant_context,
     EMBED_ENDPOINT,
     embedding_cache
 )
-from services.session_service import get_session, sessions
+from services.session_service import (get_session, save_session, update_session, append_chat_message, session_stats,
+                                     session_lock_for, sessions)
 from services.tools import (
     calculate_bmi,
     estimate_daily_calories,